@@ -0,0 +1,86 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+import vertools
+import vertools.compare as vcompare
+
+
+def write_samples(path, values, trailing_newline=True):
+    text = '\n'.join(str(v) for v in values)
+    if trailing_newline:
+        text += '\n'
+    path.write_text(text)
+    return str(path)
+
+
+def run_compare(cwd, *args):
+    env_path = str(vertools.rootdir)
+    return subprocess.run([sys.executable, '-m', 'vertools', 'compare', *args], cwd=cwd,
+                          capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': env_path})
+
+
+def test_time_aligned_blocks():
+    # Reference at 10 ns, simulation at 5 ns delayed by 30 ns
+    ref = np.arange(100) * 7 % 23
+    sim = np.concatenate((np.full(6, -1), np.repeat(ref, 2)))
+    sim_axis = vcompare.TimeAxis(0, 5e-9, len(sim))
+    ref_axis = vcompare.TimeAxis(0, 10e-9, len(ref), tend=500e-9)
+    assert ref_axis.length == 50
+    blocks = list(vcompare.time_aligned_blocks(sim, ref, sim_axis, ref_axis, 30e-9, size=16))
+    lines = np.concatenate([block[0] for block in blocks])
+    assert lines.tolist() == list(range(6, 106, 2))
+    assert np.array_equal(np.concatenate([block[1] for block in blocks]), ref[:50])
+    assert np.array_equal(np.concatenate([block[2] for block in blocks]), ref[:50])
+    blocks = vcompare.time_aligned_blocks(sim, ref, sim_axis, ref_axis, 25e-9, size=16)
+    assert vcompare.time_aligned_first_mismatch(blocks, 0) == vcompare.Mismatch(6, -1, 0)
+    # Comparison window
+    blocks = list(vcompare.time_aligned_blocks(sim, ref, sim_axis, ref_axis, 30e-9, tstart=100e-9, tend=200e-9,
+                                               tstep=20e-9))
+    assert blocks[0][2].tolist() == ref[10:20:2].tolist()
+
+
+def test_find_latency():
+    rng = np.random.default_rng(0)
+    ref = rng.integers(-1000, 1000, size=5000)
+    sim = np.concatenate((rng.integers(-1000, 1000, size=17), ref))
+    axis = vcompare.TimeAxis(0, 1.0, len(ref))
+    assert vcompare.find_latency(sim, ref, vcompare.TimeAxis(0, 1.0, len(sim)), axis, 100) == 17.0
+    assert vcompare.find_latency(ref, sim, axis, vcompare.TimeAxis(0, 1.0, len(sim)), 100) == -17.0
+    # Channels of multi-column results share the same latency
+    sim = np.stack((sim, -sim), axis=1)
+    ref = np.stack((ref, -ref), axis=1)
+    assert vcompare.find_latency(sim, ref, vcompare.TimeAxis(0, 1.0, len(sim)), axis, 100) == 17.0
+    assert vcompare.find_latency(sim, ref, vcompare.TimeAxis(0, 1.0, len(sim)), axis, 10) != 17.0
+
+
+def test_compare_command_aligned(tmp_path):
+    ref = np.random.default_rng(0).integers(1, 100, size=200)
+    write_samples(tmp_path/'ref.txt', ref)
+    write_samples(tmp_path/'sim.txt', np.concatenate((np.zeros(4, dtype=int), np.repeat(ref, 2))))
+    (tmp_path/'vertools.config').write_text(
+        '[Simulation]\ntstart = 0ns\ntend = 2.02us\ntstep = 5ns\n'
+        '[Reference]\ntstart = 0ns\ntend = 2us\ntstep = 10ns\n'
+    )
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt')
+    assert status.returncode == 2
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--align')
+    assert status.returncode == 3
+    assert f'mismatch on line 1: reference={ref[0]}, simulation=0' in status.stdout
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--align', '--latency', '20ns')
+    assert status.returncode == 0
+    assert 'at 200 common instants' in status.stdout
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--align', '--latency', 'auto')
+    assert status.returncode == 0
+    assert 'Estimated latency: 20 ns' in status.stdout
+    # Samples past the end time, or no common instants
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--align', '--latency', '3us')
+    assert status.returncode == 2
+    assert 'no instants in common' in status.stdout
+    config = (tmp_path/'vertools.config').read_text()
+    (tmp_path/'vertools.config').write_text(config.replace('tend = 2us', 'tend = 1us'))
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--align', '--latency', '20ns')
+    assert status.returncode == 2
+    assert 'ref.txt has 200 lines, but only 100 are taken before the Reference end time of 1 us' in status.stdout
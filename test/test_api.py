@@ -0,0 +1,50 @@
+import asyncio
+import concurrent.futures
+import io
+
+import vertools
+import vertools.cli as vcli
+
+
+def test_sections():
+    first = vcli.parse(['compare', '-s', 'a.txt', '-t', '3'])
+    second = vcli.parse(['compare', '-r', 'b.txt'])
+    assert vcli.sections(first) == {'Simulation': {'results': 'a.txt'}, 'Verification': {'threshold': 3}}
+    assert vcli.sections(second) == {'Reference': {'results': 'b.txt'}}
+
+
+def test_run(tmp_path):
+    for name, reference in ('a', [1, 2, 3]), ('b', [1, 2, 5]):
+        folder = tmp_path/name
+        folder.mkdir()
+        (folder/'sim.txt').write_text('1\n2\n3\n')
+        (folder/'ref.txt').write_text(''.join(f'{value}\n' for value in reference))
+        (folder/'vertools.config').write_text('[Simulation]\nresults = sim.txt\n[Reference]\nresults = ref.txt\n')
+
+    def compare(name, threshold):
+        messages = io.StringIO()
+        status = vertools.run('compare', overrides={'Verification': {'threshold': threshold}},
+                              cwd=str(tmp_path/name), stdout=messages)
+        return status, messages.getvalue()
+
+    cases = [('a', '0', 0), ('b', '0', 3), ('b', '2', 0), ('a', '1', 0)] * 8
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda case: compare(*case[:2]), cases))
+    for (name, threshold, expected), (status, messages) in zip(cases, results):
+        assert status == expected
+        if expected == 3:
+            assert 'mismatch on line 3: reference=5, simulation=3' in messages
+        else:
+            assert 'All results are matching' in messages
+    # Command line arguments, relative to the project directory
+    assert vertools.run('compare', ['-r', 'sim.txt'], cwd=str(tmp_path/'b'), stdout=io.StringIO()) == 0
+    assert vertools.run('compare', ['--no-such-option'], stdout=io.StringIO()) == 2
+
+
+def test_run_in_event_loop(tmp_path):
+    (tmp_path/'vertools.config').write_text('[Reference]\ncommand = seq 1 3 > results-ref.txt\n')
+
+    async def main():
+        return vertools.run('reference', cwd=str(tmp_path), stdout=io.StringIO())
+    assert asyncio.run(main()) == 0
+    assert (tmp_path/'results-ref.txt').read_text() == '1\n2\n3\n'
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+import vertools
+import vertools.cache as vcache
+
+
+def run_vertools(cwd, *args):
+    env = {**os.environ, 'PYTHONPATH': str(vertools.rootdir)}
+    return subprocess.run([sys.executable, '-m', 'vertools', *args], cwd=cwd, capture_output=True, text=True, env=env)
+
+
+def store(cache, description, content):
+    key = vcache.Cache.key(description)
+    path = cache.staging()
+    with open(path, 'w') as f:
+        f.write(content)
+    cache.store(key, path)
+    return key
+
+
+def test_cache(tmp_path):
+    cache = vcache.Cache(str(tmp_path/'cache'), max_size=25)
+    assert not cache.fetch(vcache.Cache.key({'a': 1}), str(tmp_path/'x'))
+    first = store(cache, {'a': 1}, 'a' * 10)
+    second = store(cache, {'a': 2}, 'b' * 10)
+    assert cache.fetch(first, str(tmp_path/'first'))
+    assert (tmp_path/'first').read_text() == 'a' * 10
+    assert cache.contains(first, str(tmp_path/'first'))
+    assert not cache.contains(second, str(tmp_path/'first'))
+    # The least recently used entry is evicted
+    os.utime(cache.path(second), (0, 0))
+    store(cache, {'a': 3}, 'c' * 10)
+    assert not os.path.exists(cache.path(second))
+    assert (tmp_path/'first').read_text() == 'a' * 10
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1, 'entries': 2, 'size': 20}
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0, 'entries': 0, 'size': 0}
+
+
+def test_generate_inputs_cache(tmp_path):
+    (tmp_path/'vertools.config').write_text(f"[Cache]\nfolder = {tmp_path/'cache'}\n\n[Input]\ntend = 1us\n")
+    status = run_vertools(tmp_path, 'generate-inputs', 'sine', '100', '1MHz', '0')
+    assert status.returncode == 0, status.stdout
+    # The cache is opt-in
+    assert not (tmp_path/'cache').exists()
+    os.remove(tmp_path/'inputs.txt')
+    args = ['generate-inputs', '--cache', 'sine', '100', '1MHz', '0']
+    status = run_vertools(tmp_path, *args)
+    assert status.returncode == 0, status.stdout
+    expected = (tmp_path/'inputs.txt').read_text()
+    assert len(expected.splitlines()) == 100
+    # Same inputs: no prompt, nothing regenerated
+    status = run_vertools(tmp_path, *args)
+    assert 'up to date' in status.stdout
+    os.remove(tmp_path/'inputs.txt')
+    status = run_vertools(tmp_path, *args)
+    assert 'from the stimulus cache' in status.stdout
+    assert (tmp_path/'inputs.txt').read_text() == expected
+    os.remove(tmp_path/'inputs.txt')
+    status = run_vertools(tmp_path, 'generate-inputs', '--cache', '--bits', '4', 'sine', '100', '1MHz', '0')
+    assert 'Saved 100 samples' in status.stdout
+    status = run_vertools(tmp_path, 'cache')
+    assert 'Hits: 2, misses: 2' in status.stdout
+    assert 'Entries: 2' in status.stdout
@@ -0,0 +1,59 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import vertools
+import vertools.compare as vcompare
+import vertools.samples as vsamples
+
+
+def run_compare(cwd, *args):
+    env_path = str(vertools.rootdir)
+    return subprocess.run([sys.executable, '-m', 'vertools', 'compare', *args], cwd=cwd,
+                          capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': env_path})
+
+
+def test_multi_column(tmp_path):
+    path = tmp_path/'sim.txt'
+    path.write_text('1 2 3\n4,5,6\n7\t8 9\n' * 20)
+    reader = vsamples.TextReader(str(path), chunk_size=16, columns=3)
+    block = np.concatenate(list(reader.blocks()))
+    assert block.shape == (60, 3)
+    assert block[:3].tolist() == [[1, 2, 3], [4, 5, 6], [7, 8, 9]]
+    path.write_text('1 2 3\n4 5\n')
+    with pytest.raises(vsamples.Reader.FormatError, match='Expected 3 values on line 2'):
+        list(vsamples.TextReader(str(path), columns=3).blocks())
+    # A short line followed by a long one holds the right number of values in total
+    with pytest.raises(vsamples.Reader.FormatError, match='Expected 3 values on line 1'):
+        vsamples.parse(b'1 2\n3 4 5 6\n', 0, 3)
+    with pytest.raises(ValueError):
+        vsamples.reader(str(path), 'npy', columns=3)
+    # Per-column thresholds, the leftmost column of the first mismatching line is reported
+    ref = np.zeros((10, 3), dtype=np.int64)
+    sim = ref.copy()
+    sim[4] = [0, 3, 5]
+    sim[2] = [2, 0, 0]
+    threshold = np.array([2, 2, 4])
+    assert vcompare.first_mismatch([sim], [ref], threshold) == vcompare.Mismatch(5, 3, 0, column=1)
+    report = vcompare.report([sim[:3], sim[3:]], [ref[:5], ref[5:]], threshold, columns=['a', 'b', 'c'])
+    result = report.to_dict()
+    assert result['mismatches'] == 1
+    assert result['first_mismatch'] == {'line': 5, 'column': 'b', 'simulation': 3, 'reference': 0}
+    assert [column['mismatches'] for column in result['columns']] == [0, 1, 1]
+    assert [column['max_abs_error'] for column in result['columns']] == [2, 3, 5]
+    assert result['runs']['items'] == [{'first_line': 5, 'last_line': 5, 'length': 1, 'max_abs_error': 5}]
+
+
+def test_compare_command_columns(tmp_path):
+    (tmp_path/'sim.txt').write_text('1,10\n2,20\n3,35\n')
+    (tmp_path/'ref.txt').write_text('1,10\n2,21\n3,30\n')
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--columns', 'x,y', '--thresholds', '0,5')
+    assert status.returncode == 0
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--columns', 'x y', '--thresholds', '0 2')
+    assert status.returncode == 3
+    assert 'mismatch on line 3, column `y`: reference=30, simulation=35' in status.stdout
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--columns', 'x y', '--thresholds', '0')
+    assert status.returncode == 1
@@ -0,0 +1,149 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import vertools
+import vertools.compare as vcompare
+import vertools.samples as vsamples
+
+
+def write_samples(path, values, trailing_newline=True):
+    text = '\n'.join(str(v) for v in values)
+    if trailing_newline:
+        text += '\n'
+    path.write_text(text)
+    return str(path)
+
+
+def run_compare(cwd, *args):
+    env_path = str(vertools.rootdir)
+    return subprocess.run([sys.executable, '-m', 'vertools', 'compare', *args], cwd=cwd,
+                          capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': env_path})
+
+
+def test_first_mismatch(tmp_path):
+    ref = np.arange(1000)
+    sim = ref.copy()
+    sim[700] += 3
+    sim[900] -= 5
+    simulation = vsamples.TextReader(write_samples(tmp_path/'sim.txt', sim), chunk_size=100)
+    reference = vsamples.TextReader(write_samples(tmp_path/'ref.txt', ref), chunk_size=37)
+    mismatch = vcompare.first_mismatch(simulation.blocks(), reference.blocks(), 2)
+    assert mismatch == vcompare.Mismatch(701, 703, 700)
+    mismatch = vcompare.first_mismatch(simulation.blocks(), reference.blocks(), 3)
+    assert mismatch == vcompare.Mismatch(901, 895, 900)
+    assert vcompare.first_mismatch(simulation.blocks(), reference.blocks(), 5) is None
+
+
+@pytest.mark.parametrize('jobs', [2, 3])
+def test_parallel_first_mismatch(tmp_path, jobs):
+    ref = np.arange(-1000, 1000) * 37
+    sim = ref.copy()
+    sim[[1234, 1500]] += 10
+    simulation = vsamples.TextReader(write_samples(tmp_path/'sim.txt', sim), chunk_size=100)
+    reference = vsamples.TextReader(write_samples(tmp_path/'ref.txt', ref), chunk_size=64)
+    expected = vcompare.first_mismatch(simulation.blocks(), reference.blocks(), 5)
+    assert vcompare.parallel_first_mismatch(simulation, reference, 5, jobs) == expected
+    assert vcompare.parallel_first_mismatch(simulation, reference, 10, jobs) is None
+    # Files of different lengths, with different line widths, are split at the same lines
+    write_samples(tmp_path/'ref.txt', np.arange(2500))
+    sim_lines, ref_lines, chunks = vcompare.parallel_split(simulation, reference, jobs)
+    assert (sim_lines, ref_lines) == (2000, 2500)
+    for sim_start, sim_end, ref_start, ref_end, first_line in chunks:
+        assert simulation.count(0, sim_start) == reference.count(0, ref_start) == first_line
+    assert chunks[-1][1] == os.path.getsize(simulation.path) and chunks[-1][3] == os.path.getsize(reference.path)
+    binary = vsamples.reader(str(tmp_path/'ref.bin'), 'int32')
+    ref.astype(np.int32).tofile(binary.path)
+    assert vcompare.parallel_first_mismatch(simulation, binary, 5, jobs) == expected
+
+
+def test_stream():
+    stream = vcompare.Stream(threshold=1)
+    assert stream.push(np.array([1, 2, 3]), np.array([1])) is None
+    assert stream.lengths() == (3, 1)
+    assert stream.push(np.array([], dtype=np.int64), np.array([2, 6, 4])) == vcompare.Mismatch(3, 3, 6)
+    assert stream.lengths() == (3, 4)
+    # Pending samples are bounded by the lag allowed between the streams
+    stream = vcompare.Stream(threshold=0)
+    stream.push(np.zeros(vcompare.MAX_LAG + 10, dtype=np.int64), np.zeros(10, dtype=np.int64))
+    assert stream.readable() == [False, True]
+    assert stream.push(np.array([], dtype=np.int64), np.zeros(2 * vcompare.MAX_LAG, dtype=np.int64)) is None
+    assert stream.readable() == [True, False]
+    assert stream.lengths() == (vcompare.MAX_LAG + 10, 2 * vcompare.MAX_LAG + 10)
+
+
+def test_compare_command(tmp_path):
+    write_samples(tmp_path/'sim.txt', [1, 2, 3, 4])
+    write_samples(tmp_path/'ref.txt', [1, 2, 5, 4])
+    write_samples(tmp_path/'short.txt', [1, 2, 3])
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '-t', '2')
+    assert status.returncode == 0
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '-t', '1')
+    assert status.returncode == 3
+    assert 'mismatch on line 3: reference=5, simulation=3' in status.stdout
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '-t', '1', '--jobs', '2')
+    assert status.returncode == 3
+    assert 'mismatch on line 3: reference=5, simulation=3' in status.stdout
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'short.txt')
+    assert status.returncode == 2
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'missing.txt')
+    assert status.returncode == 4
+
+
+def test_report():
+    ref = np.zeros(100, dtype=np.int64)
+    sim = ref.copy()
+    sim[[10, 11, 12, 49, 50, 80]] = [3, -4, 3, 2, 9, 5]
+    # Split in blocks so that a run crosses a block boundary
+    blocks = [(sim[i:i + 25], ref[i:i + 25]) for i in range(0, 100, 25)]
+    report = vcompare.Report(threshold=1)
+    for s, r in blocks:
+        report.update(s, r)
+    result = report.to_dict()
+    assert result['samples'] == 100
+    assert result['mismatches'] == 6
+    assert result['max_abs_error'] == 9
+    assert result['mean_abs_error'] == pytest.approx(26 / 100)
+    assert result['rms_error'] == pytest.approx(np.sqrt((9 + 16 + 9 + 4 + 81 + 25) / 100))
+    assert [(run['first_line'], run['last_line'], run['max_abs_error']) for run in result['runs']['items']] == \
+        [(11, 13, 4), (50, 51, 9), (81, 81, 5)]
+    assert [b['count'] for b in result['histogram']] == [94, 0, 3, 2, 1]
+    # Bounded number of stored runs
+    report = vcompare.Report(threshold=1, max_runs=1)
+    for s, r in blocks:
+        report.update(s, r)
+    assert report.run_count == 3
+    assert report.runs == [[11, 13, 4]]
+    assert report.to_dict()['runs']['truncated'] is True
+    # Passing rows following a run may have larger errors, in a column with a looser threshold
+    ref = np.zeros((4, 2), dtype=np.int64)
+    sim = np.array([[1, 0], [0, 50], [1, 0], [0, 0]])
+    report = vcompare.Report(threshold=np.array([0, 100]), columns=['x', 'y'])
+    report.update(sim, ref)
+    assert report.runs == [[1, 1, 1], [3, 3, 1]]
+
+
+def test_compare_command_report(tmp_path):
+    write_samples(tmp_path/'sim.txt', [1, 2, 3, 4])
+    write_samples(tmp_path/'ref.txt', [1, 2, 5, 9])
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--report', 'report.json')
+    assert status.returncode == 3
+    result = json.loads((tmp_path/'report.json').read_text())
+    assert result['mismatches'] == 2
+    assert result['runs']['items'] == [{'first_line': 3, 'last_line': 4, 'length': 2, 'max_abs_error': 5}]
+
+
+def test_compare_command_binary(tmp_path):
+    np.array([1, 2, 3, 4], dtype='>i2').tofile(tmp_path/'sim.bin')
+    np.save(tmp_path/'ref.npy', np.array([1, 2, 5, 4]))
+    status = run_compare(tmp_path, '-s', 'sim.bin', '--simulation-format', 'int16be', '-r', 'ref.npy',
+                         '--reference-format', 'npy', '-t', '1')
+    assert status.returncode == 3
+    assert 'mismatch on line 3: reference=5, simulation=3' in status.stdout
+    status = run_compare(tmp_path, '-s', 'sim.bin', '--simulation-format', 'int24', '-r', 'ref.npy',
+                         '--reference-format', 'npy')
+    assert status.returncode == 1
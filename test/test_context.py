@@ -37,3 +37,54 @@ def test_context():
         x = context.get('Nonexisting section', 'x')
     with pytest.raises(vcontext.Context.LookupError):
         nonexisting_parameter = context.get('Section 1', 'nonexisting_parameter')
+
+
+def test_context_merged_view():
+    context = vcontext.Context()
+    scopes = [vcontext.Scope({'Section': {'depth': i, f'p{i}': i}}) for i in range(100)]
+    for scope in scopes:
+        context.append_local(scope)
+    context.append_global(vcontext.Scope({'Section': {'depth': -1, 'global': None}, 'Other': {'x': 1}}))
+    assert context.get('Section', 'depth') == 99
+    assert context.get('Section', 'p0') == 0
+    assert context.get('Other', 'x') == 1
+    # Values set to None are found, and are not replaced by the fallback
+    assert context.get('Section', 'global', 'fallback') is None
+    assert context.get('Section', 'missing', 'fallback') == 'fallback'
+    # Changes to any scope are visible, unless a more local scope overrides them
+    scopes[0].set('Section', 'p0', 'changed')
+    scopes[0].set('Section', 'depth', 'hidden')
+    scopes[50].set('New', 'y', 2)
+    assert context.get('Section', 'p0') == 'changed'
+    assert context.get('Section', 'depth') == 99
+    assert context.get('New', 'y') == 2
+    context.set('Section', 'depth', 'local')
+    assert context.get('Section', 'depth') == 'local'
+    assert scopes[-1].get('Section', 'depth') == 'local'
+
+
+def test_config_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv('VERTOOLS_CONFIG_CACHE', str(tmp_path/'cache'))
+    config = tmp_path/'vertools.config'
+    config.write_text('[Simulation]\nclock = 20ns\ntimeout =\n[Verification]\nthresholds = 1, 2\n')
+    parsed = vcontext.Scope.from_config(str(config), cache=False)
+    first = vcontext.Scope.from_config(str(config))
+    entries = list((tmp_path/'cache').iterdir())
+    assert len(entries) == 1
+    second = vcontext.Scope.from_config(str(config))
+    assert first.data == second.data == parsed.data
+    assert type(second.get('Simulation', 'clock')) is type(parsed.get('Simulation', 'clock'))
+    assert str(second.get('Simulation', 'clock')) == str(parsed.get('Simulation', 'clock'))
+    assert second.get('Simulation', 'clock').units == 's'
+    assert second.get('Simulation', 'timeout') is None
+    # Scopes do not share their data
+    second.set('Simulation', 'clock', 0)
+    assert vcontext.Scope.from_config(str(config)).get('Simulation', 'clock') == first.get('Simulation', 'clock')
+    # Modified files are parsed again
+    config.write_text('[Simulation]\nclock = 30ns\n')
+    assert float(vcontext.Scope.from_config(str(config)).get('Simulation', 'clock')) == 30e-9
+    # Invalid entries are replaced
+    for entry in (tmp_path/'cache').iterdir():
+        entry.write_bytes(b'invalid')
+    assert float(vcontext.Scope.from_config(str(config)).get('Simulation', 'clock')) == 30e-9
+    assert vcontext.Scope.from_config(str(tmp_path/'missing.config')).data == {'DEFAULT': {}}
@@ -0,0 +1,63 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import io
+import json
+
+import vertools.output as voutput
+
+
+def test_levels_and_color():
+    stream = io.StringIO()
+    with voutput.using(voutput.sink('text', stream), 'status'):
+        voutput.update('hidden', 2)
+        voutput.status('shown')
+        voutput.error('failed', 2)
+    # No colors on streams which are not terminals
+    assert stream.getvalue() == 'shown\n  ERROR: failed\n'
+    stream = io.StringIO()
+    with voutput.using(voutput.sink('text', stream, color=True)):
+        voutput.success('done')
+    assert stream.getvalue() == voutput.decorate('done', ['GREEN']) + '\n'
+
+
+def test_json_sink():
+    stream = io.StringIO()
+    with voutput.using(voutput.sink('json', stream), 'warning'):
+        voutput.status('hidden')
+        voutput.warning('careful', 2)
+    record = json.loads(stream.getvalue())
+    assert record['level'] == 'warning'
+    assert record['message'] == 'careful'
+    assert record['indentation'] == 2
+
+
+def test_buffered():
+    stream = io.StringIO()
+
+    def task(name):
+        with voutput.buffered():
+            for i in range(50):
+                voutput.update(f"{name} {i}")
+
+    async def coroutine(name):
+        with voutput.buffered():
+            for i in range(50):
+                voutput.update(f"{name} {i}")
+                await asyncio.sleep(0)
+
+    async def tasks():
+        await asyncio.gather(*[coroutine(f"task{k}") for k in range(4)])
+
+    with voutput.using(voutput.sink('text', stream)):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as pool:
+            futures = [pool.submit(contextvars.copy_context().run, task, f"thread{k}") for k in range(4)]
+            for future in futures:
+                future.result()
+        asyncio.run(tasks())
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 400
+    # The messages of each thread or task are contiguous
+    for start in range(0, 400, 50):
+        names = {line.split()[0] for line in lines[start:start + 50]}
+        assert len(names) == 1
@@ -0,0 +1,68 @@
+import io
+import struct
+
+import vertools
+import vertools.output as voutput
+import vertools.progress as vprogress
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_meter():
+    assert vprogress.expected_samples(0, 10e-6, 10e-9) == 1000
+    assert vprogress.expected_samples(0, None, 10e-9) is None
+    assert vprogress.duration(42) == '42 s' and vprogress.duration(3725) == '1 h 02 min'
+    clock = Clock()
+    stream = io.StringIO()
+    meter = vprogress.Meter('Simulation', 1000, interval=5, clock=clock)
+    with voutput.using(voutput.sink('text', stream)):
+        for _ in range(10):
+            clock.now += 1
+            meter.advance(50)
+    # Rate-limited: one message every 5 s
+    assert stream.getvalue() == ('  Simulation: 250 of 1,000 samples (25%), 50 samples/s, ETA 15 s\n'
+                                 '  Simulation: 500 of 1,000 samples (50%), 50 samples/s, ETA 10 s\n')
+
+
+def test_tail(tmp_path):
+    path = tmp_path/'results.txt'
+    tail = vprogress.Tail(str(path))
+    assert tail.count() == 0
+    path.write_text('1\n2\n3')
+    assert tail.count() == 2
+    with open(path, 'a') as f:
+        f.write('\n4\n')
+    assert tail.count() == 4
+    path.write_text('1\n')
+    assert tail.count() == 1
+    binary = tmp_path/'results.bin'
+    binary.write_bytes(struct.pack('<5i', *range(5)) + b'\0')
+    assert vprogress.Tail(str(binary), 4).count() == 5
+    log = tmp_path/'log.txt'
+    log.write_text('compiling\nrunning\n\n')
+    assert vprogress.last_line(str(log)) == 'running'
+
+
+def test_progress_while_buffered(tmp_path):
+    (tmp_path/'reference.sh').write_text(
+        'for i in $(seq 8); do echo $i >> results-ref.txt; echo step $i; sleep 0.1; done\n')
+    (tmp_path/'vertools.config').write_text(
+        '[Reference]\n'
+        'command = sh reference.sh\n'
+        'tstart = 0ns\ntend = 8ns\ntstep = 1ns\n'
+        '[Progress]\ninterval = 0.2\n'
+    )
+    stream = io.StringIO()
+    with voutput.using(voutput.sink('text', stream)), voutput.buffered():
+        status = vertools.run('reference', overrides={'Progress': {'enable': True}}, cwd=str(tmp_path))
+        # Progress is printed while the messages of the command are still buffered
+        live = stream.getvalue()
+    assert status == 0
+    assert 'of 8 samples' in live and 'log: step' in live
+    assert 'Launching reference command' not in live
@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import vertools
+import vertools.commands as vcommands
+import vertools.regression as vregression
+
+CLOCKGEN = """architecture beh of ClockGen is
+  constant Ts : time := 1 ns;
+begin
+end beh;
+"""
+
+
+def run_vertools(cwd, *args):
+    env = {**os.environ, 'PYTHONPATH': str(vertools.rootdir)}
+    return subprocess.run([sys.executable, '-m', 'vertools', *args], cwd=cwd, capture_output=True, text=True, env=env)
+
+
+def test_load_manifest(tmp_path):
+    manifest = tmp_path/'manifest.json'
+    manifest.write_text(json.dumps({'files': ['a.txt'], 'cases': [
+        {'name': 'sine', 'waveform': {'type': 'sine', 'amplitude': 10, 'frequency': '1 MHz', 'phase': '0.5'},
+         'config': {'Verification': {'threshold': '2'}}},
+        {'config': {'Simulation': {'disable_log': 'true'}}}
+    ]}))
+    files, cases = vregression.load_manifest(str(manifest))
+    assert files == ['a.txt']
+    assert [case.name for case in cases] == ['sine', 'case1']
+    scope = cases[0].scope()
+    assert scope.get('CommandLine', 'waveform') == 'sine'
+    assert scope.get('CommandLine', 'frequency') == 1e6
+    assert scope.get('CommandLine', 'phase') == 0.5
+    assert scope.get('Verification', 'threshold') == 2
+    assert cases[1].scope().get('Simulation', 'disable_log') is True
+    manifest.write_text(json.dumps({'cases': [{'name': 'a'}, {'name': 'a'}]}))
+    with pytest.raises(vregression.ManifestError, match='duplicate'):
+        vregression.load_manifest(str(manifest))
+
+
+def test_regress_command(tmp_path):
+    (tmp_path/'ClockGen.vhd').write_text(CLOCKGEN)
+    (tmp_path/'vertools.config').write_text("[Simulation]\ncommand = cp inputs.txt results-sim.txt\n\n"
+                                            "[Reference]\ncommand = cp inputs.txt results-ref.txt\n\n"
+                                            f"[Input]\ntend = 1us\n\n[Cache]\nfolder = {tmp_path/'cache'}\n")
+    (tmp_path/'manifest.json').write_text(json.dumps({'files': ['ClockGen.vhd'], 'cases': [
+        {'name': 'constant', 'waveform': {'type': 'constant', 'value': 3}},
+        {'name': 'sine', 'waveform': {'type': 'sine', 'amplitude': 100, 'frequency': '1 MHz', 'phase': 0}},
+        {'name': 'broken', 'waveform': {'type': 'constant', 'value': 3},
+         'config': {'Reference': {'command': 'echo 4 > results-ref.txt'}}}
+    ]}))
+    status = run_vertools(tmp_path, 'regress', 'manifest.json', '--jobs', '2')
+    assert status.returncode == 3, status.stdout
+    summary = (tmp_path/'regression/summary.txt').read_text().splitlines()
+    assert summary[1].split()[:3] == ['constant', 'PASS', '0']
+    assert summary[2].split()[:3] == ['sine', 'PASS', '0']
+    assert summary[3].split()[:3] == ['broken', 'FAIL', '2']
+    assert summary[4] == '2/3 cases passed'
+    assert len((tmp_path/'regression/sine/results-sim.txt').read_text().splitlines()) == 100
+    assert 'constant Ts : time := 10 ns;' in (tmp_path/'regression/constant/ClockGen.vhd').read_text()
+    assert 'constant Ts : time := 1 ns;' in (tmp_path/'ClockGen.vhd').read_text()
+
+
+def test_regress_setup_errors(tmp_path):
+    (tmp_path/'manifest.json').write_text(json.dumps({'cases': [{'name': 'a'}]}))
+    status = run_vertools(tmp_path, 'regress', 'manifest.json', '--jobs', '0')
+    assert status.returncode == 1
+    assert 'at least 1' in status.stdout
+    # A case whose directory cannot be set up fails alone
+    os.mkfifo(tmp_path/'fifo')
+    result = vcommands.RegressCommand.run_case(vregression.Case('a'), None, str(tmp_path/'regression'),
+                                               [str(tmp_path/'fifo')])
+    assert result.status == 1
+    assert 'SpecialFileError' in (tmp_path/'regression/a.log').read_text()
@@ -0,0 +1,170 @@
+import numpy as np
+import pytest
+
+import vertools.compare as vcompare
+import vertools.samples as vsamples
+
+
+def write_samples(path, values, trailing_newline=True):
+    text = '\n'.join(str(v) for v in values)
+    if trailing_newline:
+        text += '\n'
+    path.write_text(text)
+    return str(path)
+
+
+def test_text_reader(tmp_path):
+    values = list(range(-500, 500))
+    reader = vsamples.TextReader(write_samples(tmp_path/'a.txt', values), chunk_size=64)
+    assert len(reader) == len(values)
+    assert np.concatenate(list(reader.blocks())).tolist() == values
+    # Missing trailing newline and empty files
+    reader = vsamples.TextReader(write_samples(tmp_path/'b.txt', values, trailing_newline=False), chunk_size=64)
+    assert len(reader) == len(values)
+    assert np.concatenate(list(reader.blocks())).tolist() == values
+    (tmp_path/'empty.txt').write_text('')
+    reader = vsamples.TextReader(str(tmp_path/'empty.txt'))
+    assert len(reader) == 0
+    assert list(reader.blocks()) == []
+
+
+def test_text_reader_error(tmp_path):
+    reader = vsamples.TextReader(write_samples(tmp_path/'a.txt', [1, 2, 'x', 4]))
+    with pytest.raises(vsamples.TextReader.FormatError, match='line 3'):
+        list(reader.blocks())
+    # Errors of two lines must not cancel out
+    with pytest.raises(vsamples.TextReader.FormatError, match='line 1'):
+        vsamples.parse(b'1 2\n\n')
+    with pytest.raises(vsamples.TextReader.FormatError, match='line 2'):
+        vsamples.parse(b'1\n\n3 4')
+
+
+def test_text_reader_offsets(tmp_path):
+    path = write_samples(tmp_path/'a.txt', [1, 22, 333, 4444], trailing_newline=False)
+    reader = vsamples.TextReader(path, chunk_size=3)
+    assert reader.offsets([0, 1, 2, 3, 4, 10]) == [0, 2, 5, 9, 13, 13]
+    assert reader.count(2, 9) == 2
+    assert reader.count(9, 13) == 1
+    assert np.concatenate(list(reader.blocks(5, 13))).tolist() == [333, 4444]
+    assert reader.offsets([0, 1, 5], 5) == [5, 9, 13]
+    assert reader.boundaries(3) == [0, 5, 9, 13]
+    assert reader.boundaries(100) == [0, 2, 5, 9, 13]
+
+
+def test_text_follower(tmp_path):
+    path = tmp_path/'a.txt'
+    follower = vsamples.TextFollower(str(path))
+    assert len(follower.read()) == 0
+    path.write_text('1\n2\n3')
+    assert follower.read().tolist() == [1, 2]
+    with open(path, 'a') as f:
+        f.write('3\n4')
+    assert follower.read().tolist() == [33]
+    assert follower.read(final=True).tolist() == [4]
+    assert follower.complete
+    follower.close()
+    # Complete files are read chunk by chunk too
+    path.write_text(''.join(f'{i}\n' for i in range(100)) + '100')
+    follower = vsamples.TextFollower(str(path), chunk_size=16)
+    blocks = []
+    while not follower.complete:
+        block = follower.read(final=True)
+        assert len(block) <= 8
+        blocks.append(block)
+    assert np.concatenate(blocks).tolist() == list(range(101))
+    follower.close()
+
+
+@pytest.mark.parametrize('fmt', ['int16le', 'int32be', 'int64', 'npy'])
+def test_binary_reader(tmp_path, fmt):
+    values = np.arange(-500, 500) * 7
+    path = str(tmp_path/'a.bin')
+    if fmt == 'npy':
+        np.save(path, values.astype(np.int32))
+        path += '.npy'
+    else:
+        values.astype(vsamples.raw_dtype(fmt)).tofile(path)
+    reader = vsamples.reader(path, fmt, chunk_size=64)
+    assert len(reader) == len(values)
+    assert np.concatenate(list(reader.blocks())).tolist() == values.tolist()
+    offsets = reader.offsets([0, 100, 2000])
+    assert reader.count(offsets[0], offsets[1]) == 100
+    assert np.concatenate(list(reader.blocks(offsets[1], offsets[2]))).tolist() == values[100:].tolist()
+    # Same results as with text files, also in parallel
+    text = vsamples.TextReader(write_samples(tmp_path/'a.txt', values + (np.arange(1000) == 600)))
+    expected = vcompare.Mismatch(601, values[600], values[600] + 1)
+    assert vcompare.first_mismatch(reader.blocks(), text.blocks(), 0) == expected
+    assert vcompare.parallel_first_mismatch(reader, text, 0, 3) == expected
+
+
+def test_incomplete_reader():
+    class Incomplete(vsamples.Reader):
+        def count(self, start=0, end=None):
+            return 0
+
+    # Missing methods are reported when the reader is built, not when they are called
+    with pytest.raises(TypeError, match='blocks'):
+        Incomplete('a.txt')
+
+
+def test_binary_reader_error(tmp_path):
+    (tmp_path/'a.bin').write_bytes(b'\x00' * 7)
+    with pytest.raises(vsamples.Reader.FormatError):
+        len(vsamples.reader(str(tmp_path/'a.bin'), 'int32'))
+    np.save(tmp_path/'b.npy', np.zeros(3))
+    with pytest.raises(vsamples.Reader.FormatError, match='integer'):
+        len(vsamples.reader(str(tmp_path/'b.npy'), 'npy'))
+    with pytest.raises(ValueError, match='Unknown'):
+        vsamples.reader('a.bin', 'int24')
+    # Unsigned 64-bit samples must not wrap around when converted to int64
+    np.array([1, 2, 1 << 63, 3], dtype='<u8').tofile(tmp_path/'c.bin')
+    reader = vsamples.reader(str(tmp_path/'c.bin'), 'uint64le', chunk_size=16)
+    assert next(reader.blocks()).tolist() == [1, 2]
+    with pytest.raises(vsamples.Reader.FormatError, match='Sample 3 .* 9223372036854775808'):
+        list(reader.blocks())
+    with pytest.raises(vsamples.Reader.FormatError, match='Sample 3'):
+        reader.array()
+    follower = vsamples.follower(str(tmp_path/'c.bin'), 'uint64le', chunk_size=16)
+    assert follower.read().tolist() == [1, 2]
+    with pytest.raises(vsamples.Reader.FormatError, match='Sample 3'):
+        follower.read()
+    follower.close()
+
+
+def test_raw_follower(tmp_path):
+    path = tmp_path/'a.bin'
+    follower = vsamples.follower(str(path), 'int32le')
+    path.write_bytes(np.array([1, 2], dtype='<i4').tobytes() + b'\x03')
+    assert follower.read().tolist() == [1, 2]
+    with open(path, 'ab') as f:
+        f.write(b'\x00\x00\x00')
+    assert follower.read(final=True).tolist() == [3]
+    follower.close()
+
+
+@pytest.mark.parametrize('fmt', ['text', 'npy', 'int32be'])
+def test_writer(tmp_path, fmt, monkeypatch):
+    monkeypatch.setattr(vsamples, 'WRITE_CHUNK', 100)
+    values = np.arange(-500, 500) * 3.7
+    path = str(tmp_path/'a.bin')
+    with vsamples.Writer(path, fmt) as writer:
+        writer.write(values[:250])
+        writer.write(values[250:])
+    assert writer.length == 1000
+    expected = values.astype(np.int64).tolist()
+    assert np.concatenate(list(vsamples.reader(path, fmt).blocks())).tolist() == expected
+    if fmt == 'npy':
+        assert np.load(path).tolist() == expected
+    if fmt == 'text':
+        assert (tmp_path/'a.bin').read_text() == ''.join(f"{int(v)}\n" for v in values)
+
+
+def test_writer_overflow(tmp_path):
+    (tmp_path/'a.bin').write_bytes(b'\1\2')
+    with pytest.raises(ValueError, match='int8'):
+        with vsamples.Writer(str(tmp_path/'a.bin'), 'int8') as writer:
+            writer.write(np.array([1, 2]))
+            writer.write(np.array([1, 200]))
+    # The previous file is kept, without any temporary file left over
+    assert [p.name for p in tmp_path.iterdir()] == ['a.bin']
+    assert (tmp_path/'a.bin').read_bytes() == b'\1\2'
@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+import time
+
+import vertools
+
+
+def run_client(cwd, socket, *args):
+    env = {**os.environ, 'PYTHONPATH': str(vertools.rootdir)}
+    return subprocess.Popen([sys.executable, '-m', 'vertools.client', '--socket', socket, *args], cwd=cwd,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+
+
+def test_server(tmp_path):
+    socket = str(tmp_path/'server.sock')
+    env = {**os.environ, 'PYTHONPATH': str(vertools.rootdir)}
+    server = subprocess.Popen([sys.executable, '-m', 'vertools', 'serve', '--socket', socket], cwd=tmp_path,
+                              stdout=subprocess.DEVNULL, env=env)
+    try:
+        deadline = time.monotonic() + 30
+        while not os.path.exists(socket):
+            assert time.monotonic() < deadline and server.poll() is None
+            time.sleep(0.05)
+        # Concurrent requests, each in its own working directory and with its own parameters
+        clients = []
+        for name, reference in ('pass', [1, 2, 3]), ('fail', [1, 2, 5]):
+            folder = tmp_path/name
+            folder.mkdir()
+            (folder/'sim.txt').write_text('1\n2\n3\n')
+            (folder/'ref.txt').write_text(''.join(f'{value}\n' for value in reference))
+            clients.append(run_client(folder, socket, 'compare', '-s', 'sim.txt', '-r', 'ref.txt', '-t', '1'))
+        (passed, _), (failed, _) = [client.communicate(timeout=30) for client in clients]
+        assert clients[0].returncode == 0
+        assert 'All results are matching' in passed
+        assert clients[1].returncode == 3
+        assert 'mismatch on line 3: reference=5, simulation=3' in failed
+        # Invalid command lines fail in the child, without stopping the server
+        client = run_client(tmp_path, socket, 'no-such-command')
+        _, errors = client.communicate(timeout=30)
+        assert client.returncode == 2
+        assert 'invalid choice' in errors
+        # Nested servers are refused, whatever the options before the command
+        for args in ['serve'], ['--verbosity', 'status', 'serve', '--socket', str(tmp_path/'nested.sock')]:
+            client = run_client(tmp_path, socket, *args)
+            _, errors = client.communicate(timeout=30)
+            assert client.returncode == 1
+            assert 'cannot start another server' in errors
+        assert not os.path.exists(tmp_path/'nested.sock')
+        assert server.poll() is None
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    assert not os.path.exists(socket)
+    # Without server, the client runs the command itself
+    client = run_client(tmp_path/'fail', socket, 'compare', '-s', 'sim.txt', '-r', 'ref.txt', '-t', '2')
+    client.communicate(timeout=30)
+    assert client.returncode == 0
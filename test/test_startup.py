@@ -0,0 +1,47 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import vertools
+
+# Maximum import time of the command line interface, relative to the cost of importing scipy.signal. Both are
+# measured on the same machine, so that the check does not depend on its speed or load
+STARTUP_BUDGET = 0.5
+
+
+def import_times(cwd, *args, command=('-m', 'vertools')):
+    """Run vertools, or another Python command, with -X importtime
+    Returns:
+        Dict[str, float]: cumulative import time of each imported module (s)
+    """
+    env = {**os.environ, 'PYTHONPATH': str(vertools.rootdir)}
+    status = subprocess.run([sys.executable, '-X', 'importtime', *command, *args], cwd=cwd,
+                            capture_output=True, text=True, env=env)
+    times = {}
+    for line in status.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        times[name.strip()] = int(cumulative) * 1e-6
+    return times
+
+
+@pytest.mark.parametrize('args', [['--help'], ['clean']])
+def test_startup_without_numpy(tmp_path, args):
+    times = import_times(tmp_path, *args)
+    assert 'vertools.cli' in times
+    assert not any(name.split('.')[0] in ('numpy', 'scipy') for name in times)
+    scipy = import_times(tmp_path, command=('-c', 'import scipy.signal')).get('scipy.signal', None)
+    if scipy is not None:
+        assert times['vertools.cli'] < STARTUP_BUDGET * scipy
+
+
+def test_compare_without_scipy(tmp_path):
+    for name in 'sim.txt', 'ref.txt':
+        (tmp_path/name).write_text('1\n2\n3\n')
+    times = import_times(tmp_path, 'compare', '-s', 'sim.txt', '-r', 'ref.txt')
+    assert 'numpy' in times
+    assert 'vertools.waveforms' not in times
+    assert not any(name.split('.')[0] == 'scipy' for name in times)
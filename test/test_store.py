@@ -0,0 +1,94 @@
+import io
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import vertools
+import vertools.compare as vcompare
+import vertools.samples as vsamples
+import vertools.store as vstore
+
+
+def write_samples(path, values, trailing_newline=True):
+    text = '\n'.join(str(v) for v in values)
+    if trailing_newline:
+        text += '\n'
+    path.write_text(text)
+    return str(path)
+
+
+def run_compare(cwd, *args):
+    env_path = str(vertools.rootdir)
+    return subprocess.run([sys.executable, '-m', 'vertools', 'compare', *args], cwd=cwd,
+                          capture_output=True, text=True, env={**os.environ, 'PYTHONPATH': env_path})
+
+
+def test_store(tmp_path):
+    ref = np.arange(1000)
+    reader = vsamples.TextReader(write_samples(tmp_path/'ref.txt', ref), chunk_size=100)
+    cached, index = vstore.cached(reader)
+    assert cached.array().tolist() == ref.tolist()
+    assert [chunk[:4] for chunk in index['chunks']] == [chunk[:4] for chunk in vstore.scan(reader)]
+    # Reused until the results file changes
+    mtime = os.stat(cached.path).st_mtime_ns
+    assert vstore.cached(reader)[1] == index
+    assert os.stat(cached.path).st_mtime_ns == mtime
+    write_samples(tmp_path/'ref.txt', ref + 1)
+    cached, new_index = vstore.cached(reader)
+    assert new_index['digest'] != index['digest']
+    assert cached.array().tolist() == (ref + 1).tolist()
+
+
+def test_delta_first_mismatch(tmp_path):
+    ref = np.arange(1000)
+    simulation = vsamples.TextReader(write_samples(tmp_path/'sim.txt', ref), chunk_size=100)
+    chunks = vstore.scan(simulation)
+    assert vcompare.delta_first_mismatch(simulation, chunks, ref, 0) == (None, 0)
+    assert vcompare.delta_first_mismatch(simulation, chunks, ref, 0, chunks) == (None, len(chunks))
+    sim = ref.copy()
+    sim[500] = 5000
+    write_samples(tmp_path/'sim.txt', sim)
+    new_chunks = vstore.scan(simulation)
+    mismatch, skipped = vcompare.delta_first_mismatch(simulation, new_chunks, ref, 0, chunks)
+    assert mismatch == vcompare.Mismatch(501, 5000, 500)
+    # Chunks preceding the modified one are unchanged
+    assert skipped == len([chunk for chunk in new_chunks if chunk[2] + chunk[3] <= 500]) > 0
+
+
+def test_compare_command_store(tmp_path):
+    write_samples(tmp_path/'sim.txt', [1, 2, 3, 4])
+    write_samples(tmp_path/'ref.txt', [1, 2, 3, 4])
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt')
+    assert status.returncode == 0
+    assert not (tmp_path/'ref.txt.vtcache.npy').exists()
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--store')
+    assert status.returncode == 0
+    assert '0 of 1 chunks unchanged' in status.stdout
+    assert (tmp_path/'ref.txt.vtcache.npy').exists()
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--store')
+    assert status.returncode == 0
+    assert '1 of 1 chunks unchanged' in status.stdout
+    write_samples(tmp_path/'sim.txt', [1, 2, 5, 4])
+    status = run_compare(tmp_path, '-s', 'sim.txt', '-r', 'ref.txt', '--store')
+    assert status.returncode == 3
+    assert 'mismatch on line 3: reference=3, simulation=5' in status.stdout
+
+
+def test_compare_read_only_store(tmp_path, monkeypatch):
+    def read_only(path, format='text'):
+        raise PermissionError(13, 'Permission denied', path)
+
+    write_samples(tmp_path/'sim.txt', [1, 2, 3])
+    write_samples(tmp_path/'ref.txt', [1, 2, 3])
+    monkeypatch.setattr(vsamples, 'Writer', read_only)
+    reader = vsamples.TextReader(str(tmp_path/'ref.txt'))
+    with pytest.raises(PermissionError):
+        vstore.cached(reader)
+    messages = io.StringIO()
+    assert vertools.run('compare', ['-s', 'sim.txt', '-r', 'ref.txt', '--store'], cwd=str(tmp_path),
+                        stdout=messages) == 0
+    assert 'cannot be stored' in messages.getvalue()
+    assert 'All results are matching' in messages.getvalue()
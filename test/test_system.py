@@ -0,0 +1,46 @@
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+
+import vertools.system as vsystem
+
+
+def test_run_async():
+    async def main():
+        logs = [io.StringIO(), io.StringIO()]
+        commands = [vsystem.run_async(f"sleep 1 && echo {i} && echo err{i} >&2", stdout=log, stderr=log)
+                    for i, log in enumerate(logs)]
+        return logs, await asyncio.gather(*commands)
+    start = time.monotonic()
+    logs, processes = asyncio.run(main())
+    assert time.monotonic() - start < 1.9
+    assert [sorted(log.getvalue().splitlines()) for log in logs] == [['0', 'err0'], ['1', 'err1']]
+    assert all(process.returncode == 0 and process.wall_time >= 1 for process in processes)
+
+
+def test_run_bash():
+    process = vsystem.run_bash('python3 -c "sum(range(10**7))"; exit 3', stdout=False)
+    assert process.returncode == 3
+    assert process.user_time > 0
+    assert process.max_rss > 0
+    with pytest.raises(vsystem.TimeoutExpired):
+        vsystem.run_bash('sleep 30', timeout=0.5)
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    start = time.monotonic()
+    with pytest.raises(vsystem.CancelledError):
+        vsystem.run_bash('sleep 30', cancel=cancel)
+    assert time.monotonic() - start < 5
+
+
+def test_run_bash_in_event_loop(monkeypatch):
+    async def main():
+        return vsystem.run_bash('exit 4', stdout=False)
+    assert asyncio.run(main()).returncode == 4
+    # Without pidfds, the termination of the process is polled
+    monkeypatch.delattr(vsystem.os, 'pidfd_open', raising=False)
+    process = vsystem.run_bash('sleep 0.2; exit 5')
+    assert process.returncode == 5 and process.wall_time >= 0.2
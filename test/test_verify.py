@@ -0,0 +1,200 @@
+import hashlib
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import vertools
+import vertools.commands as vcommands
+import vertools.compare as vcompare
+import vertools.incremental as vincremental
+
+CLOCKGEN = """architecture beh of ClockGen is
+  constant Ts : time := 1 ns;
+begin
+end beh;
+"""
+
+
+def setup_project(path, simulation, reference):
+    (path/'ClockGen.vhd').write_text(CLOCKGEN)
+    (path/'vertools.config').write_text(f"[Simulation]\ncommand = {simulation}\n\n[Reference]\ncommand = {reference}\n")
+
+
+def run_vertools(cwd, *args):
+    env = {**os.environ, 'PYTHONPATH': str(vertools.rootdir)}
+    return subprocess.run([sys.executable, '-m', 'vertools', *args], cwd=cwd, capture_output=True, text=True, env=env)
+
+
+def test_verify_concurrent(tmp_path):
+    # Each command records when it runs: the two periods overlap only if the commands run concurrently
+    setup_project(tmp_path, *[f'date +%s.%N > start-{name}.txt && sleep 1 && date +%s.%N > end-{name}.txt && '
+                              f'seq 1 10 > results-{name}.txt' for name in ('sim', 'ref')])
+    status = run_vertools(tmp_path, 'verify')
+    assert status.returncode == 0, status.stdout
+    assert 'All results are matching' in status.stdout
+    (sim_start, sim_end), (ref_start, ref_end) = [
+        [float((tmp_path/f'{event}-{name}.txt').read_text()) for event in ('start', 'end')] for name in ('sim', 'ref')]
+    assert sim_start < ref_end and ref_start < sim_end
+    assert 'constant Ts : time := 10 ns;' in (tmp_path/'ClockGen.vhd').read_text()
+    # Outputs of the two commands are not interleaved
+    lines = status.stdout.splitlines()
+    sim_lines = [i for i, line in enumerate(lines) if 'imulation' in line]
+    ref_lines = [i for i, line in enumerate(lines) if 'eference' in line and 'reference=' not in line]
+    assert max(sim_lines) < min(ref_lines) or max(ref_lines) < min(sim_lines)
+
+
+def test_verify_cancel(tmp_path):
+    setup_project(tmp_path, 'true', 'sleep 30 && seq 1 10 > results-ref.txt')
+    start = time.monotonic()
+    status = run_vertools(tmp_path, 'verify')
+    assert status.returncode == 5
+    assert time.monotonic() - start < 10
+    assert 'Cancelled' in status.stdout
+
+
+def test_verify_stream(tmp_path):
+    setup_project(tmp_path, 'seq 1 10 > results-sim.txt && sleep 30', '(seq 1 5; echo 0) > results-ref.txt && sleep 30')
+    start = time.monotonic()
+    status = run_vertools(tmp_path, 'verify', '--stream')
+    assert status.returncode == 3
+    assert time.monotonic() - start < 10
+    assert 'mismatch on line 6: reference=0, simulation=6' in status.stdout
+    setup_project(tmp_path, 'seq 1 10 > results-sim.txt', 'sleep 1 && seq 1 10 > results-ref.txt')
+    status = run_vertools(tmp_path, 'verify', '--stream')
+    assert status.returncode == 0, status.stdout
+    assert 'All results are matching' in status.stdout
+    setup_project(tmp_path, 'seq 1 10 > results-sim.txt', 'sleep 1 && seq 1 12 > results-ref.txt')
+    status = run_vertools(tmp_path, 'verify', '--stream')
+    assert status.returncode == 2
+    assert 'results-sim.txt has 10 lines; results-ref.txt has 12 lines' in status.stdout
+    # Invalid results are reported as errors while they are generated
+    setup_project(tmp_path, 'seq 1 10 > results-sim.txt && sleep 30', '(seq 1 5; echo x) > results-ref.txt && sleep 30')
+    start = time.monotonic()
+    status = run_vertools(tmp_path, 'verify', '--stream')
+    assert status.returncode == 1
+    assert time.monotonic() - start < 10
+    assert 'Invalid sample on line 6' in status.stdout
+    assert 'Traceback' not in status.stderr
+
+
+def test_simulate_timeout(tmp_path):
+    setup_project(tmp_path, 'echo started && sleep 30', 'true')
+    start = time.monotonic()
+    status = run_vertools(tmp_path, 'simulate', '--timeout', '1s')
+    assert status.returncode == 6
+    assert time.monotonic() - start < 10
+    assert 'timed out' in status.stdout
+    assert (tmp_path/'log-sim.txt').read_text() == 'started\n'
+
+
+def test_verify_profile(tmp_path):
+    setup_project(tmp_path, 'seq 1 10 > results-sim.txt', 'sleep 0.5 && seq 1 10 > results-ref.txt')
+    status = run_vertools(tmp_path, '--profile', 'profile.jsonl', 'verify')
+    assert status.returncode == 0, status.stdout
+    records = [json.loads(line) for line in (tmp_path/'profile.jsonl').read_text().splitlines()]
+    assert len({record['run'] for record in records}) == 1
+    phases = {(record['command'], record['phase']) for record in records if record['kind'] == 'phase'}
+    for command in 'VerifyCommand', 'SimulateCommand', 'ReferenceCommand', 'CompareCommand':
+        assert {(command, 'setup'), (command, 'run'), (command, 'exit')} <= phases
+    processes = {record['args']: record for record in records if record['kind'] == 'process'}
+    assert processes['rm -rf work/']['command'] == 'SimulateCommand'
+    reference = processes['sleep 0.5 && seq 1 10 > results-ref.txt']
+    assert reference['command'] == 'ReferenceCommand'
+    assert reference['wall_time'] >= 0.5 and reference['returncode'] == 0 and reference['max_rss'] > 0
+    assert records[-1]['kind'] == 'total'
+    # No records without the flag
+    status = run_vertools(tmp_path, 'verify')
+    assert status.returncode == 0
+    assert len((tmp_path/'profile.jsonl').read_text().splitlines()) == len(records)
+
+
+def test_file_digest(tmp_path):
+    content = os.urandom(vincremental.HASH_CHUNK * 2 + 10)
+    (tmp_path/'file').write_bytes(content)
+    assert vincremental.file_digest(str(tmp_path/'file')) == hashlib.sha256(content).hexdigest()
+    assert vincremental.file_digest(str(tmp_path/'missing')) is None
+
+
+def test_verify_incremental(tmp_path):
+    setup_project(tmp_path, 'echo x >> runs-sim.txt && cat inputs.txt > results-sim.txt',
+                  'echo x >> runs-ref.txt && cat inputs.txt > results-ref.txt')
+    (tmp_path/'inputs.txt').write_text('1\n2\n')
+    (tmp_path/'design.vhd').write_text('-- v1\n')
+    (tmp_path/'tb.vhd').write_text('-- v1\n')
+    config = (tmp_path/'vertools.config').read_text()
+    (tmp_path/'vertools.config').write_text(config.replace('[Reference]', 'sources = tb.vhd\n\n[Reference]') +
+                                            "sources = design*.vhd\n")
+
+    def runs():
+        return [len((tmp_path/f"runs-{name}.txt").read_text().splitlines()) for name in ('sim', 'ref')]
+
+    assert run_vertools(tmp_path, 'verify').returncode == 0
+    assert run_vertools(tmp_path, 'verify').returncode == 0
+    assert runs() == [1, 1]
+    # Reference sources changed
+    (tmp_path/'design.vhd').write_text('-- v2\n')
+    assert run_vertools(tmp_path, 'verify').returncode == 0
+    assert runs() == [1, 2]
+    # Inputs changed
+    (tmp_path/'inputs.txt').write_text('1\n3\n')
+    assert run_vertools(tmp_path, 'verify').returncode == 0
+    assert runs() == [2, 3]
+    # Results modified, or forced run
+    (tmp_path/'results-sim.txt').write_text('1\n4\n')
+    status = run_vertools(tmp_path, 'verify')
+    assert status.returncode == 0, status.stdout
+    assert runs() == [3, 3]
+    assert run_vertools(tmp_path, 'verify', '--force').returncode == 0
+    assert runs() == [4, 4]
+    # Without tracked sources, the commands always run
+    (tmp_path/'vertools.config').write_text(config + "sources = missing*.vhd\n")
+    status = run_vertools(tmp_path, 'verify')
+    assert status.returncode == 0, status.stdout
+    assert runs() == [5, 5]
+    assert 'No sources are tracked' in status.stdout
+
+
+def test_work_policy(tmp_path):
+    (tmp_path/'ClockGen.vhd').write_text(CLOCKGEN)
+    (tmp_path/'vertools.config').write_text("[Simulation]\n"
+                                            "command = (test -d work || (mkdir work && echo x >> compiles.txt)) && "
+                                            "seq 1 3 > results-sim.txt\n"
+                                            "sources = design.vhd\n"
+                                            "work_policy = invalidate-on-source-change\n")
+    (tmp_path/'design.vhd').write_text('-- v1\n')
+
+    def compiles():
+        return len((tmp_path/'compiles.txt').read_text().splitlines())
+
+    assert run_vertools(tmp_path, 'simulate').returncode == 0
+    assert run_vertools(tmp_path, 'simulate', '--force').returncode == 0
+    assert compiles() == 1
+    (tmp_path/'design.vhd').write_text('-- v2\n')
+    assert run_vertools(tmp_path, 'simulate').returncode == 0
+    assert compiles() == 2
+    # Same content, new mtime
+    (tmp_path/'design.vhd').write_text('-- v2\n')
+    assert run_vertools(tmp_path, 'simulate', '--force').returncode == 0
+    assert compiles() == 2
+    assert run_vertools(tmp_path, 'simulate', '--force', '--work-policy', 'clean').returncode == 0
+    assert compiles() == 3
+    assert run_vertools(tmp_path, 'simulate', '--force', '--work-policy', 'keep').returncode == 0
+    assert compiles() == 3
+    assert run_vertools(tmp_path, 'clean').returncode == 0
+    assert (tmp_path/'work').exists()
+    assert run_vertools(tmp_path, 'clean', '--work').returncode == 0
+    assert not (tmp_path/'work').exists()
+
+
+def test_verify_stream_lagging(tmp_path, monkeypatch):
+    # Tiny reads and lag, so that the reference runs far ahead of the simulation
+    monkeypatch.setattr(vcompare, 'MAX_LAG', 4)
+    monkeypatch.setattr(vcommands, 'STREAM_CHUNK_SIZE', 8)
+    for lines, expected in (10, 0), (30, 2):
+        setup_project(tmp_path, 'seq 1 10 > results-sim.txt', f'seq 1 {lines} > results-ref.txt')
+        messages = io.StringIO()
+        assert vertools.run('verify', ['--stream'], cwd=str(tmp_path), stdout=messages) == expected
+    assert 'results-sim.txt has 10 lines; results-ref.txt has 30 lines' in messages.getvalue()
@@ -0,0 +1,69 @@
+import engfmt
+import numpy as np
+import pytest
+
+import vertools.context as vcontext
+import vertools.waveforms as vwaveforms
+
+
+def make_context(**parameters):
+    context = vcontext.Context()
+    context.append_local(vcontext.Scope({
+        'Input': {'tstart': engfmt.Quantity('0ns'), 'tend': engfmt.Quantity('10us'), 'tstep': engfmt.Quantity('3ns')},
+        'CommandLine': parameters
+    }))
+    return context
+
+
+@pytest.mark.parametrize('parameters', [
+    {'waveform': 'constant', 'value': 7},
+    {'waveform': 'step', 't0': 5e-6, 'y0': -3, 'y1': 12},
+    {'waveform': 'sine', 'amplitude': 1000, 'frequency': engfmt.Quantity('1MHz'), 'phase': 0.3},
+    {'waveform': 'chirp', 'amplitude': 1000, 'duration': 1e-5, 'f0': 1e5, 'f1': 1e7, 'method': 'quadratic'},
+])
+def test_generate_blocks(parameters):
+    context = make_context(**parameters)
+    time = np.arange(0, 10e-6, 3e-9)[:3333]
+    expected = {
+        'constant': lambda: np.full_like(time, 7),
+        'step': lambda: np.where(time < 5e-6, -3, 12),
+        'sine': lambda: 1000 * np.sin(2 * np.pi * 1e6 * time + 0.3),
+        'chirp': lambda: 1000 * vwaveforms.sp.signal.chirp(time, 1e5, 1e-5, 1e7, 'quadratic'),
+    }[parameters['waveform']]()
+    blocks = list(vwaveforms.generate_blocks(context, size=1000))
+    assert [len(block) for block in blocks] == [1000, 1000, 1000, 333]
+    assert np.concatenate(blocks) == pytest.approx(expected)
+    assert vwaveforms.generate(context) == pytest.approx(expected)
+
+
+def test_unknown_waveform():
+    with pytest.raises(ValueError, match='Unknown waveform'):
+        list(vwaveforms.generate_blocks(make_context(waveform='square')))
+
+
+def test_quantize():
+    samples = np.array([-2.5, -1.5, -0.4, 0.5, 1.5, 2.7, 300.2, -300.2])
+    assert vwaveforms.quantize(samples.copy()).tolist() == [-2, -1, 0, 0, 1, 2, 300, -300]
+    assert vwaveforms.quantize(samples.copy(), rounding='floor').tolist() == [-3, -2, -1, 0, 1, 2, 300, -301]
+    assert vwaveforms.quantize(samples.copy(), rounding='nearest').tolist() == [-3, -2, 0, 1, 2, 3, 300, -300]
+    assert vwaveforms.quantize(samples.copy(), rounding='even').tolist() == [-2, -2, 0, 0, 2, 3, 300, -300]
+    assert vwaveforms.quantize(samples.copy(), bits=8).tolist() == [-2, -1, 0, 0, 1, 2, 127, -128]
+    assert vwaveforms.quantize(samples.copy(), bits=8, saturate=False).tolist() == [-2, -1, 0, 0, 1, 2, 44, -44]
+    assert vwaveforms.quantize(samples.copy(), bits=8, signed=False).tolist() == [0, 0, 0, 0, 1, 2, 255, 0]
+    integers = np.array([-129, 0, 200, 256])
+    assert vwaveforms.quantize(integers, bits=8, signed=False, saturate=False).tolist() == [127, 0, 200, 0]
+    assert integers.tolist() == [-129, 0, 200, 256]
+    # Float64 samples are rounded and converted without copies
+    values = samples.copy()
+    quantized = vwaveforms.quantize(values, bits=8, rounding='nearest')
+    assert np.shares_memory(quantized, values)
+    assert quantized.tolist() == [-3, -2, 0, 1, 2, 3, 127, -128]
+    # Saturation at the int64 limits, without wrapping around
+    for bits in None, 64:
+        for dtype in np.float64, np.float32:
+            quantized = vwaveforms.quantize(np.array([1e19, -1e19, 1e3], dtype=dtype), bits=bits)
+            assert quantized[0] > 2 ** 62 and quantized[1] == -2 ** 63 and quantized[2] == 1000
+    with pytest.raises(ValueError):
+        vwaveforms.quantize(samples, bits=64, signed=False)
+    with pytest.raises(ValueError):
+        vwaveforms.quantize(samples, rounding='up')
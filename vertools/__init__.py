@@ -2,3 +2,11 @@ import os
 import pathlib
 
 rootdir = pathlib.Path(os.path.dirname(__file__)).parent
+
+
+def __getattr__(name):
+    # The API imports the commands: only load it when used, to keep `import vertools` light
+    if name == 'run':
+        from vertools.api import run
+        return run
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
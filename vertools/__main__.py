@@ -1,35 +1,33 @@
-import os
+import time
 
 import vertools
+import vertools.api
 import vertools.cli
-import vertools.context
+import vertools.output
+import vertools.profiling
 
 import engfmt
 
-def main():
-    """Main function"""
+def main(argv=None, global_config=None):
+    """Main function
+    Args:
+        argv (List[str]): command line arguments, defaults to sys.argv
+        global_config (vertools.context.Scope): already parsed default configuration, which is then modified
+    """
+    start = time.perf_counter()
     # Setup
     engfmt.set_preferences(spacer=' ')
-    # Generate context
-    context = vertools.context.Context()
-    global_config = vertools.context.Scope.from_config(vertools.rootdir/'assets/default.config')
-    context.append_local(global_config)
-    # Parse command line arguments
-    args = vertools.cli.parse()
-    # Check for a local config
-    if args.local_config is not None:
-        local_config = vertools.context.Scope.from_config(args.local_config)
-        context.append_local(local_config)
-    else:
-        # Try to look for default "vertools.config" file
-        if 'vertools.config' in os.listdir(os.getcwd()):
-            local_config = vertools.context.Scope.from_config('vertools.config')
-            context.append_local(local_config)
-    # Push command line arguments into context
-    cl_config = vertools.context.Scope(vertools.cli.Contextualize.SECTIONS)
-    context.append_local(cl_config)
+    # Parse command line arguments and generate context
+    args = vertools.cli.parse(argv)
+    vertools.output.configure(args.verbosity, args.output_format, {'always': True, 'never': False}.get(args.color))
+    context = vertools.api.build_context(args, args.local_config, global_config=global_config)
     # Call the requested command's associated function
-    args.func(args, context)()
+    if args.profile is not None:
+        vertools.profiling.enable(args.profile)
+    try:
+        args.func(args, context)()
+    finally:
+        vertools.profiling.total(start)
 
 
 if __name__ == '__main__':
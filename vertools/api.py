@@ -0,0 +1,115 @@
+import contextlib
+import os
+import threading
+
+import engfmt
+
+import vertools
+import vertools.cli as cli
+import vertools.context as vcontext
+import vertools.output as output
+
+
+class _WorkingDirectory:
+    """Process-wide working directory shared by concurrent runs. Runs in the same directory overlap; a run in another
+    directory waits until none is left, then changes directory. The original directory is restored after the last
+    run.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._users = 0
+        self._home = None
+        self._current = None
+
+    @contextlib.contextmanager
+    def use(self, path=None):
+        """Run in a directory
+        Args:
+            path (str): directory, relative to the original directory; None for the original directory
+        """
+        with self._condition:
+            while True:
+                if self._users == 0:
+                    self._home = os.getcwd()
+                target = os.path.realpath(os.path.join(self._home, path) if path is not None else self._home)
+                if self._users == 0 or target == self._current:
+                    break
+                self._condition.wait()
+            if self._users == 0:
+                os.chdir(target)
+                self._current = target
+            self._users += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._users -= 1
+                if self._users == 0:
+                    os.chdir(self._home)
+                    self._condition.notify_all()
+
+
+_directory = _WorkingDirectory()
+
+
+def build_context(args, config=None, overrides=None, global_config=None):
+    """Build the context of a command, from the most global to the most local scope: default configuration,
+    project configuration, command line arguments and overrides
+    Args:
+        args (argparse.Namespace): parsed command line arguments
+        config (str): project configuration file, None for `vertools.config` if it exists
+        overrides (Dict[str, dict]): parameter values by section, converted as in configuration files
+        global_config (vertools.context.Scope): already parsed default configuration, which is then modified
+    Returns:
+        vertools.context.Context
+    """
+    context = vcontext.Context()
+    if global_config is None:
+        global_config = vcontext.Scope.from_config(vertools.rootdir/'assets/default.config')
+    context.append_local(global_config)
+    if config is None and os.path.isfile('vertools.config'):
+        config = 'vertools.config'
+    if config is not None:
+        context.append_local(vcontext.Scope.from_config(config))
+    context.append_local(vcontext.Scope(cli.sections(args)))
+    if overrides:
+        context.append_local(vcontext.Scope.from_dict(overrides))
+    return context
+
+
+def run(command, args=(), overrides=None, cwd=None, config=None, stdout=None, verbosity=None, format=None):
+    """Run a vertools command, as `vertools COMMAND ARGS...` would.
+    Every call has its own context, so that calls can run concurrently in threads or in process pools. Calls in
+    different working directories are serialized, as the working directory is shared by the whole process. Calls may
+    be made from a thread running an asyncio event loop, but block it until the command terminates: coroutines should
+    run them in an executor instead.
+    Args:
+        command (str): command name, such as `verify`
+        args (Iterable[str]): command line arguments of the command
+        overrides (Dict[str, dict]): parameter values by section, overriding configuration files and arguments
+        cwd (str): project directory, None for the current directory
+        config (str): project configuration file, relative to the project directory. None for `vertools.config` if
+            it exists
+        stdout (io.TextIOBase): stream receiving the messages of the command, None for sys.stdout
+        verbosity (str): least important messages printed: error, warning, status or update. None for the
+            process-wide setting
+        format (str): `text`, or `json` for JSON lines. None for the process-wide setting
+    Returns:
+        int: exit status of the command, 0 on success
+    """
+    engfmt.set_preferences(spacer=' ')
+    destination = None
+    if format is not None:
+        destination = output.sink(format, stdout)
+    elif stdout is not None:
+        destination = output.current().to(stdout)
+    with _directory.use(cwd), output.using(destination, verbosity):
+        try:
+            parsed = cli.parse([command, *args])
+            parsed.func(parsed, build_context(parsed, config, overrides))()
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code if e.code is not None else 0
+            return 1
+    return 0
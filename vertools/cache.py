@@ -0,0 +1,201 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import stat
+import tempfile
+
+# Version of the cached content, to be increased whenever the generated files change for the same description
+VERSION = 1
+STATS_FILE = 'stats.json'
+LOCK_FILE = 'lock'
+ENTRY_SUFFIX = '.stimulus'
+
+
+class Cache:
+    """Content-addressed store of generated files, with size-bounded LRU eviction.
+    Entries are read-only files named after the hash of their description. They are served by hardlinking them to
+    their destination (or by copying them across file systems), and their modification time records their last use.
+    The cache can be shared by concurrent processes.
+    Attributes:
+        folder (str): cache folder
+        max_size (int): maximum total size of the entries (bytes)
+    """
+
+    def __init__(self, folder, max_size):
+        self.folder = os.path.expanduser(folder)
+        self.max_size = max_size
+        os.makedirs(self.folder, exist_ok=True)
+
+    @staticmethod
+    def key(description):
+        """Compute the key of a cache entry
+        Args:
+            description (dict): JSON serializable description of everything the content depends on
+        Returns:
+            str
+        """
+        text = json.dumps({'version': VERSION, **description}, sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def path(self, key):
+        """Get the path of a cache entry
+        Args:
+            key (str): entry key
+        Returns:
+            str
+        """
+        return os.path.join(self.folder, key + ENTRY_SUFFIX)
+
+    def contains(self, key, path):
+        """Check whether a file is already linked to a cache entry
+        Args:
+            key (str): entry key
+            path (str): path to the file
+        Returns:
+            bool
+        """
+        try:
+            return os.path.samefile(self.path(key), path)
+        except OSError:
+            return False
+
+    def fetch(self, key, destination):
+        """Serve a cache entry if it exists, counting a hit or a miss
+        Args:
+            key (str): entry key
+            destination (str): path at which the entry is made available. It must not exist
+        Returns:
+            bool: True on a hit, False on a miss
+        """
+        try:
+            self.serve(key, destination)
+        except FileNotFoundError:
+            # Not cached, or evicted in the meantime
+            self._count('misses')
+            return False
+        self._count('hits')
+        return True
+
+    def serve(self, key, destination):
+        """Make a cache entry available at a given path and mark it as recently used
+        Args:
+            key (str): entry key
+            destination (str): path at which the entry is made available. It must not exist
+        Raises:
+            FileNotFoundError: when the entry does not exist
+        """
+        entry = self.path(key)
+        os.utime(entry)
+        try:
+            os.link(entry, destination)
+        except FileNotFoundError:
+            raise
+        except OSError:
+            # Different file systems
+            shutil.copyfile(entry, destination)
+
+    def touch(self, key):
+        """Record a hit on an entry which is already in use
+        Args:
+            key (str): entry key
+        """
+        os.utime(self.path(key))
+        self._count('hits')
+
+    def staging(self):
+        """Create a temporary file in the cache folder, to be filled and then stored
+        Returns:
+            str: path to the temporary file
+        """
+        descriptor, path = tempfile.mkstemp(dir=self.folder, suffix='.tmp')
+        os.close(descriptor)
+        return path
+
+    def store(self, key, source):
+        """Move a file into the cache, then evict the least recently used entries exceeding the size limit
+        Args:
+            key (str): entry key
+            source (str): path to the file, usually created by staging
+        """
+        # Entries are shared by hardlinks: protect them from being modified in place
+        os.chmod(source, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+        os.replace(source, self.path(key))
+        self.evict(keep=key)
+
+    def entries(self):
+        """List the cache entries
+        Returns:
+            List[os.DirEntry]: entries, from the least to the most recently used
+        """
+        with os.scandir(self.folder) as iterator:
+            entries = [entry for entry in iterator if entry.name.endswith(ENTRY_SUFFIX)]
+        return sorted(entries, key=lambda entry: entry.stat().st_mtime)
+
+    def evict(self, keep=None):
+        """Remove the least recently used entries until the cache fits in its maximum size
+        Args:
+            keep (str): key of an entry which must not be evicted
+        """
+        with self._lock():
+            entries = self.entries()
+            size = sum(entry.stat().st_size for entry in entries)
+            evicted = 0
+            for entry in entries:
+                if size <= self.max_size:
+                    break
+                if keep is not None and entry.name == keep + ENTRY_SUFFIX:
+                    continue
+                size -= entry.stat().st_size
+                os.remove(entry.path)
+                evicted += 1
+        if evicted > 0:
+            self._count('evictions', evicted)
+
+    def clear(self):
+        """Remove all the entries and reset the statistics"""
+        with self._lock():
+            for entry in self.entries():
+                os.remove(entry.path)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(self.folder, STATS_FILE))
+
+    def stats(self):
+        """Get the cache statistics
+        Returns:
+            dict: hits, misses and evictions counts, number of entries and their total size (bytes)
+        """
+        with self._lock():
+            stats = self._read_stats()
+        entries = self.entries()
+        stats['entries'] = len(entries)
+        stats['size'] = sum(entry.stat().st_size for entry in entries)
+        return stats
+
+    def _read_stats(self):
+        """Read the statistics file"""
+        try:
+            with open(os.path.join(self.folder, STATS_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def _count(self, counter, increment=1):
+        """Increase a statistics counter"""
+        with self._lock():
+            stats = self._read_stats()
+            stats[counter] = stats.get(counter, 0) + increment
+            with open(os.path.join(self.folder, STATS_FILE), 'w') as f:
+                json.dump(stats, f)
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """Hold the cache lock, shared by all the processes using the cache"""
+        with open(os.path.join(self.folder, LOCK_FILE), 'w') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
@@ -1,11 +1,18 @@
 import argparse
 
 import vertools.commands as commands
+import vertools.context as context
 import engfmt
 
 
+# Prefix of the namespace attributes holding the parameters pushed into the context, as PREFIX + section + ':' +
+# parameter
+PREFIX = 'context:'
+
+
 class Contextualize(argparse.Action):
-    SECTIONS = {}
+    """Action pushing an argument into a section of the context. Values are stored in the parsed namespace, so that
+    concurrent parses do not share any state; see sections"""
 
     def __init__(self,
                  option_strings,
@@ -27,21 +34,35 @@ class Contextualize(argparse.Action):
             self.parameters = parameters
         else:
             self.parameters = self.dest
-        if self.section not in self.SECTIONS:
-            self.SECTIONS[section] = {}
 
     def __call__(self, parser, namespace, values, option_string=None):
         if isinstance(values, list):
             if len(values) == 0:
-                values = True
+                # Flags push their constant, True by default
+                values = self.const if self.const is not None else True
         # Normally set the attribute
         setattr(namespace, self.dest, values)
-        # Update dictionary
+        # Record the context parameters
         if isinstance(self.parameters, list):
             for parameter, value in zip(self.parameters, values):
-                self.SECTIONS[self.section][parameter] = value
+                setattr(namespace, f"{PREFIX}{self.section}:{parameter}", value)
         else:
-            self.SECTIONS[self.section][self.parameters] = values
+            setattr(namespace, f"{PREFIX}{self.section}:{self.parameters}", values)
+
+
+def sections(args):
+    """Collect the context parameters of parsed command line arguments
+    Args:
+        args (argparse.Namespace): parsed arguments
+    Returns:
+        Dict[str, dict]: parameter values by section
+    """
+    result = {}
+    for name, value in vars(args).items():
+        if name.startswith(PREFIX):
+            section, parameter = name[len(PREFIX):].split(':', 1)
+            result.setdefault(section, {})[parameter] = value
+    return result
 
 
 # Main parser
@@ -56,6 +77,45 @@ vertools.add_argument(
     dest='local_config',
     default=None
 )
+vertools.add_argument(
+    '--profile',
+    help='append timing and resource usage records of the command phases and child processes, as JSON lines',
+    metavar='FILE',
+    default=None
+)
+vertools.add_argument(
+    '--verbosity',
+    help='least important messages printed',
+    choices=['error', 'warning', 'status', 'update'],
+    default='update'
+)
+vertools.add_argument(
+    '-q', '--quiet',
+    help='only print warnings and errors, same as --verbosity warning',
+    dest='verbosity',
+    action='store_const',
+    const='warning'
+)
+vertools.add_argument(
+    '--output-format',
+    help='format of the messages: text, or JSON lines for log ingestion',
+    choices=['text', 'json'],
+    default='text'
+)
+vertools.add_argument(
+    '--color',
+    help='color text messages: always, never, or only on terminals unless NO_COLOR is set',
+    choices=['auto', 'always', 'never'],
+    default='auto'
+)
+vertools.add_argument(
+    '--progress',
+    help='report the progress of simulation, reference and comparison while they run',
+    nargs=0,
+    action=Contextualize,
+    section='Progress',
+    parameters='enable'
+)
 subparsers = vertools.add_subparsers(
     title='command',
     description='vertools command'
@@ -74,6 +134,22 @@ simulate.add_argument(
     section='Simulation',
     parameters='command'
 )
+simulate.add_argument(
+    '--timeout',
+    help='maximum running time of the simulation command',
+    type=engfmt.Quantity,
+    metavar='TIME',
+    action=Contextualize,
+    section='Simulation'
+)
+simulate.add_argument(
+    '--work-policy',
+    help='simulator work library policy',
+    choices=['clean', 'keep', 'invalidate-on-source-change'],
+    action=Contextualize,
+    section='Simulation',
+    parameters='work_policy'
+)
 me = simulate.add_mutually_exclusive_group()
 me.add_argument(
     '--no-log',
@@ -91,6 +167,14 @@ me.add_argument(
     section='Simulation',
     parameters='log'
 )
+simulate.add_argument(
+    '-f', '--force',
+    help='run even if the previous results were produced by an identical run',
+    nargs=0,
+    action=Contextualize,
+    section='CommandLine',
+    parameters='force'
+)
 simulate.set_defaults(func=commands.SimulateCommand)
 
 # Reference
@@ -105,6 +189,14 @@ reference.add_argument(
     section='Reference',
     parameters='command'
 )
+reference.add_argument(
+    '--timeout',
+    help='maximum running time of the reference command',
+    type=engfmt.Quantity,
+    metavar='TIME',
+    action=Contextualize,
+    section='Reference'
+)
 me = reference.add_mutually_exclusive_group()
 me.add_argument(
     '--no-log',
@@ -122,6 +214,14 @@ me.add_argument(
     section='Reference',
     parameters='log'
 )
+reference.add_argument(
+    '-f', '--force',
+    help='run even if the previous results were produced by an identical run',
+    nargs=0,
+    action=Contextualize,
+    section='CommandLine',
+    parameters='force'
+)
 reference.set_defaults(
     func=commands.ReferenceCommand
 )
@@ -145,6 +245,31 @@ compare.add_argument(
     section='Reference',
     parameters='results'
 )
+compare.add_argument(
+    '--store',
+    help='keep the parsed reference and the last passing comparison next to the results files, to speed up the next '
+         'comparisons',
+    nargs=0,
+    action=Contextualize,
+    section='Verification',
+    parameters='store'
+)
+compare.add_argument(
+    '--simulation-format',
+    help='simulation results format: text, npy or a raw binary format such as int32le',
+    metavar='FORMAT',
+    action=Contextualize,
+    section='Simulation',
+    parameters='format'
+)
+compare.add_argument(
+    '--reference-format',
+    help='reference results format: text, npy or a raw binary format such as int32le',
+    metavar='FORMAT',
+    action=Contextualize,
+    section='Reference',
+    parameters='format'
+)
 compare.add_argument(
     '-t', '--threshold',
     help='comparison threshold',
@@ -152,6 +277,54 @@ compare.add_argument(
     action=Contextualize,
     section='Verification'
 )
+compare.add_argument(
+    '--columns',
+    help='names of the result columns, separated by commas or spaces, for results with several values per line',
+    metavar='NAMES',
+    type=context.words,
+    action=Contextualize,
+    section='Verification'
+)
+compare.add_argument(
+    '--thresholds',
+    help='comparison threshold of each result column, separated by commas or spaces',
+    metavar='VALUES',
+    type=context.int_list,
+    action=Contextualize,
+    section='Verification'
+)
+compare.add_argument(
+    '--align',
+    help='compare the results at common instants, built from the tstart, tend and tstep of each section',
+    nargs=0,
+    action=Contextualize,
+    section='Verification',
+    parameters='align'
+)
+compare.add_argument(
+    '--latency',
+    help='delay of the simulation results with respect to the reference, or `auto` to estimate it by '
+         'cross-correlation, when comparing aligned results',
+    type=context.latency,
+    action=Contextualize,
+    section='Verification'
+)
+compare.add_argument(
+    '-j', '--jobs',
+    help='number of worker processes comparing chunks of the results in parallel',
+    type=int,
+    metavar='N',
+    action=Contextualize,
+    section='Verification'
+)
+compare.add_argument(
+    '--report',
+    help='compare all results and save a JSON mismatch report',
+    metavar='FILE',
+    action=Contextualize,
+    section='Verification',
+    parameters='report'
+)
 compare.set_defaults(
     func=commands.CompareCommand
 )
@@ -161,17 +334,94 @@ verify = subparsers.add_parser(
     'verify',
     help='run the full validation suite: simulation, reference and comparison'
 )
+verify.add_argument(
+    '--stream',
+    help='compare results while simulation and reference are still running, stopping both on the first mismatch',
+    nargs=0,
+    action=Contextualize,
+    section='Verification',
+    parameters='stream'
+)
+verify.add_argument(
+    '-f', '--force',
+    help='run even if the previous results were produced by an identical run',
+    nargs=0,
+    action=Contextualize,
+    section='CommandLine',
+    parameters='force'
+)
 verify.set_defaults(
     func=commands.VerifyCommand
 )
 
+# Regression
+regress = subparsers.add_parser(
+    'regress',
+    help='generate inputs and verify every case of a regression manifest'
+)
+regress.add_argument(
+    'manifest',
+    help='JSON file listing the test cases'
+)
+regress.add_argument(
+    '-j', '--jobs',
+    help='number of cases run in parallel',
+    type=int,
+    metavar='N',
+    action=Contextualize,
+    section='Regression'
+)
+regress.add_argument(
+    '-d', '--folder',
+    help='folder holding the working directory of each case',
+    metavar='FOLDER',
+    action=Contextualize,
+    section='Regression'
+)
+regress.set_defaults(
+    func=commands.RegressCommand
+)
+
 # Clean
 clean = subparsers.add_parser(
     'clean',
     help='Clean log and verification files'
 )
+clean.add_argument(
+    '--work',
+    help='also remove the simulator work library, whatever the work library policy',
+    nargs=0,
+    action=Contextualize,
+    section='CommandLine',
+    parameters='work'
+)
 clean.set_defaults(func=commands.CleanCommand)
 
+# Stimulus cache
+cache = subparsers.add_parser(
+    'cache',
+    help='show the statistics of the stimulus cache'
+)
+cache.add_argument(
+    '--clear',
+    help='remove all the cached stimuli',
+    action='store_true'
+)
+cache.set_defaults(func=commands.CacheCommand)
+
+# Server
+serve = subparsers.add_parser(
+    'serve',
+    help='serve command lines sent by `python -m vertools.client`, keeping modules and configuration loaded'
+)
+serve.add_argument(
+    '--socket',
+    help='Unix socket path, defaults to $VERTOOLS_SOCKET or ~/.cache/vertools/server.sock',
+    metavar='PATH',
+    default=None
+)
+serve.set_defaults(func=commands.ServeCommand)
+
 # Input generation
 generate_inputs = subparsers.add_parser(
     'generate-inputs',
@@ -185,6 +435,47 @@ generate_inputs.add_argument(
     action=Contextualize,
     section='Input'
 )
+generate_inputs.add_argument(
+    '--format',
+    help='input file format: text, npy or a raw binary format such as int32le',
+    metavar='FORMAT',
+    action=Contextualize,
+    section='Input'
+)
+generate_inputs.add_argument(
+    '--bits',
+    help='bit width of the quantized samples',
+    type=int,
+    metavar='N',
+    action=Contextualize,
+    section='Input'
+)
+generate_inputs.add_argument(
+    '--rounding',
+    help='rounding mode of the quantized samples',
+    choices=['truncate', 'floor', 'ceil', 'nearest', 'even'],
+    action=Contextualize,
+    section='Input'
+)
+generate_inputs.add_argument(
+    '--cache',
+    help='reuse identical inputs from the stimulus cache; the inputs are then read-only links to the cache entries',
+    dest='cache',
+    nargs=0,
+    const=False,
+    action=Contextualize,
+    section='Cache',
+    parameters='disable'
+)
+generate_inputs.add_argument(
+    '--no-cache',
+    help='always generate the inputs, without using the stimulus cache',
+    dest='cache',
+    nargs=0,
+    action=Contextualize,
+    section='Cache',
+    parameters='disable'
+)
 generate_inputs.add_argument(
     '-t', '--time',
     nargs=3,
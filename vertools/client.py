@@ -0,0 +1,66 @@
+"""Thin client of the vertools server: `python -m vertools.client [--socket PATH] COMMAND ...` runs a vertools command
+line on the server started by `vertools serve`, or locally when no server is listening"""
+import json
+import os
+import signal
+import socket
+import sys
+
+# Same default as vertools.server, which is not imported to keep the client light
+SOCKET = '~/.cache/vertools/server.sock'
+
+
+def request(args, path=None):
+    """Run a command line on the server, which reads and writes the standard streams of this process
+    Args:
+        args (List[str]): command line arguments
+        path (str): socket path, None for the VERTOOLS_SOCKET environment variable or the default path
+    Returns:
+        int: exit status of the command
+    Raises:
+        OSError: when no server is listening on the socket
+        ConnectionError: when the server closes the connection before the command terminates
+    """
+    path = os.path.expanduser(path if path else os.environ.get('VERTOOLS_SOCKET', SOCKET))
+    message = json.dumps({'args': args, 'cwd': os.getcwd(), 'environ': dict(os.environ)}).encode() + b'\n'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        socket.send_fds(sock, [message], [0, 1, 2])
+        replies = sock.makefile('rb')
+        pid = None
+        while True:
+            try:
+                line = replies.readline()
+            except KeyboardInterrupt:
+                # Interrupt the command as if it was running in this process
+                if pid is not None:
+                    os.kill(pid, signal.SIGINT)
+                continue
+            if not line:
+                raise ConnectionError("The server closed the connection")
+            reply = json.loads(line)
+            if 'pid' in reply:
+                pid = reply['pid']
+            if 'status' in reply:
+                return reply['status']
+
+
+def main(argv=None):
+    """Client entry point: forward the command line to the server, or run it locally"""
+    args = sys.argv[1:] if argv is None else list(argv)
+    path = None
+    if args[:1] == ['--socket'] and len(args) > 1:
+        path, args = args[1], args[2:]
+    try:
+        status = request(args, path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        import vertools.__main__
+        vertools.__main__.main(args)
+        status = 0
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
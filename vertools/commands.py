@@ -1,11 +1,39 @@
+import argparse
+import concurrent.futures
+import contextlib
+import contextvars
 import os
+import shlex
+import shutil
 import string
-import numpy as np
+import sys
+import threading
+import time
+import traceback
+
 import engfmt
 
+import vertools.cache as cache
+import vertools.incremental as incremental
+import vertools.lazy as lazy
 import vertools.output as output
+import vertools.profiling as profiling
+import vertools.progress as progress
+import vertools.regression as regression
+import vertools.store as store
 import vertools.system as system
-import vertools.waveforms as waveforms
+
+# Modules depending on NumPy and SciPy, imported by the commands which use them
+np = lazy.LazyModule('numpy')
+compare = lazy.LazyModule('vertools.compare')
+samples = lazy.LazyModule('vertools.samples')
+server = lazy.LazyModule('vertools.server')
+waveforms = lazy.LazyModule('vertools.waveforms')
+
+# File of the work library recording the state of the sources it was compiled from
+SOURCES_SNAPSHOT = '.vertools-sources.json'
+# Maximum number of bytes read at once from the results of a command while they are written
+STREAM_CHUNK_SIZE = 1 << 24
 
 
 class CommandAPI:
@@ -15,12 +43,14 @@ class CommandAPI:
         context (vertools.Context): contextualized parameters
         verbose (bool): flag to allow or block the command's output
         data (dict): custom data shared between the command phases
+        cancel (threading.Event): event requesting the command to terminate its external processes
     """
-    def __init__(self, args, context, verbose=True):
+    def __init__(self, args, context, verbose=True, cancel=None):
         self.args = args
         self.context = context
         self.verbose = verbose
         self.data = {}
+        self.cancel = cancel
 
     def setup(self):
         """Initialize files, context, variables, ...
@@ -47,16 +77,150 @@ class CommandAPI:
         if self.verbose is True:
             return output_func(*args, **kwargs)
 
+    def run_external(self, section, command):
+        """Run an external command of a section, honoring its log and timeout parameters
+        Args:
+            section (str): section holding the `log`, `disable_log` and `timeout` parameters
+            command (Union[str, List[str]]): command (or list of commands) to be executed in the same shell
+        Returns:
+            vertools.system.Completed
+        Raises:
+            vertools.system.CancelledError: when the command is terminated through the `cancel` event
+        """
+        timeout = self.context.get(section, 'timeout', None)
+        try:
+            if self.context.get(section, 'disable_log') is True:
+                with self.monitor(section):
+                    process = system.run_bash(command, stdout=False, stderr=False, timeout=timeout, cancel=self.cancel)
+            else:
+                logfile = self.context.get(section, 'log')
+                with open(logfile, 'w') as log, self.monitor(section, logfile):
+                    process = system.run_bash(command, stdout=log, stderr=log, timeout=timeout, cancel=self.cancel)
+                self.output(output.update, f"{section} log saved in {logfile}", 2)
+        except system.TimeoutExpired as e:
+            self.output(output.error, str(e), 2)
+            sys.exit(6)
+        self.data['returncode'] = process.returncode
+        self.output(output.update, f"{section} command exited with status {process.returncode} after "
+                                   f"{process.wall_time:.2f} s (CPU {process.user_time + process.system_time:.2f} s)",
+                    2)
+        return process
+
+    def monitor(self, section, log=None):
+        """Get a monitor reporting the progress of the external command of a section while it writes its results, if
+        progress reporting is enabled
+        Args:
+            section (str): section holding the `results`, `format` and time parameters
+            log (str): path to the log file of the command, None if it has no log
+        Returns:
+            contextlib.AbstractContextManager: running vertools.progress.Monitor, or a context doing nothing
+        """
+        if self.context.get('Progress', 'enable', False) is not True or self.verbose is not True:
+            return contextlib.nullcontext()
+        format = self.context.get(section, 'format', 'text')
+        sample_size, header = None, 0
+        if format == 'npy':
+            # Files written by vertools have fixed-size headers; others only get a close estimate
+            sample_size, header = np.dtype(samples.DTYPE).itemsize, samples.NPY_HEADER_SIZE
+        elif format != 'text':
+            dtype = samples.raw_dtype(format)
+            if dtype is None:
+                return contextlib.nullcontext()
+            sample_size = dtype.itemsize
+        expected = progress.expected_samples(*[self.context.get(section, parameter, None)
+                                               for parameter in ('tstart', 'tend', 'tstep')])
+        return progress.Monitor(section, self.context.get(section, 'results'), sample_size, header, log, expected,
+                                float(self.context.get('Progress', 'interval', progress.INTERVAL)))
+
+    def meter(self, label, expected=None):
+        """Get a meter of the samples processed by vertools itself, if progress reporting is enabled
+        Args:
+            label (str): name of the phase
+            expected (int): expected number of samples, None if unknown
+        Returns:
+            vertools.progress.Meter: meter, None if progress reporting is disabled
+        """
+        if self.context.get('Progress', 'enable', False) is not True or self.verbose is not True:
+            return None
+        return progress.Meter(label, expected, float(self.context.get('Progress', 'interval', progress.INTERVAL)))
+
+    def up_to_date(self, section, values, files):
+        """Fingerprint the run of an external command and check whether its previous results can be reused
+        Args:
+            section (str): section holding the `results` and `sources` parameters
+            values (dict): parameters of the run, such as commands
+            files (List[str]): paths to the files read by the run, in addition to the section sources
+        Returns:
+            bool: True if the results were produced by an identical run, unless a run is forced. Runs are only
+                skipped when sources are tracked, as changes to untracked sources would go unnoticed
+        """
+        results = self.context.get(section, 'results')
+        patterns = self.context.get(section, 'sources', '')
+        tracked = incremental.sources(patterns)
+        self.data['fingerprint'] = incremental.fingerprint(values, files + tracked)
+        if self.context.get('CommandLine', 'force', False) is True or patterns.strip() == '':
+            return False
+        if len(tracked) == 0:
+            self.output(output.warning, "No sources are tracked: the results are never reused", 2)
+            return False
+        return incremental.is_up_to_date(results, self.data['fingerprint'])
+
+    def thresholds(self):
+        """Get the result columns and their comparison thresholds. Exits when the thresholds do not match the columns
+        Returns:
+            Tuple[List[str], Union[int, numpy.ndarray]]: column names (None for single-column results) and the
+                threshold, or one threshold per column
+        """
+        columns = self.context.get('Verification', 'columns', None)
+        threshold = self.context.get('Verification', 'threshold')
+        if not columns:
+            return None, threshold
+        thresholds = self.context.get('Verification', 'thresholds', None)
+        if not thresholds:
+            thresholds = [threshold] * len(columns)
+        if len(thresholds) != len(columns):
+            self.output(output.error, f"{len(thresholds)} thresholds given for {len(columns)} result columns", 2)
+            sys.exit(1)
+        return columns, np.array(thresholds, dtype=samples.DTYPE)
+
+    def mismatch(self, mismatch, columns):
+        """Report a results mismatch and exit
+        Args:
+            mismatch (vertools.compare.Mismatch): first mismatch
+            columns (List[str]): column names, None for single-column results
+        """
+        where = f"line {mismatch.line}"
+        if columns is not None:
+            where += f", column `{columns[mismatch.column]}`"
+        self.output(output.error, f"Results mismatch on {where}: reference={mismatch.reference}, "
+                                  f"simulation={mismatch.simulation}", 2)
+        sys.exit(3)
+
     def __call__(self):
         """Run the command by calling the setup, run and exit methods in order.
         If the setup method returns false, the command aborts.
         """
+        if profiling.enabled():
+            self.profiled()
+            return
         setup_status = self.setup()
         if setup_status is False:
             return
         self.run()
         self.exit()
 
+    def profiled(self):
+        """Same as calling the command, but recording the time spent in each phase"""
+        name = type(self).__name__
+        with profiling.phase(name, 'setup'):
+            setup_status = self.setup()
+        if setup_status is False:
+            return
+        with profiling.phase(name, 'run'):
+            self.run()
+        with profiling.phase(name, 'exit'):
+            self.exit()
+
 
 class CleanCommand(CommandAPI):
     def setup(self):
@@ -64,6 +228,8 @@ class CleanCommand(CommandAPI):
             'Simulation': ['results', 'log'],
             'Reference': ['results', 'log']
         }
+        self.data['work'] = self.context.get('CommandLine', 'work', False) is True or \
+            self.context.get('Simulation', 'work_policy', 'clean') == 'clean'
 
     def run(self):
         self.output(output.status, 'Cleaning files')
@@ -74,18 +240,36 @@ class CleanCommand(CommandAPI):
                     os.remove(fname)
                 except OSError:
                     pass
+                if parameter == 'results':
+                    incremental.invalidate(fname)
+                    store.invalidate(fname)
                 self.output(output.update, f"Removed {fname}", 2)
-            self.output(output.success('Done'))
+        if self.data['work'] is True:
+            work = self.context.get('Simulation', 'work')
+            system.run_bash(f"rm -rf {shlex.quote(work)}")
+            self.output(output.update, f"Removed {work}", 2)
+        self.output(output.success, 'Done')
 
 
 class GenerateInputsCommand(CommandAPI):
     def setup(self):
+        self.context.set('CommandLine', 'waveform', self.args.waveform)
         fname = self.context.get('Input', 'file')
         folder = os.path.abspath(fname)[:-len(fname)]
         if not system.exists(folder):
             self.output(output.error, f"Input file cannot be created: path `{folder}` does not exist")
-            exit(3)
+            sys.exit(3)
+        try:
+            self.setup_cache()
+        except ValueError as e:
+            self.output(output.error, str(e))
+            sys.exit(1)
         if fname in os.listdir(folder):
+            stimuli = self.data['cache']
+            if stimuli is not None and stimuli.contains(self.data['key'], fname):
+                stimuli.touch(self.data['key'])
+                self.output(output.success, f"File {fname} is up to date")
+                return False
             confirm = self.output(output.confirm, f"File {fname} already exists. Do you want to replace it?", True)
             if confirm is True:
                 self.output(output.update, "Removing old file...", 2)
@@ -94,12 +278,79 @@ class GenerateInputsCommand(CommandAPI):
                 return False
         return True
 
+    def setup_cache(self):
+        """Open the stimulus cache and compute the key of the requested inputs"""
+        if self.context.get('Cache', 'disable', False) is True:
+            self.data['cache'] = None
+            return
+        waveform, parameters = waveforms.waveform_parameters(self.context)
+        description = {
+            'waveform': waveform,
+            'parameters': parameters,
+            'time': [float(self.context.get('Input', parameter)) for parameter in ('tstart', 'tend', 'tstep')],
+            'format': self.context.get('Input', 'format', 'text'),
+            'quantization': waveforms.quantizer(self.context).keywords
+        }
+        self.data['cache'] = cache.Cache(self.context.get('Cache', 'folder'), self.context.get('Cache', 'max_size'))
+        self.data['key'] = cache.Cache.key(description)
+
     def run(self):
-        self.context.set('CommandLine', 'waveform', self.args.waveform)
-        signal = waveforms.generate(self.context)
         fname = self.context.get('Input', 'file')
-        np.savetxt(fname, signal, fmt='%d')
-        self.output(output.success, f"Saved {len(signal)} samples on file `{fname}`")
+        stimuli = self.data['cache']
+        if stimuli is not None:
+            if stimuli.fetch(self.data['key'], fname):
+                self.output(output.success, f"Restored file `{fname}` from the stimulus cache")
+                return
+            path = stimuli.staging()
+        else:
+            path = fname
+        try:
+            with samples.Writer(path, self.context.get('Input', 'format', 'text')) as writer:
+                quantize = waveforms.quantizer(self.context)
+                for block in waveforms.generate_blocks(self.context):
+                    writer.write(quantize(block))
+        except ValueError as e:
+            if stimuli is not None:
+                system.remove_files(path)
+            self.output(output.error, str(e))
+            sys.exit(1)
+        if stimuli is not None:
+            stimuli.store(self.data['key'], path)
+            stimuli.serve(self.data['key'], fname)
+        self.output(output.success, f"Saved {writer.length} samples on file `{fname}`")
+
+
+class CacheCommand(CommandAPI):
+    def setup(self):
+        self.data['cache'] = cache.Cache(self.context.get('Cache', 'folder'), self.context.get('Cache', 'max_size'))
+        return True
+
+    def run(self):
+        stimuli = self.data['cache']
+        if self.args.clear is True:
+            stimuli.clear()
+            self.output(output.success, f"Cleared the stimulus cache in {stimuli.folder}")
+            return
+        stats = stimuli.stats()
+        requests = stats['hits'] + stats['misses']
+        ratio = f"{stats['hits'] / requests:.1%}" if requests > 0 else 'n/a'
+        self.output(output.status, f"Stimulus cache in {stimuli.folder}")
+        self.output(output.update, f"Entries: {stats['entries']} ({engfmt.Quantity(stats['size'], 'B')} of "
+                                   f"{engfmt.Quantity(stimuli.max_size, 'B')})", 2)
+        self.output(output.update, f"Hits: {stats['hits']}, misses: {stats['misses']} (hit ratio {ratio})", 2)
+        self.output(output.update, f"Evictions: {stats['evictions']}", 2)
+
+
+class ServeCommand(CommandAPI):
+    def run(self):
+        path = server.socket_path(self.args.socket)
+        self.output(output.status, f"Serving requests on {path}")
+        try:
+            server.serve(path)
+        except server.ServerError as e:
+            self.output(output.error, str(e), 2)
+            sys.exit(1)
+        self.output(output.success, "Server stopped")
 
 
 class SimulateCommand(CommandAPI):
@@ -108,7 +359,7 @@ class SimulateCommand(CommandAPI):
         clockgen = self.context.get('Simulation', 'clock_gen')
         if not system.exists(clockgen):
             self.output(output.error, f"Clock generator {clockgen} does not exist")
-            exit(7)
+            sys.exit(7)
         # Clockgen is a small file, store it in memory
         with open(clockgen, 'r') as f:
             lines = f.readlines()
@@ -122,38 +373,75 @@ class SimulateCommand(CommandAPI):
                     pos = line.find(':=')
                     f.write(line[:pos + len(':=')] + f" {clock};\n")
 
+    def setup_work(self):
+        """Apply the work library policy: the library is removed always (clean), never (keep), or when the tracked
+        sources changed since the last successful simulation (invalidate-on-source-change)"""
+        work = self.context.get('Simulation', 'work')
+        policy = self.context.get('Simulation', 'work_policy', 'clean')
+        self.data['sources'] = None
+        if policy == 'clean':
+            remove = True
+        elif policy == 'keep':
+            remove = False
+        elif policy == 'invalidate-on-source-change':
+            snapshot_file = os.path.join(work, SOURCES_SNAPSHOT)
+            previous = incremental.load_snapshot(snapshot_file)
+            sources = incremental.snapshot(incremental.sources(self.context.get('Simulation', 'sources', '')),
+                                           previous)
+            if len(sources) == 0:
+                self.output(output.warning, "No sources are tracked: the work library is never invalidated", 2)
+            self.data['sources'] = sources
+            remove = incremental.changed(previous, sources)
+        else:
+            self.output(output.error, f"Unknown work library policy `{policy}`", 2)
+            sys.exit(1)
+        if remove:
+            self.output(output.update, f"Removing {work} folder", 2)
+            system.run_bash(f"rm -rf {shlex.quote(work)}")
+        else:
+            self.output(output.update, f"Keeping {work} folder", 2)
+
     def setup(self):
-        # Remove work folder
         self.output(output.status, "Setting up simulation")
         self.output(output.update, "Setting clock", 2)
         self.setclock()
-        self.output(output.update, "Removing work/ folder", 2)
-        system.run_bash('rm -rf work/')
+        setup_command = self.context.get('Simulation', 'setup', '')
+        simul_command = self.context.get('Simulation', 'command')
+        self.data['command'] = [command for command in (setup_command, simul_command) if command != '']
+        values = {'command': self.data['command'], 'clock': str(self.context.get('Simulation', 'clock'))}
+        files = [self.context.get('Input', 'file'), self.context.get('Simulation', 'clock_gen')]
+        self.data['skip'] = self.up_to_date('Simulation', values, files)
+        if self.data['skip'] is True:
+            self.output(output.success, "Simulation is up to date", 2)
+            return True
+        self.setup_work()
         self.output(output.update, "Removing old simulation results", 2)
-        system.remove_files(self.context.get('Simulation', 'results'))
+        results = self.context.get('Simulation', 'results')
+        system.remove_files(results)
+        incremental.invalidate(results)
         self.output(output.success, 'Done')
 
     def run(self):
+        if self.data['skip'] is True:
+            self.output(output.status, "Reusing previous simulation results")
+            return
         self.output(output.status, "Running simulation")
-        setup_command = self.context.get('Simulation', 'setup', '')
-        simul_command = self.context.get('Simulation', 'command')
-        command = [command for command in (setup_command, simul_command) if command != '']
         self.output(output.update, "Launching simulation command", 2)
-        if self.context.get('Simulation', 'disable_log') is True:
-            system.run_bash(command, stdout=False, stderror=False)
-        else:
-            logfile = self.context.get('Simulation', 'log')
-            with open(logfile, 'w') as log:
-                system.run_bash(command, stdout=log, stderr=log)
-            self.output(output.update, f"Simulation log saved in {logfile}", 2)
+        self.run_external('Simulation', self.data['command'])
         self.output(output.success, 'Done')
 
     def exit(self):
         # Check if results were created
         self.output(output.status, "Checking folder")
-        if not system.exists(self.context.get('Simulation', 'results')):
+        results = self.context.get('Simulation', 'results')
+        if not system.exists(results):
             self.output(output.error, f"Results file was not generated")
-            exit(5)
+            sys.exit(5)
+        if self.data['skip'] is False and self.data['returncode'] == 0:
+            incremental.record(results, self.data['fingerprint'])
+            work = self.context.get('Simulation', 'work')
+            if self.data['sources'] is not None and system.exists(work):
+                incremental.save_snapshot(os.path.join(work, SOURCES_SNAPSHOT), self.data['sources'])
         self.output(output.success, "Done")
 
 
@@ -165,7 +453,7 @@ class CompareCommand(CommandAPI):
         for file in simresults_name, refresults_name:
             if not system.exists(file):
                 self.output(output.error, f"File {file} does not exist. Cannot compare results")
-                exit(4)
+                sys.exit(4)
         self.output(output.success, "All files are present", 2)
         return True
 
@@ -174,71 +462,486 @@ class CompareCommand(CommandAPI):
         self.output(output.status, "Comparing results")
         simresults_name = self.context.get('Simulation', 'results')
         refresults_name = self.context.get('Reference', 'results')
-        simresults = None
-        refresults = None
-        try:
-            simresults = open(simresults_name, 'r')
-        except OSError:
-            self.output(output.error, f"Could not open file {simresults_name}", 2)
-            exit(1)
+        columns, threshold = self.thresholds()
+        ncolumns = len(columns) if columns is not None else 1
         try:
-            refresults = open(refresults_name, 'r')
-        except OSError:
-            self.output(output.error, f"Could not open file {refresults_name}", 2)
-            exit(1)
-        self.output(output.update, f"Comparing `{simresults_name}` and `{refresults_name}`", 2)
+            simresults = samples.reader(simresults_name, self.context.get('Simulation', 'format', 'text'),
+                                        columns=ncolumns)
+            refresults = samples.reader(refresults_name, self.context.get('Reference', 'format', 'text'),
+                                        columns=ncolumns)
+        except ValueError as e:
+            self.output(output.error, str(e), 2)
+            sys.exit(1)
+        report_name = self.context.get('Verification', 'report', '')
+        jobs = self.context.get('Verification', 'jobs')
+        # The store only holds single-column results
+        use_store = self.context.get('Verification', 'store', False) is True and columns is None
+        if self.context.get('Verification', 'align', False) is True:
+            self.aligned(simresults, refresults, threshold, columns, report_name, use_store)
+            return
+        # Only the comparison of the first mismatch can skip the chunks which already matched
+        delta = use_store and report_name == '' and jobs <= 1 and isinstance(simresults, samples.TextReader)
+        # Parallel comparisons count the lines while splitting the files
+        parallel = report_name == '' and jobs > 1
         # Check file lengths
-        sim_length = sum(1 for line in simresults)
-        ref_length = sum(1 for line in refresults)
+        lengths = []
+        for results in simresults, refresults:
+            try:
+                if use_store and results is refresults and isinstance(results, samples.TextReader):
+                    # Load the reference from the parsed results of the previous runs
+                    refresults, index = self.cached(results)
+                    if index is not None:
+                        self.data['reference'] = index
+                    lengths.append(len(refresults))
+                elif delta and results is simresults:
+                    self.data['chunks'] = store.scan(results)
+                    lengths.append(sum(chunk[3] for chunk in self.data['chunks']))
+                elif not parallel:
+                    lengths.append(len(results))
+            except OSError:
+                self.output(output.error, f"Could not open file {results.path}", 2)
+                sys.exit(1)
+            except samples.Reader.FormatError as e:
+                self.output(output.error, str(e), 2)
+                sys.exit(1)
+        if parallel:
+            try:
+                split = compare.parallel_split(simresults, refresults, jobs)
+            except (OSError, samples.Reader.FormatError) as e:
+                self.output(output.error, str(e), 2)
+                sys.exit(1)
+            lengths = split[:2]
+        self.output(output.update, f"Comparing `{simresults_name}` and `{refresults_name}`", 2)
+        sim_length, ref_length = lengths
         if sim_length != ref_length:
             output.error(f"File length mismatch: {simresults_name} has {sim_length} lines; "
                          f"{refresults_name} has {ref_length} lines.", 2)
-            exit(2)
-        # Compare files line by line
-        threshold = self.context.get('Verification', 'threshold')
-        simresults.seek(0)
-        refresults.seek(0)
-        for line, (sim, ref) in enumerate(zip(simresults, refresults)):
-            sim = int(sim)
-            ref = int(ref)
-            if abs(sim - ref) > threshold:
-                self.output(output.error, f"Results mismatch on line {line+1}: reference={ref}, simulation={sim}", 2)
-                exit(3)
+            sys.exit(2)
+        meter = self.meter('Comparison', sim_length)
+        # Compare files block by block
+        try:
+            if report_name != '':
+                self.report(simresults, refresults, threshold, report_name, columns, meter)
+                return
+            if delta and 'reference' in self.data:
+                mismatch = self.delta(simresults, refresults, threshold)
+            elif jobs > 1:
+                mismatch = compare.parallel_first_mismatch(simresults, refresults, threshold, jobs, split)
+            else:
+                blocks = simresults.blocks()
+                if meter is not None:
+                    blocks = progress.counted(blocks, meter)
+                mismatch = compare.first_mismatch(blocks, refresults.blocks(), threshold)
+        except samples.Reader.FormatError as e:
+            self.output(output.error, str(e), 2)
+            sys.exit(1)
+        if meter is not None:
+            if mismatch is None:
+                # Delta and parallel comparisons do not report their blocks
+                meter.samples = sim_length
+            meter.summary()
+        if mismatch is not None:
+            self.mismatch(mismatch, columns)
+        self.output(output.success, "All results are matching")
+
+    def cached(self, results):
+        """Get the parsed samples of a text results file from the store, or the file itself if the store cannot be
+        written, such as next to read-only references
+        Args:
+            results (vertools.samples.TextReader): results file
+        Returns:
+            Tuple[vertools.samples.Reader, dict]: reader of the samples and index of the results file, None if the
+            store is not used
+        Raises:
+            vertools.samples.Reader.FormatError: when the results file is not valid
+        """
+        try:
+            return store.cached(results)
+        except OSError as e:
+            if not system.is_file(results.path):
+                raise
+            self.output(output.warning, f"Results of {results.path} cannot be stored: {e}", 2)
+            return results, None
+
+    def delta(self, simresults, refresults, threshold):
+        """Compare only the simulation chunks which changed since the last passing comparison against the same
+        reference, and record the comparison if it passes
+        Returns:
+            vertools.compare.Mismatch: first mismatch, or None
+        """
+        chunks = self.data['chunks']
+        record = {
+            'reference': self.data['reference']['digest'],
+            'threshold': threshold,
+            'chunk_size': simresults.chunk_size
+        }
+        previous = store.load_pass(simresults.path)
+        passed = []
+        if previous is not None and all(previous.get(key, None) == value for key, value in record.items()):
+            passed = previous['chunks']
+        mismatch, skipped = compare.delta_first_mismatch(simresults, chunks, refresults.array(), threshold, passed)
+        self.output(output.update, f"{skipped} of {len(chunks)} chunks unchanged since the last passing comparison",
+                    2)
+        if mismatch is None:
+            try:
+                store.save_pass(simresults.path, {**record, 'chunks': chunks})
+            except OSError as e:
+                self.output(output.warning, f"Comparison of {simresults.path} cannot be stored: {e}", 2)
+        return mismatch
+
+    def aligned(self, simresults, refresults, threshold, columns, report_name, use_store):
+        """Compare the results at common instants, built from the time parameters of the Simulation and Reference
+        sections, after delaying the reference by the latency of the simulation"""
+        arrays = []
+        for results in simresults, refresults:
+            try:
+                if use_store and isinstance(results, samples.TextReader):
+                    results = self.cached(results)[0]
+                arrays.append(results.array())
+            except OSError:
+                self.output(output.error, f"Could not open file {results.path}", 2)
+                sys.exit(1)
+            except samples.Reader.FormatError as e:
+                self.output(output.error, str(e), 2)
+                sys.exit(1)
+        sim, ref = arrays
+        axes = []
+        for section, results, data in ('Simulation', simresults, sim), ('Reference', refresults, ref):
+            tend = self.context.get(section, 'tend')
+            axis = compare.TimeAxis(self.context.get(section, 'tstart'), self.context.get(section, 'tstep'),
+                                    len(data), tend)
+            if axis.length < len(data):
+                # Samples past tend would silently be left out of the comparison
+                self.output(output.error, f"File length mismatch: {results.path} has {len(data)} lines, but only "
+                                          f"{axis.length} are taken before the {section} end time of "
+                                          f"{engfmt.Quantity(tend, 's')}", 2)
+                sys.exit(2)
+            axes.append(axis)
+        latency = self.context.get('Verification', 'latency', 0)
+        if latency == 'auto':
+            latency = compare.find_latency(sim, ref, *axes, self.context.get('Verification', 'max_latency'))
+            self.output(output.update, f"Estimated latency: {engfmt.Quantity(latency, 's')}", 2)
+        window = [self.context.get('Verification', parameter, None) for parameter in ('tstart', 'tend', 'tstep')]
+        instants = compare.comparison_instants(*axes, latency, *window)[2]
+        if instants == 0:
+            self.output(output.error, f"`{simresults.path}` and `{refresults.path}` have no instants in common", 2)
+            sys.exit(2)
+        blocks = compare.time_aligned_blocks(sim, ref, *axes, latency, *window)
+        self.output(output.update, f"Comparing `{simresults.path}` and `{refresults.path}` at {instants} common "
+                                   f"instants", 2)
+        meter = self.meter('Comparison', instants)
+        if meter is not None:
+            blocks = progress.counted(blocks, meter, lambda block: len(block[1]))
+        if report_name != '':
+            report = compare.Report(threshold, self.context.get('Verification', 'report_max_runs'), columns)
+            for _, sim_block, ref_block in blocks:
+                report.update(sim_block, ref_block)
+            if meter is not None:
+                meter.summary()
+            self.save_report(report, report_name)
+            return
+        mismatch = compare.time_aligned_first_mismatch(blocks, threshold)
+        if meter is not None:
+            meter.summary()
+        if mismatch is not None:
+            self.mismatch(mismatch, columns)
+        self.output(output.success, "All results are matching")
+
+    def report(self, simresults, refresults, threshold, report_name, columns=None, meter=None):
+        """Compare all the results and save a full mismatch report"""
+        max_runs = self.context.get('Verification', 'report_max_runs')
+        blocks = simresults.blocks()
+        if meter is not None:
+            blocks = progress.counted(blocks, meter)
+        report = compare.report(blocks, refresults.blocks(), threshold, max_runs, columns)
+        if meter is not None:
+            meter.summary()
+        self.save_report(report, report_name)
+
+    def save_report(self, report, report_name):
+        """Save a mismatch report and exit if it holds mismatches"""
+        report.save(report_name)
+        self.output(output.update, f"Report saved in {report_name}", 2)
+        if report.mismatches > 0:
+            self.output(output.error, f"{report.mismatches} mismatching results in {report.run_count} error runs; "
+                                      f"max error={report.max_error}", 2)
+            sys.exit(3)
         self.output(output.success, "All results are matching")
 
 
 class ReferenceCommand(CommandAPI):
     def setup(self):
         self.output(output.status, "Setting up reference")
+        command = self.context.get('Reference', 'command')
+        self.data['skip'] = self.up_to_date('Reference', {'command': command}, [self.context.get('Input', 'file')])
+        if self.data['skip'] is True:
+            self.output(output.success, "Reference is up to date", 2)
+            return True
         self.output(output.update, "Removing old reference results", 2)
-        system.remove_files(self.context.get('Reference', 'results'))
+        results = self.context.get('Reference', 'results')
+        system.remove_files(results)
+        incremental.invalidate(results)
         return True
 
     def run(self):
+        if self.data['skip'] is True:
+            self.output(output.status, "Reusing previous reference results")
+            return
         command = self.context.get('Reference', 'command')
         self.output(output.status, "Launching reference command")
-        if self.context.get('Reference', 'disable_log') is True:
-            system.run_bash(command, stdout=False, stderr=False)
-        else:
-            logfile = self.context.get('Reference', 'log')
-            with open(logfile, 'w') as log:
-                system.run_bash(command, stdout=log, stderr=log)
-            self.output(output.update, f"Reference log saved in {logfile}", 2)
+        self.run_external('Reference', command)
 
     def exit(self):
         # Check if results were created
         self.output(output.status, "Checking reference folder")
-        if not system.exists(self.context.get('Reference', 'results')):
+        results = self.context.get('Reference', 'results')
+        if not system.exists(results):
             self.output(output.error, f"Results file was not generated", 2)
-            exit(5)
+            sys.exit(5)
+        if self.data['skip'] is False and self.data['returncode'] == 0:
+            incremental.record(results, self.data['fingerprint'])
         self.output(output.success, "Done")
 
 
 class VerifyCommand(CommandAPI):
     def run(self):
-        sim = SimulateCommand(self.args, self.context, self.verbose)
-        ref = ReferenceCommand(self.args, self.context, self.verbose)
+        # Simulation and reference are independent: run them concurrently, then compare their results
+        cancel = threading.Event()
+        sim = SimulateCommand(self.args, self.context, self.verbose, cancel)
+        ref = ReferenceCommand(self.args, self.context, self.verbose, cancel)
+        stream = self.context.get('Verification', 'stream')
+        if stream is True and self.context.get('Verification', 'align', False) is True:
+            self.output(output.warning, "Aligned results cannot be compared while they are generated", 2)
+            stream = False
+        if stream is True:
+            self.data['columns'], self.data['threshold'] = self.thresholds()
+            ncolumns = len(self.data['columns']) if self.data['columns'] is not None else 1
+            try:
+                self.data['followers'] = [samples.follower(self.context.get(section, 'results'),
+                                                           self.context.get(section, 'format', 'text'),
+                                                           STREAM_CHUNK_SIZE, ncolumns)
+                                          for section in ('Simulation', 'Reference')]
+            except ValueError as e:
+                self.output(output.error, str(e), 2)
+                sys.exit(1)
+            # Results must not be followed before their old versions are removed
+            system.remove_files(self.context.get('Simulation', 'results'), self.context.get('Reference', 'results'))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=2) as pool:
+            # Messages of the commands go where the messages of this thread go
+            futures = [pool.submit(contextvars.copy_context().run, self.run_concurrently, command)
+                       for command in (sim, ref)]
+            try:
+                if stream is True:
+                    self.stream(futures, cancel)
+                statuses = [future.result() for future in futures]
+            except BaseException:
+                cancel.set()
+                raise
+        for status in statuses:
+            if status is not None and status != 0:
+                sys.exit(status)
+        if stream is True:
+            self.finish_stream()
+            return
         com = CompareCommand(self.args, self.context, self.verbose)
-        sim()
-        ref()
         com()
+
+    def stream(self, futures, cancel):
+        """Compare the results while simulation and reference are still writing them. On the first mismatch,
+        both commands are cancelled.
+        Args:
+            futures (List[concurrent.futures.Future]): running commands
+            cancel (threading.Event): cancellation event shared by the commands
+        """
+        self.output(output.status, "Comparing results while they are generated")
+        followers = self.data['followers']
+        comparison = compare.Stream(self.data['threshold'])
+        self.data['comparison'] = comparison
+        meter = self.meter('Comparison', progress.expected_samples(*[self.context.get('Simulation', parameter, None)
+                                                                     for parameter in ('tstart', 'tend', 'tstep')]))
+        self.data['meter'] = meter
+        try:
+            while not all(future.done() for future in futures):
+                # A producer far ahead of the other is read later, from its file, rather than buffered
+                blocks = [follower.read() if readable else np.empty(0, dtype=samples.DTYPE)
+                          for follower, readable in zip(followers, comparison.readable())]
+                mismatch = comparison.push(*blocks)
+                if meter is not None:
+                    meter.update(min(comparison.lengths()))
+                if mismatch is not None:
+                    cancel.set()
+                    self.data['mismatch'] = mismatch
+                    return
+                if all(len(block) == 0 for block in blocks):
+                    cancel.wait(system.POLL_INTERVAL)
+        except samples.Reader.FormatError as e:
+            cancel.set()
+            self.output(output.error, str(e), 2)
+            sys.exit(1)
+
+    def finish_stream(self):
+        """Compare the remaining results once both commands are done"""
+        mismatch = self.data.get('mismatch', None)
+        comparison = self.data['comparison']
+        followers = self.data['followers']
+        # Samples of a stream left without counterpart once the other stream ended: only counted, never buffered
+        unmatched = [0, 0]
+        try:
+            while mismatch is None and not all(follower.complete for follower in followers):
+                lengths = comparison.lengths()
+                readable = comparison.readable()
+                # Whether each stream ended without any sample left to compare
+                ended = [follower.complete and length == comparison.line - 1
+                         for follower, length in zip(followers, lengths)]
+                blocks = []
+                for side, follower in enumerate(followers):
+                    block = np.empty(0, dtype=samples.DTYPE)
+                    if not follower.complete and (readable[side] or ended[1 - side]):
+                        block = follower.read(final=True)
+                    if ended[1 - side]:
+                        unmatched[side] += len(block)
+                        block = block[:0]
+                    blocks.append(block)
+                mismatch = comparison.push(*blocks)
+        except samples.Reader.FormatError as e:
+            self.output(output.error, str(e), 2)
+            sys.exit(1)
+        finally:
+            for follower in followers:
+                follower.close()
+        meter = self.data['meter']
+        if meter is not None:
+            meter.samples = min(comparison.lengths())
+            meter.summary()
+        if mismatch is not None:
+            self.mismatch(mismatch, self.data['columns'])
+        sim_length, ref_length = [length + extra for length, extra in zip(comparison.lengths(), unmatched)]
+        if sim_length != ref_length:
+            self.output(output.error, f"File length mismatch: {followers[0].path} has {sim_length} lines; "
+                                      f"{followers[1].path} has {ref_length} lines.", 2)
+            sys.exit(2)
+        self.output(output.success, "All results are matching")
+
+    @staticmethod
+    def run_concurrently(command):
+        """Run a command with buffered output, cancelling the other commands sharing its event if it fails
+        Args:
+            command (CommandAPI): command to run
+        Returns:
+            int: exit status of the command, None if it was cancelled
+        """
+        with output.buffered():
+            try:
+                command()
+            except system.CancelledError:
+                command.output(output.warning, "Cancelled", 2)
+                return None
+            except SystemExit as e:
+                command.cancel.set()
+                return e.code if e.code is not None else 0
+            except BaseException:
+                command.cancel.set()
+                raise
+        return 0
+
+
+class RegressCommand(CommandAPI):
+    def setup(self):
+        self.output(output.status, "Loading regression manifest")
+        try:
+            files, cases = regression.load_manifest(self.args.manifest)
+        except regression.ManifestError as e:
+            self.output(output.error, str(e), 2)
+            sys.exit(1)
+        # Cases run in their own folders: paths must not depend on the working directory
+        self.data['files'] = [os.path.abspath(file) for file in files]
+        self.data['cases'] = cases
+        self.data['folder'] = os.path.abspath(self.context.get('Regression', 'folder'))
+        if self.context.get('Regression', 'jobs') < 1:
+            self.output(output.error, "The number of regression jobs must be at least 1", 2)
+            sys.exit(1)
+        for file in self.data['files']:
+            if not system.exists(file):
+                self.output(output.error, f"Project file {file} does not exist", 2)
+                sys.exit(4)
+        os.makedirs(self.data['folder'], exist_ok=True)
+        self.output(output.success, f"{len(cases)} cases found", 2)
+        return True
+
+    def run(self):
+        jobs = self.context.get('Regression', 'jobs')
+        cases = self.data['cases']
+        self.output(output.status, f"Running {len(cases)} cases with {jobs} workers")
+        results = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(self.run_case, case, self.context, self.data['folder'], self.data['files'])
+                       for case in cases]
+            for future in futures:
+                result = future.result()
+                if result.passed:
+                    self.output(output.success, f"{result.name}: passed", 2)
+                else:
+                    self.output(output.error, f"{result.name}: failed with status {result.status}, see {result.log}",
+                                2)
+                results.append(result)
+        self.data['results'] = results
+
+    def exit(self):
+        results = self.data['results']
+        summary = regression.table(results)
+        fname = os.path.join(self.data['folder'], 'summary.txt')
+        with open(fname, 'w') as f:
+            f.write(summary)
+        self.output(output.update, summary)
+        self.output(output.update, f"Summary saved in {fname}", 2)
+        if not all(result.passed for result in results):
+            sys.exit(3)
+        self.output(output.success, "All cases passed")
+
+    @staticmethod
+    def run_case(case, context, folder, files):
+        """Generate the inputs and run the verification of a case in its own working directory
+        Args:
+            case (vertools.regression.Case): test case
+            context (vertools.context.Context): regression context, extended with the case parameters
+            folder (str): absolute path to the folder holding the case directories
+            files (List[str]): absolute paths to the project files copied in the case directory
+        Returns:
+            vertools.regression.Result
+        """
+        start = time.monotonic()
+        directory = os.path.join(folder, case.name)
+        cwd = os.getcwd()
+        try:
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            for file in files:
+                destination = os.path.join(directory, os.path.basename(file))
+                if os.path.isdir(file):
+                    shutil.copytree(file, destination)
+                else:
+                    shutil.copy2(file, destination)
+            os.chdir(directory)
+        except OSError:
+            # Only this case fails; its directory may not exist, so the error is logged next to it
+            logfile = os.path.join(folder, f"{case.name}.log")
+            with contextlib.suppress(OSError), open(logfile, 'w') as log:
+                traceback.print_exc(file=log)
+            return regression.Result(case.name, 1, time.monotonic() - start, logfile)
+        context.append_local(case.scope())
+        logfile = os.path.join(directory, 'vertools.log')
+        try:
+            with open(logfile, 'w') as log, contextlib.redirect_stdout(log):
+                try:
+                    if case.waveform is not None:
+                        GenerateInputsCommand(argparse.Namespace(waveform=case.waveform['type']), context)()
+                    VerifyCommand(argparse.Namespace(), context)()
+                    status = 0
+                except SystemExit as e:
+                    status = e.code if e.code is not None else 0
+                except Exception:
+                    traceback.print_exc(file=log)
+                    status = 1
+        finally:
+            os.chdir(cwd)
+        return regression.Result(case.name, status, time.monotonic() - start, logfile)
@@ -0,0 +1,562 @@
+import bisect
+import collections
+import concurrent.futures
+import json
+
+import numpy as np
+
+import vertools.lazy as lazy
+
+# Only needed by the latency search
+signal = lazy.LazyModule('scipy.signal')
+
+_EMPTY = np.empty(0, dtype=np.int64)
+# Number of comparison instants resampled at once
+ALIGN_BLOCK = 1 << 18
+# Tolerance on sampling instants, as a fraction of the sampling period
+EPSILON = 1e-6
+# Maximum number of samples a stream may be ahead of the other before its producer stops being read
+MAX_LAG = 1 << 22
+
+
+class Mismatch:
+    """A sample on which simulation and reference differ by more than the threshold
+    Attributes:
+        line (int): 1-based line number of the sample
+        simulation (int): simulation value
+        reference (int): reference value
+        column (int): 0-based column of the value for multi-column results, None for single-column results
+    """
+
+    def __init__(self, line, simulation, reference, column=None):
+        self.line = line
+        self.simulation = simulation
+        self.reference = reference
+        self.column = column
+
+    def __eq__(self, other):
+        return isinstance(other, Mismatch) and (self.line, self.column, self.simulation, self.reference) == \
+            (other.line, other.column, other.simulation, other.reference)
+
+    def __repr__(self):
+        column = f", column={self.column}" if self.column is not None else ''
+        return f"Mismatch(line={self.line}{column}, simulation={self.simulation}, reference={self.reference})"
+
+
+def aligned_blocks(first, second):
+    """Pair up two streams of sample blocks into blocks of equal length
+    Args:
+        first (Iterable[numpy.ndarray]): first stream
+        second (Iterable[numpy.ndarray]): second stream
+    Yields:
+        Tuple[numpy.ndarray, numpy.ndarray]: aligned blocks. Iteration stops as soon as either stream is exhausted
+    """
+    first, second = iter(first), iter(second)
+    a = b = _EMPTY
+    while True:
+        while len(a) == 0:
+            a = next(first, None)
+            if a is None:
+                return
+        while len(b) == 0:
+            b = next(second, None)
+            if b is None:
+                return
+        n = min(len(a), len(b))
+        yield a[:n], b[:n]
+        a, b = a[n:], b[n:]
+
+
+def first_mismatch(simulation, reference, threshold, first_line=1):
+    """Find the first sample on which simulation and reference differ by more than a threshold
+    Args:
+        simulation (Iterable[numpy.ndarray]): simulation sample blocks; 2-D blocks hold one row per line
+        reference (Iterable[numpy.ndarray]): reference sample blocks
+        threshold (Union[int, numpy.ndarray]): maximum allowed absolute difference, or one per column
+        first_line (int): line number of the first sample
+    Returns:
+        Mismatch: the first mismatch, or None if all samples match. On multi-column blocks, the first mismatching
+            line is reported with its leftmost mismatching column
+    """
+    line = first_line
+    for sim, ref in aligned_blocks(simulation, reference):
+        # Row-major order: the first flat index is on the first mismatching line
+        errors = np.flatnonzero(np.abs(sim - ref) > threshold)
+        if len(errors) > 0:
+            if sim.ndim == 1:
+                i = errors[0]
+                return Mismatch(line + int(i), int(sim[i]), int(ref[i]))
+            i, column = divmod(int(errors[0]), sim.shape[1])
+            return Mismatch(line + i, int(sim[i, column]), int(ref[i, column]), column)
+        line += len(sim)
+    return None
+
+
+def delta_first_mismatch(simulation, chunks, reference, threshold, passed=()):
+    """Find the first mismatch, only comparing the chunks of the simulation results which are not known to match
+    Args:
+        simulation (vertools.samples.TextReader): simulation results
+        chunks (List[list]): chunks of the simulation results, as returned by vertools.store.scan
+        reference (numpy.ndarray): all the reference samples
+        threshold (int): maximum allowed absolute difference
+        passed (Iterable[list]): chunks which already matched the same reference with the same threshold
+    Returns:
+        Tuple[Mismatch, int]: the first mismatch (None if all samples match) and the number of skipped chunks
+    """
+    passed = {tuple(chunk) for chunk in passed}
+    skipped = 0
+    for start, end, first_line, lines, checksum in chunks:
+        if (start, end, first_line, lines, checksum) in passed:
+            skipped += 1
+            continue
+        mismatch = first_mismatch(simulation.blocks(start, end, first_line),
+                                  [np.asarray(reference[first_line:first_line + lines])], threshold, first_line + 1)
+        if mismatch is not None:
+            return mismatch, skipped
+    return None, skipped
+
+
+class Stream:
+    """Incremental comparison of two sample streams whose blocks arrive independently
+    Attributes:
+        threshold (Union[int, numpy.ndarray]): maximum allowed absolute difference, or one per column
+        line (int): line number of the next sample to compare
+        pending (List[collections.deque]): simulation and reference blocks waiting for their counterpart. Blocks are
+            queued rather than concatenated, so that every sample is copied at most once
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.line = 1
+        self.pending = [collections.deque(), collections.deque()]
+        self._pending_lengths = [0, 0]
+
+    def push(self, sim, ref):
+        """Add new samples and compare all the ones available on both streams
+        Args:
+            sim (numpy.ndarray): new simulation samples
+            ref (numpy.ndarray): new reference samples
+        Returns:
+            Mismatch: the first mismatch among the newly compared samples, or None. The samples following the
+            mismatch are left pending
+        """
+        for side, block in enumerate((sim, ref)):
+            if len(block) > 0:
+                self.pending[side].append(block)
+                self._pending_lengths[side] += len(block)
+        sims, refs = self.pending
+        while sims and refs:
+            n = min(len(sims[0]), len(refs[0]))
+            mismatch = first_mismatch([sims[0][:n]], [refs[0][:n]], self.threshold, self.line)
+            self.line += n
+            for queue, side in (sims, 0), (refs, 1):
+                self._pending_lengths[side] -= n
+                if len(queue[0]) == n:
+                    queue.popleft()
+                else:
+                    queue[0] = queue[0][n:]
+            if mismatch is not None:
+                return mismatch
+        return None
+
+    def lengths(self):
+        """Get the number of samples received on each stream
+        Returns:
+            Tuple[int, int]: simulation and reference lengths
+        """
+        return self.line - 1 + self._pending_lengths[0], self.line - 1 + self._pending_lengths[1]
+
+    def readable(self):
+        """Check which streams may receive more samples without buffering more than MAX_LAG samples ahead of the
+        other one
+        Returns:
+            List[bool]: whether the simulation and the reference can be read
+        """
+        return [length < MAX_LAG for length in self._pending_lengths]
+
+
+def parallel_split(simulation, reference, jobs):
+    """Split two results files at the same line numbers, for parallel comparison. Files are read once, in parallel:
+    the simulation is cut in byte ranges of about the same size, the lines of these ranges and of reference ranges
+    are counted by the workers, then the reference offsets of the cuts are searched in the reference ranges holding
+    them.
+    Args:
+        simulation (vertools.samples.Reader): simulation results
+        reference (vertools.samples.Reader): reference results
+        jobs (int): number of worker processes
+    Returns:
+        Tuple[int, int, List[tuple]]: number of lines of the simulation and of the reference, and the simulation byte
+        range, reference byte range and 0-based first line of each chunk, as (sim_start, sim_end, ref_start, ref_end,
+        first_line)
+    """
+    # Use more chunks than workers to balance the load and to stop early on mismatches
+    sim_bounds = simulation.boundaries(jobs * 4)
+    ref_bounds = reference.boundaries(jobs * 4)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        ranges = [(simulation, start, end) for start, end in zip(sim_bounds, sim_bounds[1:])] + \
+                 [(reference, start, end) for start, end in zip(ref_bounds, ref_bounds[1:])]
+        counts = list(pool.map(_count_range, ranges))
+        sim_lines = [0]
+        for count in counts[:len(sim_bounds) - 1]:
+            sim_lines.append(sim_lines[-1] + count)
+        ref_lines = [0]
+        for count in counts[len(sim_bounds) - 1:]:
+            ref_lines.append(ref_lines[-1] + count)
+        searches = []
+        for line in sim_lines[1:-1]:
+            k = bisect.bisect_right(ref_lines, line) - 1
+            # Cuts past the end of the reference are mapped to its end
+            searches.append((reference, ref_bounds[k], line - ref_lines[k]) if k < len(ref_bounds) - 1 else
+                            (reference, ref_bounds[-1], 0))
+        ref_cuts = [ref_bounds[0]] + list(pool.map(_line_offset, searches)) + [ref_bounds[-1]]
+    chunks = [(sim_bounds[k], sim_bounds[k + 1], ref_cuts[k], ref_cuts[k + 1], sim_lines[k])
+              for k in range(len(sim_bounds) - 1)]
+    return sim_lines[-1], ref_lines[-1], chunks
+
+
+def _count_range(task):
+    """Count the lines of a byte range of a results file"""
+    reader, start, end = task
+    return reader.count(start, end)
+
+
+def _line_offset(task):
+    """Find the byte offset of a line, counted from a line boundary of a results file"""
+    reader, start, line = task
+    return reader.offsets([line], start)[0]
+
+
+def parallel_first_mismatch(simulation, reference, threshold, jobs, split=None):
+    """Find the first mismatch by comparing line-aligned chunks of two results files in a process pool.
+    Both files are split at the same line numbers; each chunk is compared independently and the chunk results are
+    merged in order, so that the outcome is the same as first_mismatch.
+    Args:
+        simulation (vertools.samples.Reader): simulation results
+        reference (vertools.samples.Reader): reference results
+        threshold (int): maximum allowed absolute difference
+        jobs (int): number of worker processes
+        split (tuple): split of the files, as returned by parallel_split, if already known
+    Returns:
+        Mismatch: the first mismatch, or None if all samples match
+    """
+    if split is None:
+        split = parallel_split(simulation, reference, jobs)
+    tasks = [(simulation, sim_start, sim_end, reference, ref_start, ref_end, threshold, first_line)
+             for sim_start, sim_end, ref_start, ref_end, first_line in split[2]]
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+    try:
+        for mismatch in pool.map(_compare_chunk, tasks):
+            if mismatch is not None:
+                return mismatch
+        return None
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _compare_chunk(task):
+    """Compare a chunk of two results files
+    Args:
+        task (tuple): readers, byte ranges, threshold and first line, as built by parallel_first_mismatch
+    Returns:
+        Mismatch: first mismatch of the chunk, or None
+    """
+    simulation, sim_start, sim_end, reference, ref_start, ref_end, threshold, first_line = task
+    return first_mismatch(simulation.blocks(sim_start, sim_end, first_line),
+                          reference.blocks(ref_start, ref_end, first_line), threshold, first_line + 1)
+
+
+class TimeAxis:
+    """Sampling instants of a results file: sample k is taken at tstart + k * tstep, and holds its value until the
+    next sample
+    Attributes:
+        tstart (float): time of the first sample
+        tstep (float): sampling period
+        length (int): number of samples, limited to the ones taken before tend
+    """
+
+    def __init__(self, tstart, tstep, length, tend=None):
+        self.tstart = float(tstart)
+        self.tstep = float(tstep)
+        if tend is not None:
+            length = min(length, max(int(np.ceil((tend - self.tstart) / self.tstep - EPSILON)), 0))
+        self.length = length
+
+    @property
+    def tend(self):
+        """End of the last sample's period"""
+        return self.tstart + self.length * self.tstep
+
+    def indices(self, times):
+        """Get the samples holding the value at some instants
+        Args:
+            times (numpy.ndarray): instants within [tstart, tend)
+        Returns:
+            numpy.ndarray: sample indices
+        """
+        indices = np.floor((times - self.tstart) / self.tstep + EPSILON).astype(np.int64)
+        return np.clip(indices, 0, max(self.length - 1, 0), out=indices)
+
+
+def comparison_instants(sim_axis, ref_axis, latency=0.0, tstart=None, tend=None, tstep=None):
+    """Get the instants at which simulation and reference are compared: a regular grid over the time span covered by
+    both results, optionally restricted to a window
+    Args:
+        sim_axis (TimeAxis): simulation sampling instants
+        ref_axis (TimeAxis): reference sampling instants
+        latency (float): delay of the simulation with respect to the reference
+        tstart (float): first instant, None to start with the results
+        tend (float): end of the comparison (excluded), None to stop with the results
+        tstep (float): comparison period, None for the slower of the two sampling periods
+    Returns:
+        Tuple[float, float, int]: first instant, period and number of instants, in the reference time frame
+    """
+    tstep = float(tstep) if tstep else max(sim_axis.tstep, ref_axis.tstep)
+    low = max(sim_axis.tstart - latency, ref_axis.tstart)
+    high = min(sim_axis.tend - latency, ref_axis.tend)
+    tstart = low if tstart is None else max(float(tstart), low)
+    tend = high if tend is None else min(float(tend), high)
+    return tstart, tstep, max(int(np.ceil((tend - tstart) / tstep - EPSILON)), 0)
+
+
+def time_aligned_blocks(simulation, reference, sim_axis, ref_axis, latency=0.0, tstart=None, tend=None, tstep=None,
+                        size=ALIGN_BLOCK):
+    """Resample simulation and reference at common instants
+    Args:
+        simulation (numpy.ndarray): all the simulation samples, possibly memory-mapped
+        reference (numpy.ndarray): all the reference samples, possibly memory-mapped
+        sim_axis (TimeAxis): simulation sampling instants
+        ref_axis (TimeAxis): reference sampling instants
+        latency (float): delay of the simulation with respect to the reference: the simulation sample at t + latency
+            is compared with the reference sample at t
+        tstart (float): first compared instant, None to start with the results
+        tend (float): end of the comparison (excluded), None to stop with the results
+        tstep (float): comparison period, None for the slower of the two sampling periods
+        size (int): maximum number of instants resampled at once
+    Yields:
+        Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]: 0-based simulation line of each instant, and the aligned
+            simulation and reference samples
+    """
+    tstart, tstep, count = comparison_instants(sim_axis, ref_axis, latency, tstart, tend, tstep)
+    for first in range(0, count, size):
+        times = tstart + np.arange(first, min(first + size, count)) * tstep
+        lines = sim_axis.indices(times + latency)
+        yield lines, simulation[lines].astype(np.int64, copy=False), \
+            reference[ref_axis.indices(times)].astype(np.int64, copy=False)
+
+
+def time_aligned_first_mismatch(blocks, threshold):
+    """Find the first mismatch between time-aligned samples
+    Args:
+        blocks (Iterable[tuple]): aligned samples, as generated by time_aligned_blocks
+        threshold (Union[int, numpy.ndarray]): maximum allowed absolute difference, or one per column
+    Returns:
+        Mismatch: the first mismatch, with the line number of the simulation sample, or None if all samples match
+    """
+    for lines, sim, ref in blocks:
+        mismatch = first_mismatch([sim], [ref], threshold, first_line=0)
+        if mismatch is not None:
+            mismatch.line = int(lines[mismatch.line]) + 1
+            return mismatch
+    return None
+
+
+def find_latency(simulation, reference, sim_axis, ref_axis, max_lag, window=ALIGN_BLOCK * 4):
+    """Estimate the delay of the simulation with respect to the reference as the lag maximizing their
+    cross-correlation, computed by FFT on the first instants of both results
+    Args:
+        simulation (numpy.ndarray): all the simulation samples, possibly memory-mapped
+        reference (numpy.ndarray): all the reference samples, possibly memory-mapped
+        sim_axis (TimeAxis): simulation sampling instants
+        ref_axis (TimeAxis): reference sampling instants
+        max_lag (int): maximum absolute delay, in comparison periods
+        window (int): maximum number of instants correlated
+    Returns:
+        float: delay, a multiple of the comparison period. Ties are resolved in favor of the smallest delay
+    """
+    tstart, tstep, count = comparison_instants(sim_axis, ref_axis)
+    times = tstart + np.arange(min(count, window)) * tstep
+    sim = simulation[sim_axis.indices(times)].astype(np.float64)
+    ref = reference[ref_axis.indices(times)].astype(np.float64)
+    if len(times) == 0:
+        return 0.0
+    sim -= sim.mean(axis=0)
+    ref -= ref.mean(axis=0)
+    if sim.ndim == 1:
+        correlation = signal.correlate(sim, ref, mode='full', method='fft')
+    else:
+        # Channels share the same delay: sum their correlations
+        correlation = sum(signal.correlate(sim[:, k], ref[:, k], mode='full', method='fft')
+                          for k in range(sim.shape[1]))
+    lags = signal.correlation_lags(len(sim), len(ref), mode='full')
+    valid = np.abs(lags) <= min(max_lag, len(times) - 1)
+    lags, correlation = lags[valid], correlation[valid]
+    order = np.argsort(np.abs(lags), kind='stable')
+    best = order[np.argmax(correlation[order])]
+    return float(lags[best]) * tstep
+
+
+class Report:
+    """Streaming accumulator of comparison statistics.
+    Memory usage is bounded: error runs after the first `max_runs` ones are only counted, and the error histogram
+    has one bin per power of two.
+    On multi-column results, a sample is a line: it mismatches when any of its columns exceeds the column threshold,
+    and runs record the maximum error over all columns. Error statistics are computed over all the values, and
+    mismatches and maximum errors are also counted per column.
+    Attributes:
+        threshold (Union[int, numpy.ndarray]): maximum allowed absolute difference, or one per column
+        max_runs (int): maximum number of stored error runs
+        columns (List[str]): column names, None for single-column results
+        samples (int): number of compared samples
+        values (int): number of compared values
+        mismatches (int): number of samples exceeding the threshold
+        first (Mismatch): first mismatch, None if there is none
+        runs (List[List[int]]): stored error runs as [first line, last line, maximum absolute error]
+        run_count (int): total number of error runs, including the ones which were not stored
+        max_error (int): maximum absolute error
+        sum_error (int): sum of the absolute errors
+        sum_squared_error (float): sum of the squared errors
+        histogram (numpy.ndarray): absolute error counts; bin 0 holds null errors, bin k errors in [2**(k-1), 2**k)
+        column_mismatches (numpy.ndarray): number of values exceeding the threshold in each column
+        column_max_error (numpy.ndarray): maximum absolute error of each column
+    """
+    BINS = 65
+
+    def __init__(self, threshold, max_runs=1000, columns=None):
+        self.threshold = threshold
+        self.max_runs = max_runs
+        self.columns = columns
+        self.samples = 0
+        self.values = 0
+        self.mismatches = 0
+        self.first = None
+        self.runs = []
+        self.run_count = 0
+        self.max_error = 0
+        self.sum_error = 0
+        self.sum_squared_error = 0.0
+        self.histogram = np.zeros(self.BINS, dtype=np.int64)
+        ncolumns = len(columns) if columns is not None else 1
+        self.column_mismatches = np.zeros(ncolumns, dtype=np.int64)
+        self.column_max_error = np.zeros(ncolumns, dtype=np.int64)
+        # Whether the last compared sample was a mismatch, so that the next block may continue its run
+        self._run_open = False
+
+    def update(self, sim, ref):
+        """Account for a new block of samples
+        Args:
+            sim (numpy.ndarray): simulation samples; 2-D for multi-column results
+            ref (numpy.ndarray): reference samples, aligned with sim
+        """
+        if len(sim) == 0:
+            return
+        errors = np.abs(sim - ref)
+        first_line = self.samples + 1
+        self.samples += len(errors)
+        self.values += errors.size
+        self.max_error = max(self.max_error, int(errors.max()))
+        self.sum_error += int(errors.sum())
+        flat = errors.ravel().astype(np.float64)
+        self.sum_squared_error += float(np.dot(flat, flat))
+        magnitudes = np.frexp(flat)[1]
+        self.histogram += np.bincount(magnitudes, minlength=self.BINS)[:self.BINS]
+        values_mask = errors > self.threshold
+        if self.first is None and values_mask.any():
+            self.first = first_mismatch([sim], [ref], self.threshold, first_line)
+        if errors.ndim == 2:
+            self.column_mismatches += np.count_nonzero(values_mask, axis=0)
+            self.column_max_error = np.maximum(self.column_max_error, errors.max(axis=0))
+            mask = values_mask.any(axis=1)
+            errors = errors.max(axis=1)
+        else:
+            mask = values_mask
+            self.column_mismatches[0] += int(np.count_nonzero(mask))
+            self.column_max_error[0] = self.max_error
+        # Error runs
+        self.mismatches += int(np.count_nonzero(mask))
+        edges = np.diff(mask.astype(np.int8), prepend=0, append=0)
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        if len(starts) == 0:
+            self._run_open = False
+            return
+        # Samples between runs are cleared, so that the maximum over [start, next start) is the run's maximum
+        maxima = np.maximum.reduceat(np.where(mask, errors, 0), starts)
+        if self._run_open and starts[0] == 0:
+            # Continuation of the last run of the previous block
+            if self.run_count <= self.max_runs and self.runs:
+                run = self.runs[-1]
+                run[1] = first_line + int(ends[0]) - 1
+                run[2] = max(run[2], int(maxima[0]))
+            starts, ends, maxima = starts[1:], ends[1:], maxima[1:]
+        room = max(self.max_runs - len(self.runs), 0)
+        for start, end, maximum in zip(starts[:room], ends[:room], maxima[:room]):
+            self.runs.append([first_line + int(start), first_line + int(end) - 1, int(maximum)])
+        self.run_count += len(starts)
+        self._run_open = bool(mask[-1])
+
+    def to_dict(self):
+        """Summarize the report
+        Returns:
+            dict: JSON serializable report
+        """
+        nonempty = np.flatnonzero(self.histogram)
+        last_bin = int(nonempty[-1]) + 1 if len(nonempty) > 0 else 0
+        histogram = []
+        for k in range(last_bin):
+            low, high = (0, 0) if k == 0 else (2 ** (k - 1), 2 ** k - 1)
+            histogram.append({'min': low, 'max': high, 'count': int(self.histogram[k])})
+        first = None
+        if self.first is not None:
+            first = {'line': self.first.line, 'simulation': self.first.simulation,
+                     'reference': self.first.reference}
+            if self.columns is not None:
+                first['column'] = self.columns[self.first.column]
+        result = {
+            'threshold': np.asarray(self.threshold).tolist(),
+            'samples': self.samples,
+            'mismatches': self.mismatches,
+            'first_mismatch': first,
+            'max_abs_error': self.max_error,
+            'mean_abs_error': self.sum_error / self.values if self.values else 0.0,
+            'rms_error': float(np.sqrt(self.sum_squared_error / self.values)) if self.values else 0.0,
+            'histogram': histogram,
+            'runs': {
+                'count': self.run_count,
+                'truncated': self.run_count > len(self.runs),
+                'items': [{'first_line': first, 'last_line': last, 'length': last - first + 1, 'max_abs_error': m}
+                          for first, last, m in self.runs]
+            }
+        }
+        if self.columns is not None:
+            thresholds = np.broadcast_to(self.threshold, (len(self.columns),))
+            result['columns'] = [
+                {'name': name, 'threshold': int(thresholds[k]), 'mismatches': int(self.column_mismatches[k]),
+                 'max_abs_error': int(self.column_max_error[k])}
+                for k, name in enumerate(self.columns)
+            ]
+        return result
+
+    def save(self, path):
+        """Save the report as a JSON file
+        Args:
+            path (str): output file path
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def report(simulation, reference, threshold, max_runs=1000, columns=None):
+    """Compare all the samples and collect mismatch statistics in a single pass
+    Args:
+        simulation (Iterable[numpy.ndarray]): simulation sample blocks
+        reference (Iterable[numpy.ndarray]): reference sample blocks
+        threshold (Union[int, numpy.ndarray]): maximum allowed absolute difference, or one per column
+        max_runs (int): maximum number of error runs to store
+        columns (List[str]): column names of multi-column results
+    Returns:
+        Report
+    """
+    result = Report(threshold, max_runs, columns)
+    for sim, ref in aligned_blocks(simulation, reference):
+        result.update(sim, ref)
+    return result
@@ -1,8 +1,41 @@
 import configparser
+import hashlib
+import os
+import pickle
+import tempfile
+
 import engfmt
 
+# Folder of the parsed configuration files, unless overridden by the VERTOOLS_CONFIG_CACHE environment variable. An
+# empty value disables the cache
+CONFIG_CACHE = '~/.cache/vertools/configs'
+
+
+def optional_quantity(s):
+    return engfmt.Quantity(s) if s != '' else None
+
+
+def optional_int(s):
+    return int(s) if s != '' else None
+
+
+def latency(s):
+    return s if s == 'auto' else engfmt.Quantity(s)
+
+
+def words(s):
+    return s.replace(',', ' ').split()
+
+
+def int_list(s):
+    return [int(value) for value in words(s)]
+
+
 converters = {
     'Input': {
+        'bits': optional_int,
+        'signed': lambda s: True if s.lower() == 'true' else False,
+        'saturate': lambda s: True if s.lower() == 'true' else False,
         'tstart': engfmt.Quantity,
         'tend': engfmt.Quantity,
         'tstep': engfmt.Quantity
@@ -12,24 +45,106 @@ converters = {
         'tstart': engfmt.Quantity,
         'tend': engfmt.Quantity,
         'tstep': engfmt.Quantity,
-        'clock': engfmt.Quantity
+        'clock': engfmt.Quantity,
+        'timeout': optional_quantity
     },
-    'Verification': {
-        'log': lambda s: True if s.lower() == 'true' else False,
-        'threshold': int,
+    'Reference': {
+        'disable_log': lambda s: True if s.lower() == 'true' else False,
+        'timeout': optional_quantity,
         'tstart': engfmt.Quantity,
         'tend': engfmt.Quantity,
         'tstep': engfmt.Quantity
     },
+    'Verification': {
+        'log': lambda s: True if s.lower() == 'true' else False,
+        'threshold': int,
+        'columns': words,
+        'thresholds': int_list,
+        'report_max_runs': int,
+        'jobs': int,
+        'stream': lambda s: True if s.lower() == 'true' else False,
+        'store': lambda s: True if s.lower() == 'true' else False,
+        'align': lambda s: True if s.lower() == 'true' else False,
+        'latency': latency,
+        'max_latency': int,
+        'tstart': optional_quantity,
+        'tend': optional_quantity,
+        'tstep': optional_quantity
+    },
+    'Regression': {
+        'jobs': int
+    },
+    'Progress': {
+        'enable': lambda s: True if s.lower() == 'true' else False,
+        'interval': engfmt.Quantity
+    },
+    'Cache': {
+        'max_size': engfmt.Quantity,
+        'disable': lambda s: True if s.lower() == 'true' else False
+    },
+    'CommandLine': {
+        'value': int,
+        'amplitude': int,
+        'frequency': engfmt.Quantity,
+        'phase': float,
+        'duration': engfmt.Quantity,
+        'f0': engfmt.Quantity,
+        'f1': engfmt.Quantity
+    },
 }
 
 
+def convert(section, parameter, value):
+    """Convert a textual parameter value to its type
+    Args:
+        section (str): section name
+        parameter (str): parameter name
+        value (any): parameter value. Only strings are converted, other values are returned as they are
+    Returns:
+        Any
+    """
+    if not isinstance(value, str):
+        return value
+    return converters.get(section, {}).get(parameter, str)(value)
+
+
+def _parse_config(filename):
+    """Parse a config file and convert its parameters
+    Args:
+        filename (str): configuration file name
+    Returns:
+        Dict[str, dict]: parameter values by section
+    """
+    data = {}
+    config = configparser.ConfigParser(interpolation=configparser.ExtendedInterpolation())
+    config.read(filename)
+    for section in config:
+        data[section] = {}
+        for parameter in config[section]:
+            data[section][parameter] = convert(section, parameter, config[section][parameter])
+    return data
+
+
+def _config_key(content):
+    """Compute the cache key of a config file: its content and everything its conversion depends on
+    Args:
+        content (bytes): file content
+    Returns:
+        str
+    """
+    # The converters are defined in this module
+    info = os.stat(__file__)
+    stamp = f"{info.st_size}:{info.st_mtime_ns}:{engfmt.__version__}:{pickle.HIGHEST_PROTOCOL}"
+    return hashlib.blake2b(content + stamp.encode(), digest_size=20).hexdigest()
+
+
 class Scope:
     """A data container with scoping capabilities
     Attributes:
-        data (dict): data
+        data (dict): data. Once the scope belongs to a context, it must only be modified through set
         upper (Scope): more local scope
         lower (Scope): more global scope
+        context (Context): context holding the scope, notified of its changes
     """
 
     def __init__(self, data=None):
@@ -40,23 +155,56 @@ class Scope:
         self.data = data if data is not None else {}
         self.upper = None
         self.lower = None
+        self.context = None
 
     @classmethod
-    def from_config(cls, filename):
-        """Generate a Scope by analysing a config file
+    def from_config(cls, filename, cache=True):
+        """Generate a Scope by analysing a config file.
+        Converted parameters are cached on disk by content, so that a file is only parsed again when it changes.
         Args:
             filename (str): configuration file name
+            cache (bool): whether to use the cache of parsed configuration files
+        Returns:
+            Scope
+        """
+        folder = os.path.expanduser(os.environ.get('VERTOOLS_CONFIG_CACHE', CONFIG_CACHE))
+        if not cache or folder == '':
+            return cls(_parse_config(filename))
+        try:
+            with open(filename, 'rb') as f:
+                content = f.read()
+        except OSError:
+            # Missing files are empty configurations
+            return cls(_parse_config(filename))
+        entry = os.path.join(folder, _config_key(content) + '.pickle')
+        try:
+            with open(entry, 'rb') as f:
+                return cls(pickle.load(f))
+        except Exception:
+            # Missing, or written by an incompatible version
+            pass
+        data = _parse_config(filename)
+        try:
+            os.makedirs(folder, exist_ok=True)
+            descriptor, staging = tempfile.mkstemp(dir=folder, suffix='.tmp')
+            with os.fdopen(descriptor, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(staging, entry)
+        except OSError:
+            pass
+        return cls(data)
+
+    @classmethod
+    def from_dict(cls, sections):
+        """Generate a Scope from a dictionary of sections, such as a parsed JSON object
+        Args:
+            sections (Dict[str, dict]): parameter values by section. String values are converted as in config files
         Returns:
             Scope
         """
         data = {}
-        config = configparser.ConfigParser(interpolation=configparser.ExtendedInterpolation())
-        config.read(filename)
-        for section in config:
-            data[section] = {}
-            for parameter in config[section]:
-                converter = converters.get(section, {}).get(parameter, str)
-                data[section][parameter] = converter(config[section][parameter])
+        for section, parameters in sections.items():
+            data[section] = {parameter: convert(section, parameter, value) for parameter, value in parameters.items()}
         return cls(data)
 
     @classmethod
@@ -98,6 +246,8 @@ class Scope:
             self.data[section][parameter] = value
         else:
             self.data[section] = {parameter: value}
+        if self.context is not None:
+            self.context.refresh(section, parameter)
 
     def __contains__(self, section):
         return section in self.data
@@ -116,10 +266,13 @@ class Scope:
 
 
 class Context:
-    """A manager for multiple nested scopes
+    """A manager for multiple nested scopes.
+    Lookups do not walk the scopes: the context keeps a merged view of all of them, updated whenever a scope is
+    appended or modified.
     Attributes:
         _head (Scope): service internal scope
         _tail (Scope): service internal scope
+        _view (Dict[str, dict]): value of each parameter in the most local scope defining it, by section
     """
 
     def __init__(self):
@@ -130,6 +283,7 @@ class Context:
         # Set cross references
         self._head.lower = self._tail
         self._tail.upper = self._head
+        self._view = {}
 
     @staticmethod
     def place_between(scope, first, second):
@@ -152,6 +306,10 @@ class Context:
             scope (Scope): new scope to append
         """
         self.place_between(scope, self._head, self.most_local())
+        scope.context = self
+        # The new scope overrides all the others
+        for section, parameters in scope.data.items():
+            self._view.setdefault(section, {}).update(parameters)
 
     def append_global(self, scope):
         """Append a new global scope
@@ -159,6 +317,25 @@ class Context:
             scope (Scope): new scope to append
         """
         self.place_between(scope, self.most_global(), self._tail)
+        scope.context = self
+        # The new scope only provides the parameters missing from all the others
+        for section, parameters in scope.data.items():
+            merged = self._view.setdefault(section, {})
+            for parameter, value in parameters.items():
+                merged.setdefault(parameter, value)
+
+    def refresh(self, section, parameter):
+        """Update the merged value of a parameter after it was set in one of the scopes
+        Args:
+            section (str): section name
+            parameter (str): parameter name
+        """
+        scope = self.most_local()
+        while scope is not self._tail:
+            if section in scope and parameter in scope[section]:
+                self._view.setdefault(section, {})[parameter] = scope[section][parameter]
+                return
+            scope = scope.lower
 
     def most_local(self):
         """Get the most local scope in the chain
@@ -186,23 +363,13 @@ class Context:
         Raises:
             Context.LookupError: when a section or parameter is not found in any scope
         """
-        return self._get(self.most_local(), section, parameter, fallback)
-
-    def _get(self, scope, section, parameter, fallback):
-        """Recursive version for the Context.get method"""
-        if section in scope:
-            if parameter in scope[section]:
-                return scope.get(section, parameter)
-        # Try to look in lower scope
-        if scope.lower is not self._tail:
-            return self._get(scope.lower, section, parameter, fallback)
-        else:
-            # Reached tail
+        try:
+            return self._view[section][parameter]
+        except KeyError:
             if fallback is not None:
                 return fallback
-            else:
-                raise Context.LookupError(
-                    f"Context cannot find parameter {parameter} of section {section} under any scope")
+            raise Context.LookupError(
+                f"Context cannot find parameter {parameter} of section {section} under any scope")
 
     def set(self, section, parameter, value):
         """Set or overwrite a parameter in the most local scope
@@ -0,0 +1,147 @@
+import glob
+import hashlib
+import json
+import os
+
+# Suffix of the file storing the fingerprint of the run which produced a results file
+SUFFIX = '.fingerprint'
+# Number of bytes hashed at once
+HASH_CHUNK = 1 << 20
+
+
+def file_digest(path):
+    """Hash the content of a file
+    Args:
+        path (str): path to the file
+    Returns:
+        str: SHA-256 digest, or None if the file does not exist
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def sources(patterns):
+    """Expand a list of source file patterns
+    Args:
+        patterns (str): whitespace separated glob patterns; `**` matches any number of folders
+    Returns:
+        List[str]: sorted file paths
+    """
+    paths = set()
+    for pattern in patterns.split():
+        paths.update(path for path in glob.glob(pattern, recursive=True) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def fingerprint(values, files):
+    """Compute the fingerprint of a run
+    Args:
+        values (dict): JSON serializable parameters of the run, such as commands
+        files (Iterable[str]): paths to the files read by the run
+    Returns:
+        str
+    """
+    description = {'values': values, 'files': {path: file_digest(path) for path in files}}
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def is_up_to_date(results, digest):
+    """Check whether a results file was produced by a run with the same fingerprint, and was not modified since
+    Args:
+        results (str): path to the results file
+        digest (str): fingerprint of the new run
+    Returns:
+        bool
+    """
+    try:
+        with open(results + SUFFIX, 'r') as f:
+            record = json.load(f)
+        info = os.stat(results)
+    except (OSError, ValueError):
+        return False
+    return record == {'fingerprint': digest, 'size': info.st_size, 'mtime': info.st_mtime_ns}
+
+
+def record(results, digest):
+    """Store the fingerprint of the run which produced a results file
+    Args:
+        results (str): path to the results file
+        digest (str): fingerprint of the run
+    """
+    info = os.stat(results)
+    with open(results + SUFFIX, 'w') as f:
+        json.dump({'fingerprint': digest, 'size': info.st_size, 'mtime': info.st_mtime_ns}, f)
+
+
+def invalidate(results):
+    """Forget the fingerprint of a results file
+    Args:
+        results (str): path to the results file
+    """
+    try:
+        os.remove(results + SUFFIX)
+    except OSError:
+        pass
+
+
+def snapshot(paths, previous=None):
+    """Record the state of some source files
+    Args:
+        paths (Iterable[str]): paths to the files
+        previous (dict): older snapshot, whose digests are reused for the files with unchanged size and mtime
+    Returns:
+        dict: [mtime, size, digest] by path
+    """
+    previous = previous if previous is not None else {}
+    state = {}
+    for path in paths:
+        info = os.stat(path)
+        old = previous.get(path, None)
+        if old is not None and old[:2] == [info.st_mtime_ns, info.st_size]:
+            state[path] = old
+        else:
+            state[path] = [info.st_mtime_ns, info.st_size, file_digest(path)]
+    return state
+
+
+def changed(old, new):
+    """Check whether the content of the files changed between two snapshots
+    Args:
+        old (dict): older snapshot, None if unknown
+        new (dict): newer snapshot
+    Returns:
+        bool
+    """
+    if old is None or old.keys() != new.keys():
+        return True
+    return any(old[path][2] != new[path][2] for path in new)
+
+
+def load_snapshot(path):
+    """Load a snapshot
+    Args:
+        path (str): snapshot file
+    Returns:
+        dict: snapshot, None if the file does not exist or is not valid
+    """
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_snapshot(path, state):
+    """Save a snapshot
+    Args:
+        path (str): snapshot file
+        state (dict): snapshot
+    """
+    with open(path, 'w') as f:
+        json.dump(state, f)
@@ -0,0 +1,19 @@
+import importlib
+
+
+class LazyModule:
+    """Placeholder of a module which is only imported on first attribute access, so that commands which do not need
+    a heavy dependency do not pay for its import at startup
+    Attributes:
+        name (str): absolute module name
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getattr__(self, attribute):
+        # The module is cached by the import system, which also serializes concurrent imports
+        return getattr(importlib.import_module(self.name), attribute)
+
+    def __repr__(self):
+        return f"LazyModule({self.name!r})"
@@ -1,3 +1,11 @@
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+
 FORMAT_CODES = {
     'HEADER': '\033[95m',
     'BLUE': '\033[94m',
@@ -10,6 +18,220 @@ FORMAT_CODES = {
     'UNDERLINE': '\033[4m'
 }
 
+# Message levels: messages below the verbosity level are discarded
+ERROR = 40
+WARNING = 30
+STATUS = 20
+UPDATE = 10
+LEVELS = {'error': ERROR, 'warning': WARNING, 'status': STATUS, 'update': UPDATE}
+
+# Serializes the writes of all the sinks, so that lines of concurrent tasks are never mixed
+_write_lock = threading.Lock()
+
+
+class Record:
+    """A message
+    Attributes:
+        kind (str): message type: error, warning, status, success, update or progress
+        level (int): message level
+        message (str): message text
+        indentation (int): indentation level
+        style (list): format codes of the message
+        title (str): title printed before the message
+        title_style (list): format codes of the title
+        time (float): creation time (s since the epoch)
+    """
+
+    def __init__(self, kind, level, message, indentation=0, style=(), title='', title_style=None):
+        self.kind = kind
+        self.level = level
+        self.message = message
+        self.indentation = indentation
+        self.style = style
+        self.title = title
+        self.title_style = title_style if title_style is not None else style
+        self.time = time.time()
+
+
+class TextSink:
+    """Sink printing messages as indented text lines, colored with ANSI escape sequences
+    Attributes:
+        stream (io.TextIOBase): destination, None for the current sys.stdout
+        color (bool): whether to color messages, None to color them only on terminals unless NO_COLOR is set
+    """
+
+    def __init__(self, stream=None, color=None):
+        self.stream = stream
+        self.color = color
+
+    def to(self, stream):
+        """Get a sink with the same settings writing on another stream"""
+        return type(self)(stream, self.color)
+
+    def destination(self):
+        return self.stream if self.stream is not None else sys.stdout
+
+    def colored(self, destination):
+        """Check whether messages printed on a stream are colored"""
+        if self.color is not None:
+            return self.color
+        try:
+            return destination.isatty() and 'NO_COLOR' not in os.environ
+        except (AttributeError, ValueError):
+            return False
+
+    def format(self, record, color):
+        """Format a message as a line of text"""
+        output = ''
+        if record.title:
+            title = record.title + ': '
+            output += decorate(title, record.title_style) if color else title
+        output += decorate(record.message, record.style) if color else record.message
+        return indent(output, record.indentation)
+
+    def emit(self, records):
+        """Print some messages at once
+        Args:
+            records (List[Record]): messages
+        """
+        destination = self.destination()
+        color = self.colored(destination)
+        text = ''.join(self.format(record, color) + '\n' for record in records)
+        with _write_lock:
+            destination.write(text)
+
+
+class JsonSink(TextSink):
+    """Sink printing messages as JSON lines, for log ingestion
+    Attributes:
+        stream (io.TextIOBase): destination, None for the current sys.stdout
+    """
+
+    def __init__(self, stream=None, color=False):
+        super().__init__(stream, False)
+
+    def format(self, record, color):
+        # The title of errors and warnings is their level
+        return json.dumps({'time': record.time, 'level': record.kind, 'message': record.message,
+                           'indentation': record.indentation})
+
+
+class BufferSink:
+    """Sink collecting messages, to be forwarded at once to another sink
+    Attributes:
+        parent (Union[TextSink, BufferSink]): sink receiving the messages on flush
+        records (List[Record]): collected messages
+    """
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.records = []
+
+    def to(self, stream):
+        return self.parent.to(stream)
+
+    def emit(self, records):
+        self.records.extend(records)
+
+    def flush(self):
+        """Forward the collected messages to the parent sink"""
+        records, self.records = self.records, []
+        if records:
+            self.parent.emit(records)
+
+
+def sink(format='text', stream=None, color=None):
+    """Create a sink
+    Args:
+        format (str): `text` or `json`
+        stream (io.TextIOBase): destination, None for the current sys.stdout
+        color (bool): whether to color text messages, None to color them only on terminals
+    Returns:
+        TextSink
+    """
+    if format == 'json':
+        return JsonSink(stream)
+    if format == 'text':
+        return TextSink(stream, color)
+    raise ValueError(f"Unknown output format `{format}`")
+
+
+# Process-wide settings, used unless the current thread or task overrides them
+_default_sink = TextSink()
+_default_verbosity = UPDATE
+# Settings of the current thread or task; None for the process-wide ones
+_sink = contextvars.ContextVar('sink', default=None)
+_verbosity = contextvars.ContextVar('verbosity', default=None)
+
+
+def configure(verbosity=None, format=None, color=None):
+    """Change the process-wide output settings
+    Args:
+        verbosity (str): least important level of the printed messages: error, warning, status or update
+        format (str): `text` or `json`
+        color (bool): whether to color text messages, None to color them only on terminals
+    """
+    global _default_sink, _default_verbosity
+    if verbosity is not None:
+        _default_verbosity = LEVELS[verbosity]
+    if format is not None or color is not None:
+        _default_sink = sink(format if format is not None else 'text', color=color)
+
+
+def current():
+    """Get the sink receiving the messages of the current thread or task
+    Returns:
+        Union[TextSink, BufferSink]
+    """
+    value = _sink.get()
+    return value if value is not None else _default_sink
+
+
+def verbosity():
+    """Get the verbosity level of the current thread or task
+    Returns:
+        int
+    """
+    value = _verbosity.get()
+    return value if value is not None else _default_verbosity
+
+
+@contextlib.contextmanager
+def using(destination=None, level=None):
+    """Override the output settings of the current thread or task, and of the threads started in copies of its
+    context
+    Args:
+        destination (Union[TextSink, BufferSink]): sink receiving the messages, None to keep the current one
+        level (str): verbosity level, None to keep the current one
+    Yields:
+        Union[TextSink, BufferSink]: current sink
+    """
+    tokens = []
+    if destination is not None:
+        tokens.append((_sink, _sink.set(destination)))
+    if level is not None:
+        tokens.append((_verbosity, _verbosity.set(LEVELS[level])))
+    try:
+        yield current()
+    finally:
+        for variable, token in reversed(tokens):
+            variable.reset(token)
+
+
+@contextlib.contextmanager
+def buffered():
+    """Collect all the messages printed by the current thread or task, and print them at once when leaving the
+    context. Messages of concurrent tasks are therefore never interleaved.
+    Yields:
+        BufferSink: message buffer
+    """
+    buffer = BufferSink(current())
+    try:
+        with using(buffer):
+            yield buffer
+    finally:
+        buffer.flush()
+
 
 def decorate(string, codes):
     """Surround a string with ANSI escape sequences to color outputs.
@@ -38,7 +260,7 @@ def indent(message, indentation):
     return ' ' * indentation + message
 
 
-def print_message(message, style, indentation, title='', title_style=None):
+def print_message(message, style, indentation, title='', title_style=None, level=UPDATE, kind='update'):
     """Print a fully fledged message
     Args:
         message (str): message to print
@@ -46,15 +268,12 @@ def print_message(message, style, indentation, title='', title_style=None):
         indentation (int): indentation level
         title (str): title to print before the message, as in "title: message"
         title_style (list): list of format codes or ANSI formatting characters to apply to the title only
+        level (int): message level; the message is discarded when below the verbosity level
+        kind (str): message type, as reported by structured sinks
     """
-    output = ''
-    if title:
-        if title_style is None:
-            title_style = style
-        output += decorate(title + ': ', title_style)
-    output += decorate(message, style)
-    output = indent(output, indentation)
-    print(output)
+    if level < verbosity():
+        return
+    current().emit([Record(kind, level, message, indentation, style, title, title_style)])
 
 
 def update(message, indentation=0):
@@ -72,7 +291,7 @@ def error(message, indentation=0):
         message (str): error message
         indentation (int): output indentation level
     """
-    print_message(message, ['FAIL'], indentation, 'ERROR', ['FAIL', 'BOLD'])
+    print_message(message, ['FAIL'], indentation, 'ERROR', ['FAIL', 'BOLD'], ERROR, 'error')
 
 
 def warning(message, indentation=0):
@@ -81,7 +300,7 @@ def warning(message, indentation=0):
         message (str): warning message
         indentation (int): indentation level
     """
-    print_message(message, ['WARNING'], indentation, 'WARNING', ['WARNING', 'BOLD'])
+    print_message(message, ['WARNING'], indentation, 'WARNING', ['WARNING', 'BOLD'], WARNING, 'warning')
 
 
 def status(message, indentation=0):
@@ -90,7 +309,7 @@ def status(message, indentation=0):
            message (str): status message
            indentation (int): indentation level
     """
-    print_message(message, ['BLUE'], indentation)
+    print_message(message, ['BLUE'], indentation, level=STATUS, kind='status')
 
 
 def success(message, indentation=0):
@@ -99,7 +318,22 @@ def success(message, indentation=0):
            message (str): success message
            indentation (int): indentation level
     """
-    print_message(message, ['GREEN'], indentation)
+    print_message(message, ['GREEN'], indentation, level=STATUS, kind='success')
+
+
+def progress(message, indentation=0):
+    """Print a progress update at once, even from a task whose messages are buffered, so that long phases report
+    while they run.
+       Args:
+           message (str): progress message
+           indentation (int): indentation level
+    """
+    if UPDATE < verbosity():
+        return
+    destination = current()
+    while isinstance(destination, BufferSink):
+        destination = destination.parent
+    destination.emit([Record('progress', UPDATE, message, indentation, ['CYAN'])])
 
 
 def confirm(message, default=True):
@@ -0,0 +1,103 @@
+import contextlib
+import contextvars
+import json
+import os
+import resource
+import threading
+import time
+import uuid
+
+# Active profiler, None when profiling is disabled
+_profiler = None
+# Name of the command whose phase is running in the current thread or task
+_command = contextvars.ContextVar('command', default=None)
+
+
+class Profiler:
+    """Writer of timing records as JSON lines. Records are appended to the file one by one, so that several runs
+    (and the worker processes of a regression) can share the same file.
+    Attributes:
+        path (str): absolute path to the records file
+        run (str): identifier of this vertools invocation, shared by all its records
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self.run = uuid.uuid4().hex
+        self._lock = threading.Lock()
+
+    def record(self, kind, **fields):
+        """Append a record
+        Args:
+            kind (str): record type: 'phase', 'process' or 'total'
+            **fields: record fields
+        """
+        record = {'run': self.run, 'pid': os.getpid(), 'kind': kind, 'command': _command.get(), **fields}
+        line = json.dumps(record) + '\n'
+        with self._lock, open(self.path, 'a') as f:
+            f.write(line)
+
+
+def enable(path):
+    """Start recording timing information
+    Args:
+        path (str): JSON lines file to which records are appended
+    """
+    global _profiler
+    _profiler = Profiler(path)
+
+
+def enabled():
+    """Check whether profiling is enabled
+    Returns:
+        bool
+    """
+    return _profiler is not None
+
+
+@contextlib.contextmanager
+def phase(command, name):
+    """Time a phase of a command
+    Args:
+        command (str): command name
+        name (str): phase name
+    """
+    token = _command.set(command)
+    start = time.time()
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    status = None
+    try:
+        yield
+    except SystemExit as e:
+        status = e.code if e.code is not None else 0
+        raise
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        _profiler.record('phase', phase=name, start=start, wall_time=time.perf_counter() - wall,
+                         cpu_time=time.thread_time() - cpu, exit=status)
+        _command.reset(token)
+
+
+def process(completed):
+    """Record the resource usage of a terminated child process
+    Args:
+        completed (vertools.system.Completed): terminated command
+    """
+    if _profiler is not None:
+        _profiler.record('process', args=completed.args, returncode=completed.returncode,
+                         wall_time=completed.wall_time, user_time=completed.user_time,
+                         system_time=completed.system_time, max_rss=completed.max_rss)
+
+
+def total(start):
+    """Record the resources used by vertools itself
+    Args:
+        start (float): perf_counter value at startup
+    """
+    if _profiler is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _profiler.record('total', wall_time=time.perf_counter() - start, user_time=usage.ru_utime,
+                         system_time=usage.ru_stime, max_rss=usage.ru_maxrss)
@@ -0,0 +1,256 @@
+import contextvars
+import math
+import os
+import threading
+import time
+
+import vertools.output as output
+
+# Default minimum interval between two progress messages of a phase (s)
+INTERVAL = 5
+# Maximum number of bytes read at once when counting the lines of a results file
+READ_SIZE = 1 << 20
+# Number of bytes read from the end of a log file to find its last line
+LOG_TAIL = 4096
+# Maximum length of a reported log line
+LOG_LINE_LENGTH = 120
+
+
+def expected_samples(tstart, tend, tstep):
+    """Get the number of samples of a results file sampled every tstep from tstart to tend
+    Args:
+        tstart (float): time of the first sample
+        tend (float): end time
+        tstep (float): sampling period
+    Returns:
+        int: number of samples, None if the time parameters are unknown
+    """
+    if tstart is None or tend is None or not tstep:
+        return None
+    return max(math.ceil((float(tend) - float(tstart)) / float(tstep) - 1e-9), 0)
+
+
+def duration(seconds):
+    """Format a duration, such as `1 h 05 min` or `42 s`
+    Args:
+        seconds (float): duration (s)
+    Returns:
+        str
+    """
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} min {seconds:02d} s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} h {minutes:02d} min"
+
+
+class Meter:
+    """Throughput and remaining time of a phase processing samples. Messages are rate-limited: update only prints
+    one when `interval` seconds elapsed since the previous one.
+    Attributes:
+        label (str): name of the phase, such as `Simulation`
+        expected (int): expected number of samples, None if unknown
+        interval (float): minimum interval between two messages (s)
+        indentation (int): indentation of the messages
+        samples (int): number of samples processed so far
+    """
+
+    def __init__(self, label, expected=None, interval=INTERVAL, indentation=2, clock=time.monotonic):
+        self.label = label
+        self.expected = expected
+        self.interval = interval
+        self.indentation = indentation
+        self.samples = 0
+        self._clock = clock
+        self.start = clock()
+        self._last = (self.start, 0)
+
+    def message(self, now):
+        """Describe the progress at some instant
+        Args:
+            now (float): current time, from the meter clock
+        Returns:
+            str
+        """
+        elapsed = now - self.start
+        if self.samples == 0:
+            return f"{self.label}: no samples yet, {duration(elapsed)} elapsed"
+        last_time, last_samples = self._last
+        # Current rate since the previous message; the remaining time uses the average rate, which is steadier
+        rate = (self.samples - last_samples) / (now - last_time) if now > last_time else 0
+        text = f"{self.label}: {self.samples:,}"
+        if self.expected:
+            text += f" of {self.expected:,} samples ({min(self.samples / self.expected, 1):.0%})"
+        else:
+            text += " samples"
+        text += f", {rate:,.0f} samples/s"
+        if self.expected and elapsed > 0:
+            remaining = max(self.expected - self.samples, 0) / (self.samples / elapsed)
+            text += f", ETA {duration(remaining)}"
+        return text
+
+    def due(self):
+        """Check whether a message can be printed"""
+        return self._clock() - self._last[0] >= self.interval
+
+    def report(self):
+        """Print a progress message"""
+        now = self._clock()
+        output.progress(self.message(now), self.indentation)
+        self._last = (now, self.samples)
+
+    def update(self, samples):
+        """Record the number of samples processed so far, and print a message if one is due
+        Args:
+            samples (int): total number of processed samples
+        """
+        self.samples = samples
+        if self.due():
+            self.report()
+
+    def advance(self, samples):
+        """Record newly processed samples, and print a message if one is due
+        Args:
+            samples (int): number of samples processed since the previous call
+        """
+        self.update(self.samples + samples)
+
+    def summary(self):
+        """Print the average throughput of the whole phase"""
+        elapsed = self._clock() - self.start
+        rate = f", {self.samples / elapsed:,.0f} samples/s" if elapsed > 0 else ''
+        output.progress(f"{self.label}: {self.samples:,} samples in {duration(elapsed)}{rate}", self.indentation)
+
+
+def counted(blocks, meter, size=len):
+    """Count the samples of blocks as they are consumed
+    Args:
+        blocks (Iterable[Any]): sample blocks
+        meter (Meter): meter advanced by the size of each block
+        size (Callable[[Any], int]): number of samples of a block
+    Yields:
+        Any: the same blocks
+    """
+    for block in blocks:
+        meter.advance(size(block))
+        yield block
+
+
+class Tail:
+    """Sample counter of a results file which is still being written. Text files are counted by lines, reading only
+    the bytes appended since the previous count; binary files by size.
+    Attributes:
+        path (str): path to the file
+        sample_size (int): bytes per sample of binary files, None for text files
+        header (int): size of the header of binary files (bytes)
+    """
+
+    def __init__(self, path, sample_size=None, header=0):
+        self.path = path
+        self.sample_size = sample_size
+        self.header = header
+        self._offset = 0
+        self._lines = 0
+
+    def count(self):
+        """Count the complete samples written so far
+        Returns:
+            int
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return 0
+        if self.sample_size is not None:
+            return max(size - self.header, 0) // self.sample_size
+        if size < self._offset:
+            # The file was replaced
+            self._offset = self._lines = 0
+        try:
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                while self._offset < size:
+                    data = f.read(min(READ_SIZE, size - self._offset))
+                    if not data:
+                        break
+                    self._lines += data.count(b'\n')
+                    self._offset += len(data)
+        except OSError:
+            pass
+        return self._lines
+
+
+def last_line(path):
+    """Get the last non-empty line of a log file
+    Args:
+        path (str): path to the file
+    Returns:
+        str: line, None if the file is missing or empty
+    """
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - LOG_TAIL, 0))
+            data = f.read()
+    except OSError:
+        return None
+    lines = [line.strip() for line in data.decode('utf-8', errors='replace').splitlines() if line.strip()]
+    if not lines:
+        return None
+    line = lines[-1]
+    return line if len(line) <= LOG_LINE_LENGTH else line[:LOG_LINE_LENGTH - 3] + '...'
+
+
+class Monitor:
+    """Background thread reporting the progress of an external command from the files it writes: the number of
+    samples in its results file, the rate at which they are produced and the time left, and the last line of its
+    log when it changed. The thread only wakes up every `interval` seconds.
+    Attributes:
+        meter (Meter): progress of the results file
+        tail (Tail): sample counter of the results file
+        log (str): path to the log file, None if the command has no log
+    """
+
+    def __init__(self, label, results, sample_size=None, header=0, log=None, expected=None, interval=INTERVAL,
+                 indentation=2):
+        self.meter = Meter(label, expected, interval, indentation)
+        self.tail = Tail(results, sample_size, header)
+        self.log = log
+        self._line = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def report(self):
+        """Print the progress of the command"""
+        self.meter.samples = self.tail.count()
+        self.meter.report()
+        if self.log is not None:
+            line = last_line(self.log)
+            if line is not None and line != self._line:
+                self._line = line
+                output.progress(f"log: {line}", self.meter.indentation + 2)
+
+    def run(self):
+        while not self._stop.wait(self.meter.interval):
+            self.report()
+
+    def start(self):
+        """Start reporting, with the output settings of the current thread"""
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self.run,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop reporting"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
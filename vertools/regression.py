@@ -0,0 +1,112 @@
+import json
+import os
+
+import vertools.context as context
+
+
+class ManifestError(ValueError):
+    pass
+
+
+class Case:
+    """A regression test case: an input waveform and the parameters overriding the current context
+    Attributes:
+        name (str): case name, also used as the name of its working directory
+        waveform (dict): waveform type and parameters, as in the generate-inputs command line. None to keep the
+            input file of the project
+        config (Dict[str, dict]): overridden parameters by section
+    """
+
+    def __init__(self, name, waveform=None, config=None):
+        self.name = name
+        self.waveform = waveform
+        self.config = config if config is not None else {}
+
+    def scope(self):
+        """Generate the scope holding the case parameters
+        Returns:
+            vertools.context.Scope
+        """
+        sections = {section: dict(parameters) for section, parameters in self.config.items()}
+        if self.waveform is not None:
+            parameters = {('waveform' if key == 'type' else key): value for key, value in self.waveform.items()}
+            sections.setdefault('CommandLine', {}).update(parameters)
+        return context.Scope.from_dict(sections)
+
+
+class Result:
+    """Outcome of a regression test case
+    Attributes:
+        name (str): case name
+        status (int): exit status of the case, 0 if it passed
+        elapsed (float): wall time (s)
+        log (str): path to the case log
+    """
+
+    def __init__(self, name, status, elapsed, log):
+        self.name = name
+        self.status = status
+        self.elapsed = elapsed
+        self.log = log
+
+    @property
+    def passed(self):
+        return self.status == 0
+
+
+def load_manifest(path):
+    """Read a regression manifest. The manifest is a JSON object such as
+        {
+            "files": ["ClockGen.vhd", "src"],
+            "cases": [
+                {"name": "sine", "waveform": {"type": "sine", "amplitude": 100, "frequency": "1 MHz", "phase": 0},
+                 "config": {"Verification": {"threshold": "1"}}}
+            ]
+        }
+    where `files` lists the project files and folders copied in the working directory of every case.
+    Args:
+        path (str): manifest path
+    Returns:
+        Tuple[List[str], List[Case]]: files to copy and test cases
+    Raises:
+        ManifestError: when the manifest is not valid
+    """
+    try:
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ManifestError(f"Cannot read manifest {path}: {e}")
+    if not isinstance(manifest, dict) or not isinstance(manifest.get('cases', None), list):
+        raise ManifestError(f"Manifest {path} must hold a list of cases")
+    files = manifest.get('files', [])
+    cases = []
+    names = set()
+    for i, item in enumerate(manifest['cases']):
+        if not isinstance(item, dict):
+            raise ManifestError(f"Case {i} is not an object")
+        name = str(item.get('name', f"case{i}"))
+        if name in names or name in ('', '.', '..') or os.sep in name:
+            raise ManifestError(f"Invalid or duplicate case name `{name}`")
+        names.add(name)
+        waveform = item.get('waveform', None)
+        if waveform is not None and 'type' not in waveform:
+            raise ManifestError(f"Waveform of case `{name}` has no type")
+        cases.append(Case(name, waveform, item.get('config', None)))
+    return files, cases
+
+
+def table(results):
+    """Format the results of a regression as a text table
+    Args:
+        results (List[Result]): case results
+    Returns:
+        str
+    """
+    width = max([len('case')] + [len(result.name) for result in results])
+    lines = [f"{'case':<{width}}  result  status  time (s)"]
+    for result in results:
+        verdict = 'PASS' if result.passed else 'FAIL'
+        lines.append(f"{result.name:<{width}}  {verdict:<6}  {result.status:>6}  {result.elapsed:>8.2f}")
+    passed = sum(result.passed for result in results)
+    lines.append(f"{passed}/{len(results)} cases passed")
+    return '\n'.join(lines) + '\n'
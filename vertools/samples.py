@@ -0,0 +1,703 @@
+import abc
+import mmap
+import os
+import re
+import struct
+import warnings
+
+import numpy as np
+
+# Approximate number of bytes parsed at once
+CHUNK_SIZE = 1 << 24
+
+DTYPE = np.int64
+
+# Number of samples formatted or converted at once when writing
+WRITE_CHUNK = 1 << 18
+# Space reserved for the header of .npy files, which is only final once the number of samples is known
+NPY_HEADER_SIZE = 128
+
+# Raw binary formats, such as int32 (native byte order), int16le or uint64be
+RAW_FORMAT = re.compile(r'(u?int)(8|16|32|64)(le|be)?')
+
+
+def raw_dtype(format):
+    """Get the data type of a raw binary format
+    Args:
+        format (str): format name, such as int32, int16le or uint64be
+    Returns:
+        numpy.dtype: data type, or None if the format is not a raw binary format
+    """
+    match = RAW_FORMAT.fullmatch(format)
+    if match is None:
+        return None
+    kind, bits, order = match.groups()
+    byteorder = {'le': '<', 'be': '>', None: '='}[order]
+    return np.dtype(f"{byteorder}{'u' if kind == 'uint' else 'i'}{int(bits) // 8}")
+
+
+def reader(path, format='text', chunk_size=CHUNK_SIZE, columns=1):
+    """Get a reader for a sample file
+    Args:
+        path (str): path to the file
+        format (str): `text` for one decimal integer per line, `npy` for NumPy arrays, or a raw binary format (see
+            raw_dtype)
+        chunk_size (int): approximate number of bytes parsed at once
+        columns (int): number of values per sample. Only text files may have several columns
+    Returns:
+        Reader
+    Raises:
+        ValueError: when the format is unknown
+    """
+    if format == 'text':
+        return TextReader(path, chunk_size, columns)
+    if columns != 1:
+        raise ValueError(f"Multi-column results must be in text format, not `{format}`")
+    if format == 'npy':
+        return NpyReader(path, chunk_size)
+    dtype = raw_dtype(format)
+    if dtype is None:
+        raise ValueError(f"Unknown sample file format `{format}`")
+    return RawReader(path, dtype, chunk_size)
+
+
+def follower(path, format='text', chunk_size=CHUNK_SIZE, columns=1):
+    """Get an incremental reader for a sample file which may still be being written
+    Args:
+        path (str): path to the file
+        format (str): `text` or a raw binary format. NumPy files cannot be followed, as their header is only
+            complete once the whole array is known
+        chunk_size (int): maximum number of bytes read at once
+        columns (int): number of values per sample. Only text files may have several columns
+    Returns:
+        Union[TextFollower, RawFollower]
+    Raises:
+        ValueError: when the format is unknown or cannot be followed
+    """
+    if format == 'text':
+        return TextFollower(path, chunk_size, columns)
+    if columns != 1:
+        raise ValueError(f"Multi-column results must be in text format, not `{format}`")
+    dtype = raw_dtype(format)
+    if dtype is None:
+        raise ValueError(f"Sample file format `{format}` cannot be read while it is written")
+    return RawFollower(path, dtype, chunk_size)
+
+
+class Reader(abc.ABC):
+    """Sample file reader interface. Positions in the file are byte offsets, and samples are read in blocks of
+    int64 values. Readers must implement count, offsets and blocks.
+    Attributes:
+        path (str): path to the file
+        chunk_size (int): approximate number of bytes read at once
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    def __len__(self):
+        """Count the samples in the file
+        Returns:
+            int
+        """
+        return self.count()
+
+    @abc.abstractmethod
+    def count(self, start=0, end=None):
+        """Count the samples in a byte range of the file
+        Args:
+            start (int): first byte of the range
+            end (int): end of the range (excluded), defaults to the end of file
+        Returns:
+            int
+        """
+
+    @abc.abstractmethod
+    def offsets(self, lines, start=0):
+        """Find the byte offsets at which some samples start
+        Args:
+            lines (Iterable[int]): 0-based sample numbers, in increasing order, counted from the sample at `start`
+            start (int): byte offset of a sample boundary from which samples are counted
+        Returns:
+            List[int]: byte offsets. Samples past the end of the file are mapped to the file end
+        """
+
+    def boundaries(self, parts):
+        """Split the file in byte ranges of about the same size, at sample boundaries
+        Args:
+            parts (int): number of ranges
+        Returns:
+            List[int]: increasing byte offsets, from the first sample to the end of the file
+        """
+        lines = len(self)
+        return self.offsets([lines * k // parts for k in range(parts + 1)])
+
+    @abc.abstractmethod
+    def blocks(self, start=0, end=None, first_line=0):
+        """Read a byte range of the file block by block
+        Args:
+            start (int): first byte of the range, which must be at a sample boundary
+            end (int): end of the range (excluded), defaults to the end of file
+            first_line (int): 0-based sample number at the start of the range, used in error messages
+        Yields:
+            numpy.ndarray: int64 samples
+        Raises:
+            FormatError: when the file content is not valid
+        """
+
+    class FormatError(ValueError):
+        pass
+
+
+class TextReader(Reader):
+    """Reader for text sample files storing one decimal integer per line, or one row of integers per line when the
+    results have several columns.
+    The file is memory-mapped and parsed in large line-aligned chunks, so that memory usage does not depend on the
+    file size.
+    Attributes:
+        path (str): path to the file
+        chunk_size (int): approximate number of bytes parsed at once
+        columns (int): number of values per line
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, columns=1):
+        super().__init__(path, chunk_size)
+        self.columns = columns
+
+    def count(self, start=0, end=None):
+        """Count the lines in a byte range of the file
+        Args:
+            start (int): first byte of the range
+            end (int): end of the range (excluded), defaults to the end of file
+        Returns:
+            int
+        """
+        with _Mapping(self.path) as mm:
+            end = len(mm) if end is None else min(end, len(mm))
+            lines = 0
+            for position in range(start, end, self.chunk_size):
+                lines += mm[position:min(position + self.chunk_size, end)].count(b'\n')
+            if end > start and mm[end - 1:end] != b'\n':
+                lines += 1
+        return lines
+
+    def offsets(self, lines, start=0):
+        """Find the byte offsets at which some lines start, reading the file only up to the last of them
+        Args:
+            lines (Iterable[int]): 0-based line numbers, in increasing order, counted from the line at `start`
+            start (int): byte offset of a line boundary from which lines are counted
+        Returns:
+            List[int]: byte offsets. Lines past the end of the file are mapped to the file size
+        """
+        result = []
+        targets = iter(lines)
+        target = next(targets, None)
+        with _Mapping(self.path) as mm:
+            counted = 0
+            for position in range(start, len(mm), self.chunk_size):
+                chunk = mm[position:position + self.chunk_size]
+                count = chunk.count(b'\n')
+                newlines = None
+                while target is not None and target <= counted + count:
+                    if target == 0:
+                        result.append(start)
+                    else:
+                        if newlines is None:
+                            newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n'))
+                        result.append(position + int(newlines[target - counted - 1]) + 1)
+                    target = next(targets, None)
+                if target is None:
+                    break
+                counted += count
+            while target is not None:
+                result.append(len(mm))
+                target = next(targets, None)
+        return result
+
+    def boundaries(self, parts):
+        """Split the file in byte ranges of about the same size, at line boundaries, without reading it
+        Args:
+            parts (int): number of ranges
+        Returns:
+            List[int]: increasing byte offsets, from 0 to the file size
+        """
+        with _Mapping(self.path) as mm:
+            size = len(mm)
+            result = [0]
+            for k in range(1, parts):
+                position = max(size * k // parts, result[-1] + 1)
+                if position >= size:
+                    break
+                newline = mm.find(b'\n', position - 1, size)
+                if newline == -1 or newline + 1 >= size:
+                    break
+                result.append(newline + 1)
+        return result + [size]
+
+    def chunks(self, start=0, end=None):
+        """Split a byte range of the file in line-aligned chunks
+        Args:
+            start (int): first byte of the range, which must be at a line boundary
+            end (int): end of the range (excluded), defaults to the end of file
+        Yields:
+            bytes: chunk content, always ending at a line boundary (or at the end of the range)
+        """
+        with _Mapping(self.path) as mm:
+            size = len(mm) if end is None else min(end, len(mm))
+            while start < size:
+                end = start + self.chunk_size
+                if end < size:
+                    newline = mm.find(b'\n', end - 1, size)
+                    end = size if newline == -1 else newline + 1
+                else:
+                    end = size
+                yield mm[start:end]
+                start = end
+
+    def blocks(self, start=0, end=None, first_line=0):
+        """Parse a byte range of the file block by block
+        Args:
+            start (int): first byte of the range, which must be at a line boundary
+            end (int): end of the range (excluded), defaults to the end of file
+            first_line (int): 0-based line number at the start of the range, used in error messages
+        Yields:
+            numpy.ndarray: integer samples of one chunk
+        Raises:
+            FormatError: when a line does not hold exactly one integer
+        """
+        line = first_line
+        for chunk in self.chunks(start, end):
+            block = parse(chunk, line, self.columns)
+            line += len(block)
+            yield block
+
+    def array(self):
+        """Parse all the samples of the file
+        Returns:
+            numpy.ndarray: one-dimensional array for a single column, otherwise one row per line
+        Raises:
+            FormatError: when a line does not hold exactly `columns` integers
+        """
+        empty = np.empty(0 if self.columns == 1 else (0, self.columns), dtype=DTYPE)
+        return np.concatenate([empty] + list(self.blocks()))
+
+
+class RawReader(Reader):
+    """Reader for raw binary sample files storing fixed-width integers. The file is memory-mapped, and blocks are
+    views on the mapping whenever the samples are already native int64.
+    Attributes:
+        path (str): path to the file
+        dtype (numpy.dtype): sample data type
+        chunk_size (int): approximate number of bytes read at once
+        header (int): number of bytes preceding the samples
+    """
+
+    def __init__(self, path, dtype, chunk_size=CHUNK_SIZE, header=0):
+        super().__init__(path, chunk_size)
+        self.dtype = np.dtype(dtype)
+        self.header = header
+
+    def _size(self):
+        """Get the number of samples in the file
+        Raises:
+            FormatError: when the file is truncated in the middle of a sample
+        """
+        data = os.path.getsize(self.path) - self.header
+        if data % self.dtype.itemsize != 0:
+            raise Reader.FormatError(f"File {self.path} does not hold a whole number of {self.dtype} samples")
+        return data // self.dtype.itemsize
+
+    def _index(self, offset, size):
+        """Convert a byte offset to a sample index"""
+        return min(max(offset - self.header, 0) // self.dtype.itemsize, size)
+
+    def count(self, start=0, end=None):
+        size = self._size()
+        last = size if end is None else self._index(end, size)
+        return max(last - self._index(start, size), 0)
+
+    def offsets(self, lines, start=0):
+        size = self._size()
+        first = self._index(start, size)
+        return [self.header + min(first + line, size) * self.dtype.itemsize for line in lines]
+
+    def array(self):
+        """Map all the samples of the file
+        Returns:
+            numpy.ndarray: read-only array, in the file data type
+        Raises:
+            FormatError: when an unsigned sample does not fit in int64
+        """
+        samples = self._map()
+        _check_range(samples, self.path)
+        return samples
+
+    def _map(self):
+        """Map all the samples of the file, without checking them"""
+        size = self._size()
+        if size == 0:
+            return np.empty(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode='r', offset=self.header, shape=(size,))
+
+    def blocks(self, start=0, end=None, first_line=0):
+        samples = self._map()
+        size = len(samples)
+        first = self._index(start, size)
+        last = size if end is None else self._index(end, size)
+        step = max(self.chunk_size // self.dtype.itemsize, 1)
+        for i in range(first, last, step):
+            block = samples[i:min(i + step, last)]
+            _check_range(block, self.path, i)
+            yield block.astype(DTYPE, copy=False)
+
+
+class NpyReader(RawReader):
+    """Reader for NumPy .npy files holding a one-dimensional integer array
+    Attributes:
+        path (str): path to the file
+        chunk_size (int): approximate number of bytes read at once
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        super().__init__(path, DTYPE, chunk_size)
+        self._header_read = False
+
+    def _size(self):
+        if not self._header_read:
+            self._read_header()
+        return super()._size()
+
+    def _read_header(self):
+        """Read the array type and the data offset from the file header
+        Raises:
+            FormatError: when the file is not a NumPy file holding a one-dimensional integer array
+        """
+        with open(self.path, 'rb') as f:
+            try:
+                version = np.lib.format.read_magic(f)
+                if version == (1, 0):
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+                else:
+                    shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            except ValueError as e:
+                raise Reader.FormatError(f"File {self.path} is not a valid NumPy file: {e}")
+            if dtype.kind not in 'iu' or len(shape) == 0 or int(np.prod(shape[1:])) != 1:
+                raise Reader.FormatError(f"File {self.path} does not hold a one-dimensional integer array")
+            self.dtype = dtype
+            self.header = f.tell()
+        self._header_read = True
+
+
+class TextFollower:
+    """Incremental reader of a text sample file which may still be being written, similar to `tail -f`.
+    Attributes:
+        path (str): path to the file
+        chunk_size (int): maximum number of bytes read at once
+        columns (int): number of values per line
+        lines (int): number of lines parsed so far
+        complete (bool): whether the whole complete file was read
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE, columns=1):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.columns = columns
+        self.lines = 0
+        self.complete = False
+        self._file = None
+        self._rest = b''
+
+    def read(self, final=False):
+        """Parse the lines completed since the last call, reading at most `chunk_size` bytes
+        Args:
+            final (bool): whether the file is complete. If True, a last line without newline is parsed once the end
+                of the file is reached; call again until `complete` is set
+        Returns:
+            numpy.ndarray: new samples, possibly empty
+        Raises:
+            TextReader.FormatError: when a line does not hold exactly `columns` integers
+        """
+        if self._file is None:
+            try:
+                self._file = open(self.path, 'rb')
+            except FileNotFoundError:
+                self.complete = final
+                return np.empty(0, dtype=DTYPE)
+        new = self._file.read(self.chunk_size)
+        data = self._rest + new
+        if final and len(new) < self.chunk_size:
+            # End of the complete file
+            complete, self._rest = data, b''
+            self.complete = True
+        else:
+            cut = data.rfind(b'\n') + 1
+            complete, self._rest = data[:cut], data[cut:]
+        block = parse(complete, self.lines, self.columns)
+        self.lines += len(block)
+        return block
+
+    def close(self):
+        """Close the file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RawFollower:
+    """Incremental reader of a raw binary sample file which may still be being written
+    Attributes:
+        path (str): path to the file
+        dtype (numpy.dtype): sample data type
+        chunk_size (int): maximum number of bytes read at once
+        lines (int): number of samples read so far
+        complete (bool): whether the whole complete file was read
+    """
+
+    def __init__(self, path, dtype, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.lines = 0
+        self.complete = False
+        self._file = None
+        self._rest = b''
+
+    def read(self, final=False):
+        """Read the samples completed since the last call, reading at most `chunk_size` bytes
+        Args:
+            final (bool): whether the file is complete. If True, call again until `complete` is set
+        Returns:
+            numpy.ndarray: new samples, possibly empty
+        Raises:
+            Reader.FormatError: when the complete file ends in the middle of a sample, or when an unsigned sample does
+                not fit in int64
+        """
+        if self._file is None:
+            try:
+                self._file = open(self.path, 'rb')
+            except FileNotFoundError:
+                self.complete = final
+                return np.empty(0, dtype=DTYPE)
+        new = self._file.read(self.chunk_size)
+        data = self._rest + new
+        cut = len(data) - len(data) % self.dtype.itemsize
+        if final and len(new) < self.chunk_size:
+            self.complete = True
+            if cut != len(data):
+                raise Reader.FormatError(f"File {self.path} does not hold a whole number of {self.dtype} samples")
+        self._rest = data[cut:]
+        block = np.frombuffer(data, dtype=self.dtype, count=cut // self.dtype.itemsize)
+        _check_range(block, self.path, self.lines)
+        self.lines += len(block)
+        return block.astype(DTYPE)
+
+    def close(self):
+        """Close the file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _check_range(values, path, first_line=0):
+    """Check that samples read from a binary file can be converted to int64 without wrapping around, which only
+    unsigned 64-bit samples may not
+    Args:
+        values (numpy.ndarray): samples, in the file data type
+        path (str): path to the file
+        first_line (int): index of the first sample in the file
+    Raises:
+        Reader.FormatError: when a sample is larger than the int64 maximum
+    """
+    limit = np.iinfo(DTYPE).max
+    if values.dtype.kind == 'u' and values.dtype.itemsize == 8 and len(values) > 0 and values.max() > limit:
+        index = int(np.argmax(values > limit))
+        raise Reader.FormatError(f"Sample {first_line + index + 1} of file {path} does not fit in int64: "
+                                 f"{values[index]}")
+
+
+class Writer:
+    """Writer of sample files in any supported format. Samples are appended block by block and converted in
+    chunks, so that memory usage does not depend on the file size. They are written to a temporary file next to the
+    destination, which only replaces it once the writer is closed without error: a failed generation never leaves a
+    truncated file behind.
+    Attributes:
+        path (str): path to the file
+        format (str): `text`, `npy` or a raw binary format (see raw_dtype). NumPy files hold int64 samples
+        length (int): number of samples written so far
+    """
+
+    def __init__(self, path, format='text'):
+        if format == 'text':
+            self.dtype = None
+        elif format == 'npy':
+            self.dtype = np.dtype(DTYPE)
+        else:
+            self.dtype = raw_dtype(format)
+            if self.dtype is None:
+                raise ValueError(f"Unknown sample file format `{format}`")
+        self.path = path
+        self.format = format
+        self.length = 0
+        # Unlike tempfile.mkstemp, open honours the umask, so the final file gets the usual permissions
+        self._staging = f"{path}.{os.getpid()}-{id(self):x}.tmp"
+        self._file = open(self._staging, 'xb')
+        if format == 'npy':
+            self._file.write(_npy_header(self.dtype, 0))
+
+    def write(self, samples):
+        """Append samples to the file
+        Args:
+            samples (numpy.ndarray): samples. Non-integer values are truncated toward zero
+        Raises:
+            ValueError: when a sample does not fit in the data type of a binary format
+        """
+        for start in range(0, len(samples), WRITE_CHUNK):
+            chunk = np.asarray(samples[start:start + WRITE_CHUNK])
+            if self.dtype is None:
+                chunk = chunk.astype(DTYPE, copy=False)
+                self._file.write((b'%d\n' * len(chunk)) % tuple(chunk.tolist()))
+            else:
+                if self.dtype.kind in 'iu':
+                    info = np.iinfo(self.dtype)
+                    if len(chunk) > 0 and (chunk.min() < info.min or chunk.max() > info.max):
+                        raise ValueError(f"Samples do not fit in format `{self.format}`")
+                self._file.write(chunk.astype(self.dtype).tobytes())
+            self.length += len(chunk)
+
+    def close(self):
+        """Finalize the file and move it to its destination"""
+        if self._file.closed:
+            return
+        try:
+            if self.format == 'npy':
+                self._file.seek(0)
+                self._file.write(_npy_header(self.dtype, self.length))
+            self._file.close()
+            os.replace(self._staging, self.path)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        """Close and remove the temporary file, leaving the destination untouched"""
+        self._file.close()
+        try:
+            os.remove(self._staging)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _npy_header(dtype, length):
+    """Build the header of a one-dimensional .npy file, padded to NPY_HEADER_SIZE bytes
+    Args:
+        dtype (numpy.dtype): sample data type
+        length (int): number of samples
+    Returns:
+        bytes
+    """
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (length,)})
+    # Magic string (6 bytes), version (2 bytes), header length (2 bytes) and the header, ending with a newline
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + '\n'
+    return np.lib.format.magic(1, 0) + struct.pack('<H', len(header)) + header.encode('latin1')
+
+
+def parse(chunk, first_line=0, columns=1):
+    """Parse a chunk of text holding a fixed number of integers per line into an array. Values on the same line are
+    separated by whitespace or commas
+    Args:
+        chunk (bytes): text to parse
+        first_line (int): 0-based line number of the chunk's first line, used in error messages
+        columns (int): number of values per line
+    Returns:
+        numpy.ndarray: one-dimensional array for a single column, otherwise one row per line
+    Raises:
+        TextReader.FormatError: when a line does not hold exactly `columns` integers
+    """
+    expected = chunk.count(b'\n')
+    if chunk and not chunk.endswith(b'\n'):
+        expected += 1
+    text = chunk.replace(b',', b' ') if columns > 1 else chunk
+    with warnings.catch_warnings():
+        # Numpy signals unparsable data with a DeprecationWarning
+        warnings.simplefilter('error', DeprecationWarning)
+        try:
+            block = np.fromstring(text, dtype=DTYPE, sep=' ')
+        except (ValueError, DeprecationWarning):
+            block = None
+    if block is not None and len(block) == expected * columns:
+        # The total may be right while lines are not, such as an empty line next to a line with two values: check
+        # the number of values of every line
+        if columns == 1 and not any(blank in text for blank in (b' ', b'\t', b'\r', b'\v', b'\f')):
+            # Only newlines separate the values: a line holding two values implies an empty line
+            newlines = np.frombuffer(text, dtype=np.uint8) == ord('\n')
+            if text.startswith(b'\n') or np.any(newlines[1:] & newlines[:-1]):
+                block = None
+        elif not np.all(_values_per_line(text, expected) == columns):
+            block = None
+    if block is None or len(block) != expected * columns:
+        # Slow path: locate the offending line
+        for i, line in enumerate(text.split(b'\n')[:expected]):
+            values = line.split()
+            try:
+                [int(value) for value in values]
+            except ValueError:
+                raise TextReader.FormatError(f"Invalid sample on line {first_line + i + 1}: {line!r}")
+            if len(values) != columns and columns == 1:
+                raise TextReader.FormatError(f"Invalid sample on line {first_line + i + 1}: {line!r}")
+            if len(values) != columns:
+                raise TextReader.FormatError(f"Expected {columns} values on line {first_line + i + 1}: {line!r}")
+        raise TextReader.FormatError(f"Invalid samples after line {first_line}")
+    return block if columns == 1 else block.reshape(-1, columns)
+
+
+def _values_per_line(text, lines):
+    """Count the whitespace-separated values of every line of a chunk of text
+    Args:
+        text (bytes): text
+        lines (int): number of lines of the text, including a last line without newline
+    Returns:
+        numpy.ndarray: number of values of each line
+    """
+    data = np.frombuffer(text, dtype=np.uint8)
+    newlines = data == ord('\n')
+    blank = newlines.copy()
+    for character in b' \t\r\v\f':
+        blank |= data == character
+    # A value starts on a non-blank character following a blank one
+    starts = ~blank
+    starts[1:] &= blank[:-1]
+    line = np.searchsorted(np.flatnonzero(newlines), np.flatnonzero(starts))
+    return np.bincount(line, minlength=lines)
+
+
+class _Mapping:
+    """Read-only memory map of a file which also supports empty files"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.map = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'rb')
+        try:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self.map = b''
+        return self.map
+
+    def __exit__(self, *exc_info):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
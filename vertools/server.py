@@ -0,0 +1,168 @@
+import importlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import sys
+import traceback
+
+import vertools
+import vertools.__main__
+import vertools.cli
+import vertools.commands as commands
+import vertools.context as context
+
+# Default path of the server socket
+SOCKET = '~/.cache/vertools/server.sock'
+# Modules imported once by the server, so that requests do not pay for their import
+PRELOAD = ('numpy', 'scipy.signal', 'vertools.compare', 'vertools.samples', 'vertools.store', 'vertools.waveforms')
+# Maximum size of a request message (bytes)
+MAX_REQUEST = 1 << 20
+
+
+class ServerError(RuntimeError):
+    pass
+
+
+def socket_path(path=None):
+    """Get the path of the server socket
+    Args:
+        path (str): requested path, None for the VERTOOLS_SOCKET environment variable or the default path
+    Returns:
+        str
+    """
+    if not path:
+        path = os.environ.get('VERTOOLS_SOCKET', SOCKET)
+    return os.path.expanduser(path)
+
+
+def is_running(path):
+    """Check whether a server is listening on a socket
+    Args:
+        path (str): socket path
+    Returns:
+        bool
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server running each request in a child process forked from the warm server process.
+    Children share the imported modules and the parsed default configuration, but nothing else: every request has
+    its own context, working directory, environment and standard streams.
+    Attributes:
+        global_config (vertools.context.Scope): parsed default configuration
+    """
+
+    def __init__(self, path, global_config):
+        self.global_config = global_config
+        # Only the owner can connect
+        umask = os.umask(0o177)
+        try:
+            super().__init__(path, Handler)
+        finally:
+            os.umask(umask)
+
+
+class Handler(socketserver.BaseRequestHandler):
+    """Handler of a request, running in its own child process.
+    The client sends a JSON line holding the command line arguments, its working directory and its environment,
+    along with its standard streams as ancillary data. The server answers with a JSON line holding the process
+    identifier of the child, so that the client can forward interruptions, and a last one holding the exit status.
+    """
+
+    def handle(self):
+        credentials = self.request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+        _, uid, _ = struct.unpack('3i', credentials)
+        if uid != os.getuid():
+            return
+        message, fds, _, _ = socket.recv_fds(self.request, MAX_REQUEST, 3)
+        while not message.endswith(b'\n'):
+            data = self.request.recv(MAX_REQUEST)
+            if not data:
+                return
+            message += data
+        for target, fd in enumerate(fds):
+            os.dup2(fd, target)
+            os.close(fd)
+        self.send({'pid': os.getpid()})
+        self.send({'status': run(json.loads(message), self.server.global_config)})
+
+    def send(self, message):
+        """Send a JSON line to the client"""
+        self.request.sendall(json.dumps(message).encode() + b'\n')
+
+
+def run(request, global_config):
+    """Run a command line in the current process, as if vertools was started by the client
+    Args:
+        request (dict): command line arguments, working directory and environment of the client
+        global_config (vertools.context.Scope): parsed default configuration
+    Returns:
+        int: exit status
+    """
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        os.chdir(request['cwd'])
+        os.environ.clear()
+        os.environ.update(request['environ'])
+        # Options may precede the command: only the parser knows which one is requested
+        if getattr(vertools.cli.parse(request['args']), 'func', None) is commands.ServeCommand:
+            raise ServerError("The server cannot start another server")
+        vertools.__main__.main(request['args'], global_config)
+        status = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            status = e.code if e.code is not None else 0
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except ServerError as e:
+        print(e, file=sys.stderr)
+        status = 1
+    except KeyboardInterrupt:
+        status = 130
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return status
+
+
+def serve(path=None):
+    """Serve requests until interrupted
+    Args:
+        path (str): socket path, None for the default one
+    Raises:
+        ServerError: when another server is already listening on the socket
+    """
+    path = socket_path(path)
+    for name in PRELOAD:
+        importlib.import_module(name)
+    global_config = context.Scope.from_config(vertools.rootdir/'assets/default.config')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if os.path.exists(path):
+        if is_running(path):
+            raise ServerError(f"A server is already listening on {path}")
+        os.remove(path)
+    server = Server(path, global_config)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    # Children must not print what the server did not flush yet
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import vertools.lazy as lazy
+
+samples = lazy.LazyModule('vertools.samples')
+
+# Files stored next to a text results file: its parsed samples, the index describing them, and the chunks of the
+# last simulation results which passed the comparison
+CACHE_SUFFIX = '.vtcache.npy'
+INDEX_SUFFIX = '.vtcache.json'
+PASS_SUFFIX = '.vtpass.json'
+
+
+def checksum(chunk):
+    """Compute the checksum of a chunk of a results file
+    Args:
+        chunk (bytes): chunk content
+    Returns:
+        str
+    """
+    return hashlib.blake2b(chunk, digest_size=16).hexdigest()
+
+
+def scan(reader):
+    """Split a text results file in chunks and checksum them, without parsing the samples
+    Args:
+        reader (vertools.samples.TextReader): results file
+    Returns:
+        List[list]: [first byte, end byte, first line (0-based), number of lines, checksum] of each chunk
+    """
+    chunks = []
+    position = line = 0
+    for chunk in reader.chunks():
+        lines = chunk.count(b'\n') + (0 if chunk.endswith(b'\n') else 1)
+        chunks.append([position, position + len(chunk), line, lines, checksum(chunk)])
+        position += len(chunk)
+        line += lines
+    return chunks
+
+
+def digest(chunks):
+    """Identify the content of a results file from its chunks
+    Args:
+        chunks (List[list]): chunks, as returned by scan
+    Returns:
+        str
+    """
+    return hashlib.sha256(json.dumps([[lines, check] for _, _, _, lines, check in chunks]).encode()).hexdigest()
+
+
+def cached(reader):
+    """Get the parsed samples of a text results file from its cache, building the cache if it is missing or if the
+    file was modified since
+    Args:
+        reader (vertools.samples.TextReader): results file
+    Returns:
+        Tuple[vertools.samples.NpyReader, dict]: reader of the cached samples and index of the results file
+    Raises:
+        vertools.samples.Reader.FormatError: when the results file is not valid
+        OSError: when the results file cannot be read, or the cache cannot be written next to it
+    """
+    cache = reader.path + CACHE_SUFFIX
+    info = os.stat(reader.path)
+    index = _load(reader.path + INDEX_SUFFIX)
+    if index is not None and index['size'] == info.st_size and index['mtime'] == info.st_mtime_ns and \
+            index['chunk_size'] == reader.chunk_size and os.path.exists(cache):
+        return samples.NpyReader(cache, reader.chunk_size), index
+    chunks = []
+    position = line = 0
+    with samples.Writer(cache, 'npy') as writer:
+        for chunk in reader.chunks():
+            block = samples.parse(chunk, line)
+            writer.write(block)
+            chunks.append([position, position + len(chunk), line, len(block), checksum(chunk)])
+            position += len(chunk)
+            line += len(block)
+    index = {'size': info.st_size, 'mtime': info.st_mtime_ns, 'chunk_size': reader.chunk_size, 'chunks': chunks,
+             'digest': digest(chunks)}
+    _save(reader.path + INDEX_SUFFIX, index)
+    return samples.NpyReader(cache, reader.chunk_size), index
+
+
+def load_pass(path):
+    """Load the record of the last passing comparison of a simulation results file
+    Args:
+        path (str): simulation results file
+    Returns:
+        dict: reference digest, threshold, chunk size and chunks of the simulation results; None if there is none
+    """
+    return _load(path + PASS_SUFFIX)
+
+
+def save_pass(path, record):
+    """Save the record of a passing comparison of a simulation results file
+    Args:
+        path (str): simulation results file
+        record (dict): reference digest, threshold, chunk size and chunks of the simulation results
+    """
+    _save(path + PASS_SUFFIX, record)
+
+
+def invalidate(path):
+    """Remove all the stored data of a results file
+    Args:
+        path (str): results file
+    """
+    for suffix in CACHE_SUFFIX, INDEX_SUFFIX, PASS_SUFFIX:
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
+
+
+def _load(path):
+    """Load a JSON file, None if it does not exist or is not valid"""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save(path, data):
+    """Atomically save a JSON file"""
+    staging = _staging(path)
+    try:
+        with open(staging, 'w') as f:
+            json.dump(data, f)
+        os.replace(staging, path)
+    except BaseException:
+        _discard(staging)
+        raise
+
+
+def _staging(path):
+    """Create a temporary file next to a file, unique to the caller so that concurrent updates do not collide"""
+    descriptor, staging = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path),
+                                           suffix='.tmp')
+    os.close(descriptor)
+    return staging
+
+
+def _discard(staging):
+    """Remove a temporary file, if it was created"""
+    if staging is not None:
+        try:
+            os.remove(staging)
+        except FileNotFoundError:
+            pass
@@ -1,5 +1,49 @@
+import asyncio
+import codecs
+import concurrent.futures
+import contextvars
 import os
+import signal
 import subprocess
+import time
+
+import vertools.profiling as profiling
+
+# Interval between two cancellation checks while waiting for a process (s)
+POLL_INTERVAL = 0.1
+# Interval between two checks of the termination of a process, where it cannot be awaited (s)
+REAP_INTERVAL = 0.01
+# Time given to a cancelled process to terminate before killing it (s)
+TERMINATE_TIMEOUT = 5
+# Maximum number of bytes copied at once from the output of a command
+PIPE_CHUNK_SIZE = 1 << 16
+
+
+class CancelledError(Exception):
+    pass
+
+
+class TimeoutExpired(Exception):
+    pass
+
+
+class Completed(subprocess.CompletedProcess):
+    """A terminated command, with its resource usage
+    Attributes:
+        args (str): command
+        returncode (int): exit status, negative if the process was killed by a signal
+        wall_time (float): elapsed time (s)
+        user_time (float): CPU time spent in user mode by the command and its children (s)
+        system_time (float): CPU time spent in system mode by the command and its children (s)
+        max_rss (int): peak resident set size of the largest process (KiB)
+    """
+
+    def __init__(self, args, returncode, wall_time, usage):
+        super().__init__(args, returncode)
+        self.wall_time = wall_time
+        self.user_time = usage.ru_utime
+        self.system_time = usage.ru_stime
+        self.max_rss = usage.ru_maxrss
 
 
 def remove_files(*files):
@@ -45,25 +89,150 @@ def is_executable(path):
 
 
 def run_bash(commands, **kwargs):
-    """Run a bash command
+    """Run a bash command, blocking until it terminates. See run_async for the arguments.
+    Coroutines should await run_async instead: called from a thread running an event loop, the command runs in an
+    event loop of its own, in another thread, and the calling loop is blocked until it terminates.
     Args:
         commands (Union[str, List[str]]): command (or list of commands) to be executed in the same shell
-        **kwargs: arbitrary keyword arguments
+        **kwargs: run_async keyword arguments
+    Returns:
+        Completed
+    Raises:
+        CancelledError: when the command is terminated through the `cancel` event
+        TimeoutExpired: when the command does not terminate in time
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(run_async(commands, **kwargs))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        context = contextvars.copy_context()
+        return pool.submit(context.run, asyncio.run, run_async(commands, **kwargs)).result()
+
+
+async def run_async(commands, stdout=None, stderr=None, timeout=None, cancel=None):
+    """Run a bash command as a coroutine, so that many commands can be awaited at once.
+    The command runs in its own session: on timeout or cancellation, its whole process group is terminated.
+    Args:
+        commands (Union[str, List[str]]): command (or list of commands) to be executed in the same shell
+        stdout (Any): None to inherit the standard output, False to discard it, or a text stream (such as a log file)
+            to which the output is copied as it is produced
+        stderr (Any): same as stdout, for the standard error
+        timeout (float): maximum running time (s), None for no limit
+        cancel (threading.Event): event allowing another thread to terminate the command
     Returns:
-       subprocess.CompletedProcess
+        Completed
+    Raises:
+        CancelledError: when the command is terminated through the `cancel` event
+        TimeoutExpired: when the command does not terminate in time
     """
-    stdout = kwargs.get('stdout', None)
-    stderr = kwargs.get('stderr', None)
-    if stdout is False:
-        stdout = subprocess.DEVNULL
-    if stderr is False:
-        stderr = subprocess.DEVNULL
     if isinstance(commands, list):
         command = ' && '.join(commands)
     else:
         command = commands
-    status = subprocess.run(command, shell=True, stdout=stdout, stderr=stderr)
-    return status
+    start = time.monotonic()
+    process = subprocess.Popen(command, shell=True, stdout=_redirection(stdout), stderr=_redirection(stderr),
+                               start_new_session=True)
+    copies = [asyncio.ensure_future(_copy(pipe, destination)) for pipe, destination in
+              ((process.stdout, stdout), (process.stderr, stderr)) if pipe is not None]
+    # Reap the child with wait4 to get its resource usage
+    waiter = asyncio.ensure_future(_wait(process.pid))
+    try:
+        while not waiter.done():
+            await asyncio.wait({waiter}, timeout=POLL_INTERVAL)
+            if waiter.done():
+                break
+            if cancel is not None and cancel.is_set():
+                raise CancelledError(f"Command `{command}` was cancelled")
+            if timeout is not None and time.monotonic() - start > timeout:
+                raise TimeoutExpired(f"Command `{command}` timed out after {timeout} s")
+    finally:
+        if not waiter.done():
+            await _terminate(process, waiter)
+        await asyncio.gather(*copies)
+        _, status, usage = waiter.result()
+        process.returncode = os.waitstatus_to_exitcode(status)
+        completed = Completed(command, process.returncode, time.monotonic() - start, usage)
+        profiling.process(completed)
+    return completed
+
+
+async def _wait(pid):
+    """Wait for a child process to terminate without holding a thread: through a pidfd where supported, otherwise
+    by polling
+    Args:
+        pid (int): process identifier
+    Returns:
+        Tuple[int, int, resource.struct_rusage]: result of os.wait4
+    """
+    try:
+        pidfd = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        pidfd = None
+    if pidfd is None:
+        while True:
+            result = os.wait4(pid, os.WNOHANG)
+            if result[0] != 0:
+                return result
+            await asyncio.sleep(REAP_INTERVAL)
+    loop = asyncio.get_running_loop()
+    terminated = loop.create_future()
+    loop.add_reader(pidfd, lambda: terminated.done() or terminated.set_result(None))
+    try:
+        await terminated
+    finally:
+        loop.remove_reader(pidfd)
+        os.close(pidfd)
+    return os.wait4(pid, 0)
+
+
+def _redirection(destination):
+    """Translate an output destination of run_async into a subprocess redirection"""
+    if destination is False:
+        return subprocess.DEVNULL
+    if hasattr(destination, 'write'):
+        return subprocess.PIPE
+    return destination
+
+
+async def _copy(pipe, destination):
+    """Copy the content of a pipe to a text stream as it is produced
+    Args:
+        pipe (io.BufferedReader): readable end of the pipe
+        destination (io.TextIOBase): text stream
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), pipe)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    try:
+        while True:
+            data = await reader.read(PIPE_CHUNK_SIZE)
+            destination.write(decoder.decode(data, final=not data))
+            if not data:
+                break
+            # Log files can be followed while the command runs
+            destination.flush()
+        destination.flush()
+    finally:
+        transport.close()
+
+
+async def _terminate(process, waiter):
+    """Terminate a process and its process group, killing them if they do not exit in time
+    Args:
+        process (subprocess.Popen): process started in a new session
+        waiter (asyncio.Future): future reaping the process
+    """
+    for sig in signal.SIGTERM, signal.SIGKILL:
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            pass
+        done, _ = await asyncio.wait({waiter}, timeout=TERMINATE_TIMEOUT)
+        if done:
+            return
+    await waiter
 
 
 def launch(script, **kwargs):
@@ -72,7 +241,7 @@ def launch(script, **kwargs):
         script (str): script path
         **kwargs: arbitrary keyword arguments
     Returns:
-        subprocess.CompletedProcess
+        Completed
     """
     #TODO Specific implementation for scripts instead of running a generic command
     return run_bash(script, **kwargs)
\ No newline at end of file
@@ -1,8 +1,33 @@
+import functools
+
 import numpy as np
 import scipy as sp
 import scipy.signal
 
 
+# Number of samples generated at once by the streaming API
+BLOCK_SIZE = 1 << 18
+
+
+def _round_nearest(x, out):
+    """Round half away from zero, without float temporaries: out may be x"""
+    negative = np.signbit(x)
+    np.abs(x, out=out)
+    out += 0.5
+    np.floor(out, out=out)
+    return np.negative(out, out=out, where=negative)
+
+
+# Rounding modes of the quantization stage
+ROUNDING = {
+    'truncate': np.trunc,
+    'floor': np.floor,
+    'ceil': np.ceil,
+    'nearest': _round_nearest,
+    'even': np.rint
+}
+
+
 def time_array(tstart, tend, step):
     """Generate a time array
     :param tstart: first time instant
@@ -14,12 +39,23 @@ def time_array(tstart, tend, step):
     :returns: time array
     :rtype: numpy.ndarray
     """
-    duration = tend - tstart
-    nsamples = int(duration / step)
-    time = np.arange(tstart, tend + step, step)
-    # Chop extra elements introduced by float arithmetic
-    time = time[:nsamples]
-    return time
+    return np.concatenate([np.empty(0)] + list(time_blocks(tstart, tend, step)))
+
+
+def time_blocks(tstart, tend, step, size=BLOCK_SIZE):
+    """Generate a time array block by block. Every instant is computed from its sample index, so that blocks are
+    exactly contiguous and rounding errors do not accumulate.
+    Args:
+        tstart (float): first time instant
+        tend (float): last time instant (excluded)
+        step (float): time step
+        size (int): number of samples per block
+    Yields:
+        numpy.ndarray: time instants of a block
+    """
+    nsamples = int((tend - tstart) / step)
+    for start in range(0, nsamples, size):
+        yield tstart + np.arange(start, min(start + size, nsamples)) * step
 
 
 def generate(context):
@@ -29,23 +65,44 @@ def generate(context):
     Returns:
         numpy.ndarray
     """
-    waveform = context.get('CommandLine', 'waveform')
+    return np.concatenate([np.empty(0)] + list(generate_blocks(context)))
+
+
+def generate_blocks(context, size=BLOCK_SIZE):
+    """Generate the requested waveform block by block, so that memory usage does not depend on its duration
+    Args:
+        context (vertools.context.Context): context variable
+        size (int): number of samples per block
+    Yields:
+        numpy.ndarray: samples of a block
+    Raises:
+        ValueError: when the waveform is unknown
+    """
+    waveform, parameters = waveform_parameters(context)
+    function = functools.partial(WAVEFORMS[waveform][0], **parameters)
     tstart = context.get('Input', 'tstart')
     tend = context.get('Input', 'tend')
     tstep = context.get('Input', 'tstep')
-    time = time_array(tstart, tend, tstep)
-    if waveform == 'constant':
-        return constant(time, context.get('CommandLine', 'value'))
-    elif waveform == 'step':
-        return step(time, context.get('CommandLine', 't0'), context.get('CommandLine', 'y0'),
-                    context.get('CommandLine', 'y1'))
-    elif waveform == 'sine':
-        return sine(time, context.get('CommandLine', 'amplitude'), context.get('CommandLine', 'frequency'),
-                    context.get('CommandLine', 'phase'))
-    elif waveform == 'chirp':
-        return chirp(time, context.get('CommandLine', 'amplitude'), context.get('CommandLine', 'duration'),
-                     context.get('CommandLine', 'f0'), context.get('CommandLine', 'f1'),
-                     context.get('CommandLine', 'method', fallback='linear'))
+    for time in time_blocks(tstart, tend, tstep, size):
+        yield function(time)
+
+
+def waveform_parameters(context):
+    """Get the requested waveform and its parameters
+    Args:
+        context (vertools.context.Context): context variable
+    Returns:
+        Tuple[str, dict]: waveform name and parameter values
+    Raises:
+        ValueError: when the waveform is unknown
+    """
+    waveform = context.get('CommandLine', 'waveform')
+    if waveform not in WAVEFORMS:
+        raise ValueError(f"Unknown waveform `{waveform}`")
+    parameters = {}
+    for parameter in WAVEFORMS[waveform][1]:
+        parameters[parameter] = context.get('CommandLine', parameter, fallback=DEFAULTS.get(parameter, None))
+    return waveform, parameters
 
 
 def constant(time, value):
@@ -69,7 +126,7 @@ def step(time, t0, y0, y1):
     Returns:
         numpy.ndarray
     """
-    return np.array([y0 if t < t0 else y1 for t in time])
+    return np.where(time < t0, y0, y1)
 
 
 def sine(time, amplitude, frequency, phase):
@@ -98,3 +155,81 @@ def chirp(time, amplitude, duration, f0, f1, method):
         numpy.ndarray
     """
     return amplitude * sp.signal.chirp(time, f0, duration, f1, method)
+
+
+# Generator function and parameter names of every waveform
+WAVEFORMS = {
+    'constant': (constant, ['value']),
+    'step': (step, ['t0', 'y0', 'y1']),
+    'sine': (sine, ['amplitude', 'frequency', 'phase']),
+    'chirp': (chirp, ['amplitude', 'duration', 'f0', 'f1', 'method'])
+}
+# Default values of the optional waveform parameters
+DEFAULTS = {
+    'method': 'linear'
+}
+
+
+def quantize(samples, bits=None, signed=True, rounding='truncate', saturate=True):
+    """Quantize samples to a fixed-point integer format. Float arrays are rounded in place, and float64 arrays are
+    also converted in place: their memory is reused by the returned samples.
+    Args:
+        samples (numpy.ndarray): samples
+        bits (int): bit width, None to only round to int64
+        signed (bool): whether the format is two's complement or unsigned
+        rounding (str): rounding mode, one of ROUNDING: truncate (toward zero), floor, ceil, nearest (half away
+            from zero) or even (half to even)
+        saturate (bool): whether out of range values saturate or wrap around
+    Returns:
+        numpy.ndarray: int64 samples
+    Raises:
+        ValueError: when the format is not supported
+    """
+    if rounding not in ROUNDING:
+        raise ValueError(f"Unknown rounding mode `{rounding}`")
+    if bits is None:
+        low, high = np.iinfo(np.int64).min, np.iinfo(np.int64).max
+    elif 1 <= bits <= (64 if signed else 63):
+        low, high = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+    else:
+        raise ValueError(f"Unsupported {'signed' if signed else 'unsigned'} bit width {bits}")
+    if samples.dtype.kind == 'f':
+        if not samples.flags.writeable:
+            samples = samples.copy()
+        ROUNDING[rounding](samples, out=samples)
+        if saturate:
+            ceiling = samples.dtype.type(high)
+            if high == np.iinfo(np.int64).max:
+                # The int64 maximum rounds up to 2**63, which would wrap around to the minimum when converted
+                ceiling = np.nextafter(ceiling, samples.dtype.type(0))
+            np.clip(samples, low, ceiling, out=samples)
+        if samples.dtype == np.float64 and samples.flags.c_contiguous:
+            values = samples.view(np.int64)
+            np.copyto(values, samples, casting='unsafe')
+        else:
+            values = samples.astype(np.int64)
+    else:
+        # Integer samples are only copied when they are modified below
+        values = samples.astype(np.int64, copy=bits is not None and bits != 64)
+    if bits is None or bits == 64:
+        return values
+    if saturate:
+        return np.clip(values, low, high, out=values)
+    # Wrap around: keep the lowest bits, then restore the offset of the range
+    values -= low
+    values &= high - low
+    values += low
+    return values
+
+
+def quantizer(context):
+    """Get the quantization stage configured in the Input section
+    Args:
+        context (vertools.context.Context): context variable
+    Returns:
+        Callable[[numpy.ndarray], numpy.ndarray]: quantization function
+    """
+    return functools.partial(quantize, bits=context.get('Input', 'bits', None),
+                             signed=context.get('Input', 'signed', True),
+                             rounding=context.get('Input', 'rounding', 'truncate'),
+                             saturate=context.get('Input', 'saturate', True))